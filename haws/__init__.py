@@ -0,0 +1,27 @@
+"""
+HAWS pipeline library — Ingest → Score → Serve for the Safety Twin sim.
+
+Modules:
+  haws.ingest     streaming JSONL ingest of the site/* topics (validate, stamp, route)
+  haws.rules      risk_rules.yaml compiled into flat typed tables; file watcher, hot swap
+  haws.livestate  latest worker/equipment state in preallocated slot columns (eviction)
+  haws.proximity  worker/equipment proximity scoring on a grid index (NumPy ttc)
+  haws.geofence   geofence/task-zone index with batched point-in-polygon tests
+  haws.heat       Heat Index scoring (streaming per sensor, NumPy batch, backfill)
+  haws.pipeline   in-process Ingest → Score pipeline (time-ordered, ticked scoring)
+  haws.shard      multi-site scoring sharded by site_id over worker processes (shared memory)
+  haws.sim        golden-data scenario replay, HTTP stand-in, incremental diff, what-if
+  haws.latency    mergeable constant-memory latency histograms per stage and site
+  haws.serve      asyncio HTTP/WebSocket serve layer (alert fan-out, snapshot cache)
+  haws.evidence   weekly evidence.csv export and kpi_snapshot (per-day, parallel)
+  haws.privacy    team-view guardrails (n>=5 cohorts, 60 min windows, banding, audit)
+  haws.store      append-only columnar event store (site/day partitions, mmap reads)
+  haws.did        difference-in-differences over the pilot tracker (bootstrap CIs, cached reports)
+
+The bundle under haws_bundle_v1/ (schemas, samples, config) supplies the
+defaults; every entry point also takes explicit paths.
+"""
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BUNDLE_DIR = REPO_ROOT / "haws_bundle_v1"
@@ -0,0 +1,377 @@
+"""
+haws.did — Difference-in-differences estimates for the pilots in the success tracker.
+
+Every row of trackers/pilot_success_tracker.csv is a cohort (pilot, site or cohort,
+metric). Its observations are unit-days from the event rollups:
+- the columnar store (haws.store): heat_high_minutes per (site, sensor, day), the
+  env columns scored by haws.heat.score_day (days with readings but no high minutes
+  count as 0)
+- weekly evidence.csv exports (haws.evidence): any site-day metric (near_misses, ...)
+Tracker metrics map onto rollup metrics through METRIC_ALIASES.
+
+The treated site is the row's site_or_cohort ("Site A" -> site-a); the controls are
+the other sites with the metric, or the optional `control` column (';'-separated).
+The post period is the post_days ending on the row's date (the date its current_value
+was taken), or the post_days from an optional `intervention_start` column; the pre
+period is the pre_days before it. The estimate is the 2x2 cell-means DiD
+(treated post - pre) - (control post - pre) with a percentile bootstrap CI: each cell
+is resampled with replacement as one (replicates, n) index draw in NumPy, in chunks
+of CHUNK_REPS replicates spread over a process pool. Chunk seeds derive from the
+cohort key, so the CI does not depend on the number of jobs. Sensitivity: the same
+estimate with each cell's outliers (outside 1.5 IQR) left out.
+
+Without control data the method is pre_post (the treated change alone); without any
+rollups it is tracker (the tracker's baseline/current values, no CI).
+
+Results are cached by input hash (cohort spec, cell values, bootstrap settings): an
+unchanged cohort is read back from the cache, and its insurer evidence report is only
+rewritten when its hash differs from the one recorded in did_index.json.
+"""
+import csv
+import hashlib
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import BUNDLE_DIR
+from .heat import score_day
+from .ingest import utc_iso
+from .store import EventStore
+
+TRACKER_PATH = BUNDLE_DIR / "trackers" / "pilot_success_tracker.csv"
+TRACKER_FIELDS = ("date", "pilot_name", "site_or_cohort", "metric", "baseline_value", "current_value")
+METRIC_ALIASES = {"time_in_high_heat_minutes": "heat_high_minutes", "near_miss_count": "near_misses"}
+CELLS = ("treated_pre", "treated_post", "control_pre", "control_post")
+SIGNS = (-1.0, 1.0, 1.0, -1.0)  # DiD = (tp - tpre) - (cp - cpre), per cell in CELLS order
+PRE_DAYS = POST_DAYS = 14
+REPS = 2000
+CHUNK_REPS = 500
+CONFIDENCE = 0.95
+SEED = 7
+MAX_DRAW = 1 << 22  # index elements per bootstrap draw (bounds memory for large cells)
+CACHE_VERSION = 1
+RESULT_FIELDS = ["pilot", "cohort", "site", "metric", "rollup_metric", "method", "pre_start", "post_start",
+                 "post_end", "controls", "n_treated_pre", "n_treated_post", "n_control_pre", "n_control_post",
+                 "treated_pre_mean", "treated_post_mean", "control_pre_mean", "control_post_mean", "estimate",
+                 "se", "ci_low", "ci_high", "relative_pct", "estimate_excl_outliers", "tracker_baseline",
+                 "tracker_current", "tracker_delta_pct", "tracker_delta_ok", "input_hash"]
+
+def slug(name: str) -> str:
+    """'Site A' -> 'site-a' (site ids and file names)."""
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+def _number(text: str) -> Optional[float]:
+    text = (text or "").strip().rstrip("%")
+    return float(text) if text else None
+
+def load_tracker(path: Path = TRACKER_PATH) -> List[Dict[str, Any]]:
+    """Tracker rows as cohort specs; raises ValueError naming the row on bad values."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        missing = [c for c in TRACKER_FIELDS if c not in (reader.fieldnames or ())]
+        if missing:
+            raise ValueError(f"{path}: missing column(s) {', '.join(missing)}")
+        cohorts = []
+        for lineno, row in enumerate(reader, start=2):
+            try:
+                controls = [slug(c) for c in (row.get("control") or "").split(";") if c.strip()]
+                start = (row.get("intervention_start") or "").strip()
+                cohorts.append({
+                    "key": "/".join((slug(row["pilot_name"]), slug(row["site_or_cohort"]), row["metric"].strip())),
+                    "pilot": row["pilot_name"].strip(), "cohort": row["site_or_cohort"].strip(),
+                    "site": slug(row["site_or_cohort"]), "metric": row["metric"].strip(),
+                    "rollup_metric": METRIC_ALIASES.get(row["metric"].strip(), row["metric"].strip()),
+                    "date": date.fromisoformat(row["date"].strip()).isoformat(),
+                    "intervention_start": date.fromisoformat(start).isoformat() if start else None,
+                    "controls": controls or None,
+                    "baseline_value": _number(row["baseline_value"]), "current_value": _number(row["current_value"]),
+                    "delta_pct": _number(row.get("delta_pct", "")), "notes": (row.get("notes") or "").strip(),
+                })
+            except (ValueError, AttributeError) as e:
+                raise ValueError(f"{path}:{lineno}: {e}") from None
+    return cohorts
+
+def periods(cohort: Dict[str, Any], pre_days: int = PRE_DAYS,
+            post_days: int = POST_DAYS) -> Tuple[date, date, date]:
+    """(pre_start, post_start, post_end), half-open: pre [pre_start, post_start), post [post_start, post_end)."""
+    if cohort["intervention_start"]:
+        post_start = date.fromisoformat(cohort["intervention_start"])
+    else:
+        post_start = date.fromisoformat(cohort["date"]) - timedelta(days=post_days - 1)
+    return post_start - timedelta(days=pre_days), post_start, post_start + timedelta(days=post_days)
+
+# ---- rollups --------------------------------------------------------------------------
+
+class Rollups:
+    """Unit-day observations per metric; a later value for the same (site, unit, day) wins."""
+
+    def __init__(self):
+        self.rows: Dict[str, Dict[Tuple[str, str, str], float]] = defaultdict(dict)
+        self._columns: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+    def add(self, metric: str, site: str, unit: str, day: str, value: float) -> None:
+        self.rows[metric][(site, unit, day)] = float(value)
+        self._columns.pop(metric, None)
+
+    def columns(self, metric: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(site, day as datetime64[D], value) sorted by (site, unit, day)."""
+        cols = self._columns.get(metric)
+        if cols is None:
+            items = sorted(self.rows.get(metric, {}).items())
+            cols = self._columns[metric] = (
+                np.array([k[0] for k, _ in items], dtype=str),
+                np.array([k[2] for k, _ in items], dtype="datetime64[D]"),
+                np.array([v for _, v in items], dtype=float))
+        return cols
+
+    def sites(self, metric: str) -> List[str]:
+        return sorted({k[0] for k in self.rows.get(metric, ())})
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self.rows.values())
+
+def add_store(rollups: Rollups, store: EventStore, rules: Any, sites: Optional[Sequence[str]] = None,
+              start: Optional[float] = None, end: Optional[float] = None) -> None:
+    """heat_high_minutes per (site, sensor, day) from the store's env columns, one site at a time."""
+    for site in sorted({p[0] for p in store.partitions("site/env", sites, start, end)}):
+        env = store.read("site/env", ("ts", "sensor_id", "temp_c", "rh"), [site], start, end)
+        for sensor in np.unique(env["sensor_id"]).tolist():
+            sel = env["sensor_id"] == sensor
+            ts = env["ts"][sel]
+            _, minutes = score_day(ts, env["temp_c"][sel], env["rh"][sel], rules)
+            for day in np.unique(ts.astype("datetime64[s]").astype("datetime64[D]")).astype(str).tolist():
+                rollups.add("heat_high_minutes", site, sensor, day, minutes.get(day, 0.0))
+
+def add_evidence(rollups: Rollups, paths: Iterable[str]) -> None:
+    """Site-day metrics from evidence.csv exports (week, date, site_id, metric, value)."""
+    for path in paths:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                try:
+                    rollups.add(row["metric"], row["site_id"], row["site_id"], row["date"], float(row["value"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+
+def cohort_cells(cohort: Dict[str, Any], rollups: Rollups, pre_days: int = PRE_DAYS,
+                 post_days: int = POST_DAYS) -> Tuple[Dict[str, np.ndarray], List[str]]:
+    """The four DiD cells (values in (site, unit, day) order) and the control sites used."""
+    site, day, value = rollups.columns(cohort["rollup_metric"])
+    pre_start, post_start, post_end = (np.datetime64(d, "D") for d in periods(cohort, pre_days, post_days))
+    pre = (day >= pre_start) & (day < post_start)
+    post = (day >= post_start) & (day < post_end)
+    treated = site == cohort["site"]
+    controls = [s for s in (cohort["controls"] or rollups.sites(cohort["rollup_metric"])) if s != cohort["site"]]
+    control = np.isin(site, controls) if controls else np.zeros(len(site), dtype=bool)
+    cells = {"treated_pre": value[treated & pre], "treated_post": value[treated & post],
+             "control_pre": value[control & pre], "control_post": value[control & post]}
+    used = sorted(set(site[control & (pre | post)].tolist()))
+    if not (len(cells["control_pre"]) and len(cells["control_post"])):
+        cells["control_pre"] = cells["control_post"] = value[:0]
+        used = []
+    return cells, used
+
+# ---- estimation -----------------------------------------------------------------------
+
+def did_estimate(cells: Dict[str, np.ndarray]) -> float:
+    return float(sum(sign * cells[name].mean() for sign, name in zip(SIGNS, CELLS) if len(cells[name])))
+
+def trimmed(y: np.ndarray) -> np.ndarray:
+    """y without the values outside [q1 - 1.5 IQR, q3 + 1.5 IQR]."""
+    if len(y) < 4:
+        return y
+    q1, q3 = np.quantile(y, (0.25, 0.75))
+    fence = 1.5 * (q3 - q1)
+    return y[(y >= q1 - fence) & (y <= q3 + fence)]
+
+def chunk_seed(seed: int, key: str, chunk: int) -> np.random.SeedSequence:
+    return np.random.SeedSequence([seed, int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], "big"), chunk])
+
+def bootstrap_chunk(cells: Sequence[np.ndarray], reps: int, seed: np.random.SeedSequence) -> np.ndarray:
+    """`reps` DiD replicates; each cell resampled with replacement, whole replicate blocks per draw."""
+    rng = np.random.default_rng(seed)
+    est = np.zeros(reps)
+    for sign, y in zip(SIGNS, cells):
+        n = len(y)
+        if not n:
+            continue
+        step = max(1, MAX_DRAW // n)
+        for lo in range(0, reps, step):
+            hi = min(reps, lo + step)
+            est[lo:hi] += sign * y[rng.integers(0, n, size=(hi - lo, n))].mean(axis=1)
+    return est
+
+def input_hash(cohort: Dict[str, Any], cells: Dict[str, np.ndarray], controls: List[str],
+               settings: Dict[str, Any]) -> str:
+    h = hashlib.sha256(json.dumps({"version": CACHE_VERSION, "cohort": cohort, "controls": controls,
+                                   "settings": settings}, sort_keys=True).encode("utf-8"))
+    for name in CELLS:
+        y = np.ascontiguousarray(cells[name], dtype=float)
+        h.update(f"{name}:{len(y)}:".encode())
+        h.update(y.tobytes())
+    return h.hexdigest()
+
+def _round(x: Optional[float], digits: int = 4) -> Optional[float]:
+    return None if x is None or not np.isfinite(x) else round(float(x), digits)
+
+def summarize(cohort: Dict[str, Any], cells: Dict[str, np.ndarray], controls: List[str],
+              replicates: Optional[np.ndarray], confidence: float, settings: Dict[str, Any],
+              digest: str) -> Dict[str, Any]:
+    """One result row (RESULT_FIELDS) plus the settings it was computed with."""
+    pre_start, post_start, post_end = periods(cohort, settings["pre_days"], settings["post_days"])
+    base, cur = cohort["baseline_value"], cohort["current_value"]
+    tracker_delta = (cur - base) / base * 100.0 if base and cur is not None else None
+    r: Dict[str, Any] = {
+        "pilot": cohort["pilot"], "cohort": cohort["cohort"], "site": cohort["site"], "metric": cohort["metric"],
+        "rollup_metric": cohort["rollup_metric"], "pre_start": pre_start.isoformat(),
+        "post_start": post_start.isoformat(), "post_end": (post_end - timedelta(days=1)).isoformat(),
+        "controls": ";".join(controls), "tracker_baseline": base, "tracker_current": cur,
+        "tracker_delta_pct": cohort["delta_pct"],
+        "tracker_delta_ok": (abs(tracker_delta - cohort["delta_pct"]) <= 0.1
+                             if tracker_delta is not None and cohort["delta_pct"] is not None else None),
+        "notes": cohort["notes"], "input_hash": digest,
+    }
+    for name in CELLS:
+        r[f"n_{name}"] = int(len(cells[name]))
+        r[f"{name}_mean"] = _round(cells[name].mean()) if len(cells[name]) else None
+    if not (len(cells["treated_pre"]) and len(cells["treated_post"])):
+        r.update(method="tracker", estimate=_round(cur - base) if base is not None and cur is not None else None,
+                 se=None, ci_low=None, ci_high=None, relative_pct=_round(tracker_delta, 2),
+                 estimate_excl_outliers=None)
+    else:
+        est = did_estimate(cells)
+        alpha = 1.0 - confidence
+        lo, hi = np.quantile(replicates, (alpha / 2, 1 - alpha / 2))
+        pre_mean = cells["treated_pre"].mean()
+        r.update(method="did" if controls else "pre_post", estimate=_round(est),
+                 se=_round(replicates.std(ddof=1)), ci_low=_round(lo), ci_high=_round(hi),
+                 relative_pct=_round(est / pre_mean * 100.0, 2) if pre_mean else None,
+                 estimate_excl_outliers=_round(did_estimate({k: trimmed(v) for k, v in cells.items()})))
+    r["settings"] = settings
+    return r
+
+# ---- reports --------------------------------------------------------------------------
+
+def _fmt(x: Optional[float], spec: str = ".1f") -> str:
+    return "n/a" if x is None else format(x, spec)
+
+def render_report(r: Dict[str, Any]) -> str:
+    """The cohort's insurer evidence report (templates/Insurer_Evidence_Report_Template.md layout)."""
+    s = r["settings"]
+    lines = [f"# Safety Evidence Report — {r['pilot']}",
+             f"Period: {r['pre_start']} to {r['post_end']} (intervention from {r['post_start']})  "
+             f"Site: {r['cohort']} ({r['site']})",
+             "Highlights:"]
+    if r["method"] == "tracker":
+        lines.append(f"- {r['metric']} (baseline vs. intervention, pilot tracker): "
+                     f"{_fmt(r['tracker_baseline'], 'g')} vs. {_fmt(r['tracker_current'], 'g')} "
+                     f"({_fmt(r['relative_pct'], '+.1f')}%); no event rollups for this cohort, so no CI")
+    else:
+        unit = "sensor-day" if r["rollup_metric"] == "heat_high_minutes" else "site-day"
+        lines.append(f"- {r['metric']} (baseline vs. intervention): {_fmt(r['treated_pre_mean'], '.2f')} vs. "
+                     f"{_fmt(r['treated_post_mean'], '.2f')} per {unit} "
+                     f"(n = {r['n_treated_pre']} / {r['n_treated_post']})")
+        against = (f"vs. controls {r['controls'].replace(';', ', ')} "
+                   f"({_fmt(r['control_pre_mean'], '.2f')} -> {_fmt(r['control_post_mean'], '.2f')})"
+                   if r["method"] == "did" else "pre/post only (no control sites with data)")
+        lines.append(f"- Effect ({r['method']}, {against}): {_fmt(r['estimate'], '+.2f')} per {unit}, "
+                     f"{s['confidence']:.0%} CI {_fmt(r['ci_low'], '+.2f')} to {_fmt(r['ci_high'], '+.2f')} "
+                     f"({_fmt(r['relative_pct'], '+.1f')}% of baseline)")
+        lines.append(f"- Sensitivity, outliers excluded (1.5 IQR per cell): {_fmt(r['estimate_excl_outliers'], '+.2f')}")
+        if r["tracker_baseline"] is not None:
+            lines.append(f"- Pilot tracker: {_fmt(r['tracker_baseline'], 'g')} -> {_fmt(r['tracker_current'], 'g')} "
+                         f"({_fmt(r['tracker_delta_pct'], '+.1f')}%)")
+    method = ("baseline and current values as reported in the pilot tracker" if r["method"] == "tracker" else
+              f"difference-in-differences vs. matched pre-period ({s['pre_days']} d pre, {s['post_days']} d post), "
+              f"percentile bootstrap with {s['reps']} replicates (seed {s['seed']}); see templates/Methods_Note_DiD.md")
+    lines += [f"- Actions taken: {r['notes'] or 'n/a'}",
+              f"Method: {method}.",
+              f"Attachments: did_results.csv, alert logs, KPI snapshots. Inputs sha256 {r['input_hash']}.",
+              "Contact: Safety lead, Insurance broker.", ""]
+    return "\n".join(lines)
+
+def _write_text(path: Path, text: str) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+# ---- driver ---------------------------------------------------------------------------
+
+def analyze(cohorts: List[Dict[str, Any]], rollups: Rollups, out_dir: str, cache_dir: Optional[str] = None,
+            reps: int = REPS, confidence: float = CONFIDENCE, seed: int = SEED, pre_days: int = PRE_DAYS,
+            post_days: int = POST_DAYS, jobs: int = 1) -> Dict[str, Any]:
+    """Estimate every cohort, reusing cached results; write reports for changed cohorts and
+    did_results.csv/json for all. Returns the results and what was recomputed/rewritten."""
+    out = Path(out_dir)
+    cache = Path(cache_dir) if cache_dir else out / "cache"
+    reports = out / "reports"
+    for d in (out, cache, reports):
+        d.mkdir(parents=True, exist_ok=True)
+    settings = {"reps": reps, "chunk_reps": CHUNK_REPS, "confidence": confidence, "seed": seed,
+                "pre_days": pre_days, "post_days": post_days}
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(cohorts)
+    pending = []  # (index, cells, controls, digest)
+    for i, cohort in enumerate(cohorts):
+        cells, controls = cohort_cells(cohort, rollups, pre_days, post_days)
+        digest = input_hash(cohort, cells, controls, settings)
+        path = cache / f"{digest}.json"
+        if path.is_file():
+            with open(path, "r", encoding="utf-8") as f:
+                results[i] = json.load(f)
+        else:
+            pending.append((i, cells, controls, digest))
+
+    tasks = []  # (pending index, cells, reps, seed); fixed chunks, so any jobs gives the same replicates
+    for p, (i, cells, _, _) in enumerate(pending):
+        if len(cells["treated_pre"]) and len(cells["treated_post"]):
+            cell_list = [cells[name] for name in CELLS]
+            for c, lo in enumerate(range(0, reps, CHUNK_REPS)):
+                tasks.append((p, cell_list, min(CHUNK_REPS, reps - lo), chunk_seed(seed, cohorts[i]["key"], c)))
+    chunks: Dict[int, List[np.ndarray]] = defaultdict(list)
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as ex:
+            for t, est in zip(tasks, ex.map(bootstrap_chunk, *zip(*[t[1:] for t in tasks]))):
+                chunks[t[0]].append(est)
+    else:
+        for t in tasks:
+            chunks[t[0]].append(bootstrap_chunk(*t[1:]))
+    for p, (i, cells, controls, digest) in enumerate(pending):
+        r = summarize(cohorts[i], cells, controls, np.concatenate(chunks[p]) if p in chunks else None,
+                      confidence, settings, digest)
+        r["computed_at"] = utc_iso(time.time())
+        _write_text(cache / f"{digest}.json", json.dumps(r, indent=2, sort_keys=True) + "\n")
+        results[i] = r
+
+    index_path = out / "did_index.json"
+    index: Dict[str, str] = {}
+    if index_path.is_file():
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    written = []
+    for cohort, r in zip(cohorts, results):
+        name = cohort["key"].replace("/", "__") + ".md"
+        if index.get(name) != r["input_hash"] or not (reports / name).is_file():
+            _write_text(reports / name, render_report(r))
+            index[name] = r["input_hash"]
+            written.append(name)
+    _write_text(index_path, json.dumps(index, indent=2, sort_keys=True) + "\n")
+
+    tmp = out / "did_results.csv.tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+        w.writeheader()
+        w.writerows({k: "" if v is None else v for k, v in r.items()} for r in results)
+    os.replace(tmp, out / "did_results.csv")
+    _write_text(out / "did_results.json", json.dumps(results, indent=2) + "\n")
+    return {"cohorts": len(cohorts), "computed": len(pending), "cache_hits": len(cohorts) - len(pending),
+            "bootstrap_chunks": len(tasks), "reports_written": written,
+            "reports_unchanged": len(cohorts) - len(written), "results": results}
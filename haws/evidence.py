@@ -0,0 +1,474 @@
+"""
+haws.evidence — Weekly evidence export: evidence.csv plus a real kpi_snapshot.
+
+Inputs are JSONL: ingested events (bin/haws-ingest output, or raw stream lines),
+alerts (as served, with ts_ingest/ts_served), and optional UI telemetry
+({"alert_id", "action": "ack"|"explain", ...} or the spec's clicked_explain flag).
+
+1. split  one streaming pass routes each line to a per-day spool file by the date in
+          its ts_event/ts (a regex on the raw bytes, no decoding); lines outside the
+          ISO week are dropped
+2. days   each day is aggregated on its own (process pool with jobs > 1), reading its
+          spools in batches: events per topic, alerts per rule, heat_high_minutes per
+          sensor, acks/explain clicks, and an event_to_api latency histogram
+3. write  day results are consumed in date order and streamed into evidence.csv
+          (week, date, site_id, metric, value) through a writer that hashes as it
+          writes, so the sha256 needs no second read; the per-day aggregates are then
+          merged into the weekly kpi_snapshot
+
+Team views (alerts per worker-hour by team, role and hour) only leave through the
+privacy guard (haws.privacy): team_views.csv holds the banded n>=5 views, and
+privacy_audit.jsonl every show/suppress decision; privacy_guardrail_pass is derived
+from the rules and that audit.
+
+Memory is bounded by one day's heat readings per sensor plus the alert ids of a day.
+"""
+import csv
+import datetime
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .heat import score_day
+from .ingest import TOPICS, iter_batches, loads, parse_ts
+from .latency import KPI_STAGE, LatencyRecorder, LogHistogram
+from .privacy import DEFAULT_TEAM, Labels, Settings, group_views, guardrail_status, team_of
+from .rules import DEFAULT_RULES_PATH, load_rules
+from .store import EventStore, day_bounds
+
+KINDS = ("events", "alerts", "telemetry")
+EVIDENCE_FIELDS = ["week", "date", "site_id", "metric", "value"]
+TEAM_VIEW_FIELDS = ["week", "site_id", "team", "role", "window_start", "window_end", "metric", "band"]
+TEAM_METRICS = {"proximity": "near_misses", "geofence": "geofence_violations"}
+_DAY_RE = re.compile(rb'"(?:ts_event|ts|ts_click)"\s*:\s*"(\d{4}-\d{2}-\d{2})')
+
+def week_days(week: str) -> List[str]:
+    """'2025-29' (ISO year-week) -> the seven ISO dates, Monday first."""
+    year, _, num = week.partition("-")
+    return [datetime.date.fromisocalendar(int(year), int(num.lstrip("W")), d).isoformat() for d in range(1, 8)]
+
+class HashingWriter:
+    """Text sink that encodes, hashes and writes in one go (sha256 of the bytes on disk)."""
+
+    def __init__(self, f, encoding: str = "utf-8"):
+        self.f = f
+        self.encoding = encoding
+        self.sha256 = hashlib.sha256()
+        self.bytes = 0
+
+    def write(self, text: str) -> int:
+        data = text.encode(self.encoding)
+        self.sha256.update(data)
+        self.f.write(data)
+        self.bytes += len(data)
+        return len(text)
+
+    def hexdigest(self) -> str:
+        return self.sha256.hexdigest()
+
+class Artifact:
+    """A HashingWriter over <path>.tmp, moved into place by commit()."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.tmp = path.with_name(path.name + ".tmp")
+        self.raw = open(self.tmp, "wb")
+        self.sink = HashingWriter(self.raw)
+
+    def commit(self) -> None:
+        self.raw.flush()
+        os.fsync(self.raw.fileno())
+        self.raw.close()
+        os.replace(self.tmp, self.path)
+
+    def discard(self) -> None:
+        self.raw.close()
+        if self.tmp.exists():
+            self.tmp.unlink()
+
+# ---- 1. split -------------------------------------------------------------------------
+
+def split_by_day(sources: Dict[str, Iterable[str]], days: List[str], spool: Path) -> Dict[str, int]:
+    """Route lines of each kind's files into spool/<kind>/<day>.jsonl; returns line counts."""
+    wanted = {d.encode("ascii") for d in days}
+    counts: Counter = Counter()
+    for kind, paths in sources.items():
+        handles: Dict[bytes, Any] = {}
+        try:
+            for path in paths:
+                with open(path, "rb") as f:
+                    for lines in iter_batches(f):
+                        for line in lines:
+                            m = _DAY_RE.search(line)
+                            if m is None or m.group(1) not in wanted:
+                                counts[f"{kind}_skipped"] += 1
+                                if kind == "events" and b'"site/geofence"' in line:
+                                    counts["geofence_config"] += 1  # zone config is undated, still a feed
+                                continue
+                            day = m.group(1)
+                            out = handles.get(day)
+                            if out is None:
+                                (spool / kind).mkdir(parents=True, exist_ok=True)
+                                out = handles[day] = open(spool / kind / (day.decode() + ".jsonl"), "ab")
+                            out.write(line if line.endswith(b"\n") else line + b"\n")
+                            counts[kind] += 1
+        finally:
+            for out in handles.values():
+                out.close()
+    return dict(counts)
+
+def expand_inputs(paths: Iterable[str]) -> List[str]:
+    """Files as given; directories contribute their *.jsonl files (recursively, sorted)."""
+    out: List[str] = []
+    for p in paths:
+        if os.path.isdir(p):
+            out.extend(str(x) for x in sorted(Path(p).rglob("*.jsonl")))
+        else:
+            out.append(p)
+    return out
+
+# ---- 2. per-day aggregation -----------------------------------------------------------
+
+def _records(path: Path) -> Iterator[Dict[str, Any]]:
+    if not path.is_file():
+        return
+    with open(path, "rb") as f:
+        for lines in iter_batches(f):
+            for line in lines:
+                try:
+                    rec = loads(line)
+                except ValueError:
+                    continue
+                if type(rec) is dict:
+                    yield rec
+
+def _store_events(store: EventStore, day: str, window_s: float, metrics, topics, readings, presence,
+                  worker_role) -> None:
+    """The events part of aggregate_day from the columnar store: counts from segment
+    metadata, and only the env/worker columns the evidence needs."""
+    start, end = day_bounds(day)
+    for (site, topic), n in store.count(start=start, end=end).items():
+        if topic in TOPICS:
+            metrics[site][f"events_{topic.split('/', 1)[1]}"] += n
+            topics[site].add(topic)
+    for b in store.scan("site/env", ("ts", "sensor_id", "temp_c", "rh"), start=start, end=end):
+        codes = np.asarray(b["sensor_id"])
+        for code, sensor in enumerate(b.dictionaries["sensor_id"]):
+            sel = codes == code
+            if sel.any():
+                cols = readings.setdefault((b.site_id, sensor), ([], [], []))
+                cols[0].extend(b["ts"][sel].tolist())
+                cols[1].extend(b["temp_c"][sel].tolist())
+                cols[2].extend(b["rh"][sel].tolist())
+    for b in store.scan("site/worker", ("ts", "worker_id", "role"), start=start, end=end):
+        workers, roles = b.dictionaries["worker_id"], b.dictionaries["role"]
+        window = np.floor_divide(b["ts"], window_s).astype(np.int64)
+        first = int(window.min())
+        n_windows = int(window.max()) - first + 1
+        key = (np.asarray(b["worker_id"], dtype=np.int64) * len(roles) + b["role"]) * n_windows + (window - first)
+        uniq = np.unique(key)
+        w, r, win = uniq // (len(roles) * n_windows), (uniq // n_windows) % len(roles), uniq % n_windows
+        for i in np.argsort(win, kind="stable").tolist():  # in window order: a worker's latest role wins
+            wid, role = workers[w[i]], roles[r[i]] or "unknown"
+            team = team_of(wid)
+            worker_role[(b.site_id, wid)] = (role, team)
+            presence[b.site_id].add((wid, role, team, first + int(win[i])))
+
+def aggregate_day(day: str, spool: str, rules_path: str, default_site: str = "",
+                  store_root: Optional[str] = None) -> Dict[str, Any]:
+    """Aggregate one day's spools (events from the columnar store when store_root is
+    given). Picklable in and out, for the process pool."""
+    rules = load_rules(rules_path)
+    root = Path(spool)
+    metrics: Dict[str, Counter] = defaultdict(Counter)  # site -> metric -> value
+    topics: Dict[str, set] = defaultdict(set)
+    readings: Dict[Tuple[str, str], Tuple[List[float], List[float], List[float]]] = {}
+    privacy = Settings(rules)
+    presence: Dict[str, set] = defaultdict(set)  # site -> {(worker, role, team, window)}
+    worker_role: Dict[Tuple[str, str], Tuple[str, str]] = {}
+
+    if store_root:
+        _store_events(EventStore(store_root), day, privacy.window_s, metrics, topics, readings, presence, worker_role)
+    for rec in _records(root / "events" / f"{day}.jsonl"):
+        topic = rec.get("topic")
+        p = rec.get("payload")
+        if topic not in TOPICS or type(p) is not dict:
+            continue
+        site = rec.get("site_id") or default_site
+        metrics[site][f"events_{topic.split('/', 1)[1]}"] += 1
+        topics[site].add(topic)
+        if topic == "site/env":
+            try:
+                ts = parse_ts(rec.get("ts_event") or p["ts"])
+                cols = readings.setdefault((site, p["sensor_id"]), ([], [], []))
+                cols[0].append(ts)
+                cols[1].append(float(p["temp_c"]))
+                cols[2].append(float(p["rh"]))
+            except (KeyError, TypeError, ValueError):
+                metrics[site]["events_env_unscored"] += 1
+        elif topic == "site/worker" and "worker_id" in p:
+            wid = p["worker_id"]
+            role = p.get("role") or "unknown"
+            team = p.get("team") or team_of(wid)
+            worker_role[(site, wid)] = (role, team)
+            t = rec.get("ts_event") or p.get("ts")
+            if t:
+                presence[site].add((wid, role, team, int(parse_ts(t) // privacy.window_s)))
+
+    heat_sensor_days: Dict[str, int] = Counter()
+    for (site, sensor), (ts, temp_c, rh) in readings.items():
+        _, minutes = score_day(np.array(ts), np.array(temp_c), np.array(rh), rules)
+        metrics[site]["heat_high_minutes"] += minutes.get(day, 0.0)
+        heat_sensor_days[site] += 1
+    for site, n in heat_sensor_days.items():
+        metrics[site]["heat_sensors"] = n
+
+    latency = LatencyRecorder()
+    team_alerts: List[Tuple[str, str, float, str]] = []
+    alert_site: Dict[str, str] = {}
+    alert_rule: Dict[str, str] = {}
+    for a in _records(root / "alerts" / f"{day}.jsonl"):
+        site = a.get("site_id") or default_site
+        aid = a.get("alert_id")
+        if aid in alert_site:
+            continue  # the same alert served twice counts once
+        alert_site[aid] = site
+        alert_rule[aid] = a.get("rule", "unknown")
+        metrics[site]["alerts_total"] += 1
+        metrics[site][f"alerts_{a.get('rule', 'unknown')}"] += 1
+        if a.get("kind") == "proximity":
+            metrics[site]["near_misses"] += 1
+        latency.observe_record(a)
+        metric = TEAM_METRICS.get(a.get("kind"))
+        wid = a.get("worker_id")
+        if metric and wid:
+            team_alerts.append((site, wid, parse_ts(a["ts_event"]), metric))
+
+    geofence_ids = sorted(aid for aid, a_rule in alert_rule.items() if a_rule == "geofence_violation")
+    acked = set()
+    for t in _records(root / "telemetry" / f"{day}.jsonl"):
+        aid = t.get("alert_id")
+        site = alert_site.get(aid, t.get("site_id") or default_site)
+        action = t.get("action")
+        if action == "explain" or t.get("clicked_explain") is True:
+            metrics[site]["explain_clicks"] += 1
+        if action == "ack" and aid and aid not in acked:
+            acked.add(aid)
+            if alert_rule.get(aid) == "geofence_violation":
+                metrics[site]["geofence_acks"] += 1
+
+    team_views, audit = day_team_views(privacy, presence, worker_role, team_alerts)
+    for site, views in team_views.items():
+        metrics[site]["team_views_shown"] = len(views)
+    for entry in audit:
+        if entry["decision"] == "suppressed":
+            metrics[entry["site_id"]]["team_views_suppressed"] += 1
+
+    hists = {}
+    for (stage, site), by_slot in latency.slots.items():
+        if stage == KPI_STAGE:
+            merged = LogHistogram()
+            for h in by_slot.values():
+                merged.merge(h)
+            hists[site] = merged.to_dict()
+    return {"day": day, "metrics": {s: dict(m) for s, m in metrics.items()},
+            "topics": {s: sorted(t) for s, t in topics.items()}, "latency": hists,
+            # acks may land on a later day than the alert: matched across the week
+            "geofence_ids": geofence_ids, "acked_ids": sorted(acked),
+            "team_views": team_views, "privacy_audit": audit}
+
+def day_team_views(privacy: Settings, presence: Dict[str, set], worker_role: Dict[Tuple[str, str], Tuple[str, str]],
+                   team_alerts: List[Tuple[str, str, float, str]]):
+    """Banded team views of one day through the privacy guard (haws.privacy), per site."""
+    views: Dict[str, List[Dict[str, Any]]] = {}
+    audit: List[Dict[str, Any]] = []
+    for site in sorted(set(presence) | {a[0] for a in team_alerts}):
+        rows = [(w * privacy.window_s, wid, role, team, None) for wid, role, team, w in presence.get(site, ())]
+        for s, wid, t, metric in team_alerts:
+            if s == site:
+                role, team = worker_role.get((site, wid), ("unknown", DEFAULT_TEAM))
+                rows.append((t, wid, role, team, metric))
+        workers, teams, roles = Labels(), Labels(), Labels()
+        ts = np.array([r[0] for r in rows], dtype=float)
+        amounts = {m: np.array([1.0 if r[4] == m else 0.0 for r in rows]) for m in TEAM_METRICS.values()}
+        site_views, site_audit = group_views(privacy, ts, workers.codes(r[1] for r in rows),
+                                             teams.codes(r[3] for r in rows), roles.codes(r[2] for r in rows),
+                                             amounts, teams, roles, site_id=site)
+        views[site] = site_views
+        audit.extend(site_audit)
+    return views, audit
+
+# ---- 3. write + KPIs ------------------------------------------------------------------
+
+def day_rows(week: str, result: Dict[str, Any]) -> Iterator[List[Any]]:
+    for site in sorted(result["metrics"]):
+        m = result["metrics"][site]
+        hist = result["latency"].get(site)
+        if hist:
+            h = LogHistogram.from_dict(hist)
+            m = dict(m, latency_ms_event_to_api_p50=round(h.quantile(0.5), 1),
+                     latency_ms_event_to_api_p95=round(h.quantile(0.95), 1))
+        for metric in sorted(m):
+            value = m[metric]
+            yield [week, result["day"], site, metric, round(value, 1) if isinstance(value, float) else value]
+
+def team_view_rows(week: str, result: Dict[str, Any]) -> Iterator[List[Any]]:
+    for site in sorted(result["team_views"]):
+        for v in result["team_views"][site]:
+            for metric in sorted(v["metrics"]):
+                yield [week, site, v["team"], v["role"], v["window_start"], v["window_end"], metric,
+                       v["metrics"][metric]]
+
+class WeekTotals:
+    """Merges day results into the weekly kpi_snapshot."""
+
+    def __init__(self):
+        self.metrics: Counter = Counter()
+        self.topics: set = set()
+        self.latency = LogHistogram()
+        self.geofence_ids: set = set()
+        self.acked_ids: set = set()
+
+    def add(self, result: Dict[str, Any]) -> None:
+        for site, m in result["metrics"].items():
+            self.metrics.update(m)
+        for t in result["topics"].values():
+            self.topics.update(t)
+        for hist in result["latency"].values():
+            self.latency.merge(LogHistogram.from_dict(hist))
+        self.geofence_ids.update(result["geofence_ids"])
+        self.acked_ids.update(result["acked_ids"])
+
+    def kpi_snapshot(self, extra_latency: Optional[LatencyRecorder] = None) -> Dict[str, Any]:
+        m = self.metrics
+        feeds = self.topics & set(TOPICS)
+        latency = LogHistogram().merge(self.latency)
+        if extra_latency is not None:
+            # the whole week, not the recorder's rolling 24 h window
+            for (stage, _), by_slot in extra_latency.slots.items():
+                if stage == KPI_STAGE:
+                    for h in by_slot.values():
+                        latency.merge(h)
+        geofence_total = len(self.geofence_ids)
+        p50, p95 = latency.quantile(0.5), latency.quantile(0.95)
+        sensors = m.get("heat_sensors", 0)
+        return {
+            "feeds_integrated_pct": round(100.0 * len(feeds) / len(TOPICS), 1),
+            "latency_ms_event_to_api_p50": round(p50, 1) if p50 is not None else 0,
+            "latency_ms_event_to_api_p95": round(p95, 1) if p95 is not None else 0,
+            # minutes in the high band per sensor-day, averaged over the week
+            "heat_high_minutes": round(m.get("heat_high_minutes", 0.0) / sensors, 1) if sensors else 0,
+            "geofence_violations_ack_rate": round(len(self.geofence_ids & self.acked_ids) / geofence_total, 3)
+            if geofence_total else 0,
+            "explain_alert_click_rate": round(m.get("explain_clicks", 0) / m["alerts_total"], 3)
+            if m.get("alerts_total") else 0,
+            "evidence_report_generated": True,
+        }
+
+def starter_manifest(week: str) -> Dict[str, Any]:
+    """Same skeleton scripts/haws_new_week.sh writes."""
+    return {
+        "week": week,
+        "generated_at": "",
+        "artifacts": [],
+        "kpi_snapshot": {
+            "feeds_integrated_pct": 0, "latency_ms_event_to_api_p50": 0, "latency_ms_event_to_api_p95": 0,
+            "alert_precision_proxy_sim": 0, "heat_high_minutes": 0, "geofence_violations_ack_rate": 0,
+            "explain_alert_click_rate": 0, "evidence_report_generated": False,
+            "privacy_guardrail_pass": "pass", "copilot_triggers_demo": {"heat_forecast": 0, "new_hire_stub": 0},
+        },
+    }
+
+def export_week(week: str, out_dir: str, events: Iterable[str] = (), alerts: Iterable[str] = (),
+                telemetry: Iterable[str] = (), latency_exports: Iterable[str] = (), jobs: int = 1,
+                rules_path: str = str(DEFAULT_RULES_PATH), site_id: str = "",
+                manifest_rel: Optional[str] = None, spool_dir: Optional[str] = None,
+                store: Optional[str] = None) -> Dict[str, Any]:
+    """Write <out_dir>/evidence.csv and update <out_dir>/manifest.json; returns the manifest.
+
+    With store (a haws.store directory), events are read from its site/day partitions,
+    only the columns needed, instead of being split from JSONL.
+
+    manifest_rel is the directory recorded in artifact paths (default
+    reports/weekly/<week>, as in the metrics spec).
+    """
+    days = week_days(week)
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    spool = Path(tempfile.mkdtemp(prefix="haws-evidence-", dir=spool_dir))
+    try:
+        counts = split_by_day({"events": expand_inputs(events), "alerts": expand_inputs(alerts),
+                               "telemetry": expand_inputs(telemetry)}, days, spool)
+        totals = WeekTotals()
+        if counts.get("geofence_config") or (store and EventStore(store).count("site/geofence")):
+            totals.topics.add("site/geofence")
+        rules = load_rules(rules_path)
+        evidence = Artifact(out / "evidence.csv")
+        team_views = Artifact(out / "team_views.csv")
+        privacy_audit = Artifact(out / "privacy_audit.jsonl")
+        audit: List[Dict[str, Any]] = []
+        try:
+            w = csv.writer(evidence.sink, lineterminator="\n")
+            w.writerow(EVIDENCE_FIELDS)
+            tv = csv.writer(team_views.sink, lineterminator="\n")
+            tv.writerow(TEAM_VIEW_FIELDS)
+
+            def consume(result):
+                w.writerows(day_rows(week, result))
+                tv.writerows(team_view_rows(week, result))
+                for entry in result["privacy_audit"]:
+                    privacy_audit.sink.write(json.dumps(entry, sort_keys=True) + "\n")
+                audit.extend(e for e in result["privacy_audit"] if e["decision"] == "shown")
+                totals.add(result)
+
+            args = [(day, str(spool), rules_path, site_id, store) for day in days]
+            if jobs > 1:
+                with ProcessPoolExecutor(max_workers=jobs) as ex:
+                    for result in ex.map(aggregate_day, *zip(*args)):  # in date order
+                        consume(result)
+            else:
+                for a in args:
+                    consume(aggregate_day(*a))
+        except BaseException:
+            for artifact in (evidence, team_views, privacy_audit):
+                artifact.discard()
+            raise
+        for artifact in (evidence, team_views, privacy_audit):
+            artifact.commit()
+    finally:
+        shutil.rmtree(spool, ignore_errors=True)
+
+    extra = LatencyRecorder.load(latency_exports) if latency_exports else None
+    manifest_path = out / "manifest.json"
+    if manifest_path.is_file():
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    else:
+        manifest = starter_manifest(week)
+    rel = manifest_rel or f"reports/weekly/{week}"
+    manifest["week"] = week
+    manifest["generated_at"] = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    written = [(t, f"{rel}/{a.path.name}", a.sink) for t, a in
+               (("csv", evidence), ("csv", team_views), ("jsonl", privacy_audit))]
+    paths = {path for _, path, _ in written}
+    manifest["artifacts"] = ([{"type": t, "path": path, "sha256": sink.hexdigest()} for t, path, sink in written]
+                             + [a for a in manifest.get("artifacts", []) if a.get("path") not in paths])
+    snapshot = manifest.setdefault("kpi_snapshot", {})
+    snapshot.update(totals.kpi_snapshot(extra))
+    snapshot["privacy_guardrail_pass"] = guardrail_status(Settings(rules), audit)
+    manifest["export_stats"] = {"lines": counts, "evidence_bytes": evidence.sink.bytes}
+    tmp_manifest = out / "manifest.json.tmp"
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    os.replace(tmp_manifest, manifest_path)
+    return manifest
@@ -0,0 +1,244 @@
+"""
+haws.geofence — Geofence and task-zone index with batched point-in-polygon tests.
+
+Zones come from two topics:
+- site/geofence: {zone_id, type, polygon}; always active, severity from
+  geofence.violation_severity[type] in risk_rules.yaml
+- site/context:  {date, task_zones: [{zone_id, polygon, start, end}]}; active from
+  start to end (HH:MM, UTC) on that date. A newer context for the same date replaces
+  that date's task zones.
+
+Each polygon is compiled once into edge arrays plus a bounding box, and the bbox is
+registered in every cell of a coarse bucket grid (one level of an R-tree, flattened).
+A batch of positions is bucketed by cell with one argsort; each zone then tests only
+the points in its cells, bbox first, then an even-odd ray cast vectorized over points.
+Zone events swap single zones in and out of the buckets; nothing is rebuilt.
+A site with only a handful of zones skips the bucketing and scans them directly.
+"""
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .ingest import parse_ts, utc_iso
+from .proximity import alert_id
+from .rules import as_ruleset
+
+BUCKET_M = 25.0
+SCAN_ZONES = 8  # up to this many zones a direct bbox scan beats bucketing
+TASK_ZONE_TYPE = "task_zone"
+
+class Zone:
+    """A compiled polygon: bbox, edge arrays and its activation window (epoch s)."""
+    __slots__ = ("zone_id", "type", "severity", "xmin", "ymin", "xmax", "ymax",
+                 "x1", "y1", "y2", "slope", "start", "end", "date", "cells")
+
+    def __init__(self, zone_id: str, ztype: str, polygon: List[Dict[str, float]], zone_severity: str,
+                 start: float = -math.inf, end: float = math.inf, date: Optional[str] = None):
+        xs = np.array([float(p["x"]) for p in polygon])
+        ys = np.array([float(p["y"]) for p in polygon])
+        xj, yj = np.roll(xs, -1), np.roll(ys, -1)
+        dy = yj - ys
+        self.zone_id = zone_id
+        self.type = ztype
+        self.severity = zone_severity
+        self.xmin, self.xmax = float(xs.min()), float(xs.max())
+        self.ymin, self.ymax = float(ys.min()), float(ys.max())
+        self.x1, self.y1, self.y2 = xs, ys, yj
+        # horizontal edges never cross the ray; their slope is never used
+        self.slope = np.divide(xj - xs, dy, out=np.zeros_like(dy), where=dy != 0)
+        self.start, self.end, self.date = start, end, date
+        self.cells: List[Tuple[int, int]] = []
+
+    def active(self, t: float) -> bool:
+        return self.start <= t < self.end
+
+    def contains(self, px: np.ndarray, py: np.ndarray) -> np.ndarray:
+        """Even-odd rule, vectorized over points (loop over the polygon's few edges)."""
+        inside = np.zeros(px.shape, dtype=bool)
+        for x1, y1, y2, slope in zip(self.x1.tolist(), self.y1.tolist(), self.y2.tolist(), self.slope.tolist()):
+            if y1 == y2:
+                continue
+            crosses = (y1 > py) != (y2 > py)
+            inside ^= crosses & (px < (py - y1) * slope + x1)
+        return inside
+
+def window(date: str, start: Optional[str], end: Optional[str]) -> Tuple[float, float]:
+    """HH:MM start/end on an ISO date -> epoch seconds; an end before start wraps past midnight."""
+    day = parse_ts(f"{date}T00:00:00Z")
+    lo = day + _minutes(start) * 60 if start else day
+    hi = day + _minutes(end) * 60 if end else day + 86400
+    if hi <= lo:
+        hi += 86400
+    return lo, hi
+
+def _minutes(hhmm: str) -> int:
+    h, _, m = hhmm.partition(":")
+    return int(h) * 60 + int(m or 0)
+
+class GeofenceEngine:
+    """Zone index plus batched containment and violation alerts."""
+
+    def __init__(self, rules: Any, bucket_m: float = BUCKET_M, site_id: str = ""):
+        self.rules = as_ruleset(rules)
+        self.bucket_m = bucket_m
+        self.site_id = site_id
+        self.zones: Dict[str, Zone] = {}
+        self.buckets: Dict[Tuple[int, int], Dict[str, Zone]] = {}
+        self.context_zones: Dict[str, List[str]] = {}   # date -> task zone ids
+        self.active_hits: Dict[Tuple[str, str], str] = {}
+        self.version = 0
+
+    def apply_rules(self, rules: Any) -> None:
+        """Swap in new rules; zones already loaded take their new severity."""
+        self.rules = as_ruleset(rules)
+        for zone in self.zones.values():
+            zone.severity = self.rules.zone_severity_of(zone.type)
+
+    # ---- index maintenance -------------------------------------------------------
+    def _cells(self, zone: Zone) -> List[Tuple[int, int]]:
+        b = self.bucket_m
+        return [(cx, cy)
+                for cx in range(int(math.floor(zone.xmin / b)), int(math.floor(zone.xmax / b)) + 1)
+                for cy in range(int(math.floor(zone.ymin / b)), int(math.floor(zone.ymax / b)) + 1)]
+
+    def put_zone(self, zone: Zone) -> None:
+        self.remove_zone(zone.zone_id)
+        zone.cells = self._cells(zone)
+        for cell in zone.cells:
+            self.buckets.setdefault(cell, {})[zone.zone_id] = zone
+        self.zones[zone.zone_id] = zone
+        self.version += 1
+
+    def remove_zone(self, zone_id: str) -> None:
+        zone = self.zones.pop(zone_id, None)
+        if zone is None:
+            return
+        for cell in zone.cells:
+            members = self.buckets.get(cell)
+            if members is not None:
+                members.pop(zone_id, None)
+                if not members:
+                    del self.buckets[cell]
+        self.version += 1
+
+    def update(self, event: Dict[str, Any]) -> bool:
+        """Hot-reload zones from a site/geofence or site/context event."""
+        topic = event.get("topic")
+        p = event.get("payload") or {}
+        if topic == "site/geofence":
+            ztype = p.get("type", "")
+            self.put_zone(Zone(p["zone_id"], ztype, p["polygon"], self.rules.zone_severity_of(ztype)))
+            return True
+        if topic == "site/context":
+            date = p["date"]
+            fresh = []
+            for tz in p.get("task_zones") or []:
+                lo, hi = window(date, tz.get("start"), tz.get("end"))
+                self.put_zone(Zone(tz["zone_id"], TASK_ZONE_TYPE, tz["polygon"],
+                                   self.rules.zone_severity_of(TASK_ZONE_TYPE),
+                                   start=lo, end=hi, date=date))
+                fresh.append(tz["zone_id"])
+            for zone_id in self.context_zones.get(date, []):
+                zone = self.zones.get(zone_id)
+                if zone_id not in fresh and zone is not None and zone.date == date:
+                    self.remove_zone(zone_id)
+            self.context_zones[date] = fresh
+            return True
+        return False
+
+    def update_many(self, events: Iterable[Dict[str, Any]]) -> int:
+        return sum(1 for e in events if self.update(e))
+
+    # ---- queries -----------------------------------------------------------------
+    def locate(self, px: np.ndarray, py: np.ndarray, t: float,
+               mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, List[Zone]]:
+        """All (point index, zone) containments among zones active at t.
+
+        Returns (point_idx, zones) with zones[i] the zone holding point point_idx[i].
+        mask limits the test to some points (e.g. live slots of a haws.livestate
+        table), so callers can pass whole columns without copying them.
+        """
+        px = np.asarray(px, dtype=float)
+        py = np.asarray(py, dtype=float)
+        if not len(px) or not self.buckets:
+            return np.empty(0, dtype=np.intp), []
+        points = np.arange(len(px)) if mask is None else np.flatnonzero(mask)
+        if not len(points):
+            return np.empty(0, dtype=np.intp), []
+        if len(self.zones) <= SCAN_ZONES:
+            return self._test(px, py, {z.zone_id: [points] for z in self.zones.values() if z.active(t)})
+        b = self.bucket_m
+        cx = np.floor(px[points] / b).astype(np.int64)
+        cy = np.floor(py[points] / b).astype(np.int64)
+        # points grouped by cell: one sort, then contiguous runs
+        by_cell = np.lexsort((cy, cx))
+        order = points[by_cell]
+        scx, scy = cx[by_cell], cy[by_cell]
+        edges = np.flatnonzero((np.diff(scx) != 0) | (np.diff(scy) != 0)) + 1
+        starts = np.concatenate(([0], edges))
+        stops = np.concatenate((edges, [len(order)]))
+
+        per_zone: Dict[str, List[np.ndarray]] = {}
+        for lo, hi in zip(starts.tolist(), stops.tolist()):
+            members = self.buckets.get((int(scx[lo]), int(scy[lo])))
+            if not members:
+                continue
+            for zone_id, zone in members.items():
+                if zone.active(t):
+                    per_zone.setdefault(zone_id, []).append(order[lo:hi])
+        return self._test(px, py, per_zone)
+
+    def _test(self, px: np.ndarray, py: np.ndarray,
+              per_zone: Dict[str, List[np.ndarray]]) -> Tuple[np.ndarray, List[Zone]]:
+        """bbox + polygon test of each zone's candidate point indices."""
+        hits_idx: List[np.ndarray] = []
+        zones: List[Zone] = []
+        for zone_id, chunks in per_zone.items():
+            zone = self.zones[zone_id]
+            idx = np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+            qx, qy = px[idx], py[idx]
+            box = (qx >= zone.xmin) & (qx <= zone.xmax) & (qy >= zone.ymin) & (qy <= zone.ymax)
+            if not box.any():
+                continue
+            idx, qx, qy = idx[box], qx[box], qy[box]
+            inside = idx[zone.contains(qx, qy)]
+            if len(inside):
+                hits_idx.append(inside)
+                zones.extend([zone] * len(inside))
+        if not hits_idx:
+            return np.empty(0, dtype=np.intp), []
+        return np.concatenate(hits_idx), zones
+
+    def score(self, ids: List[str], px: np.ndarray, py: np.ndarray, t: float,
+              entity: str = "worker", mask: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Violation alerts for positions at time t; fires once per (entity, zone) entry.
+
+        Call once per tick per entity kind (workers, equipment); exits are detected
+        against the previous call for the same kind. With mask, only those points count.
+        """
+        point_idx, zones = self.locate(px, py, t, mask)
+        alerts: List[Dict[str, Any]] = []
+        current: Dict[Tuple[str, str], str] = {}
+        for i, zone in zip(point_idx.tolist(), zones):
+            key = (ids[i], zone.zone_id)
+            current[key] = entity
+            if key in self.active_hits:
+                continue
+            alerts.append({
+                "alert_id": alert_id("geofence_violation", ids[i], zone.zone_id, t),
+                "kind": "geofence",
+                "rule": "geofence_violation",
+                "severity": zone.severity,
+                "site_id": self.site_id,
+                "ts_event": utc_iso(t),
+                f"{entity}_id": ids[i],
+                "zone_id": zone.zone_id,
+                "zone_type": zone.type,
+                "explain": f"{entity} {ids[i]} inside {zone.type or 'zone'} {zone.zone_id}"
+                           + (f" (active {utc_iso(zone.start)}–{utc_iso(zone.end)})" if zone.date else ""),
+            })
+        # keep other entity kinds' state; replace this kind's
+        self.active_hits = {k: v for k, v in self.active_hits.items() if v != entity}
+        self.active_hits.update(current)
+        return alerts
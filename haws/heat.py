@@ -0,0 +1,269 @@
+"""
+haws.heat — Heat Index scoring for site/env readings, streaming and batch.
+
+Heat Index is the NWS formula (Rothfusz regression with its low/high humidity
+adjustments) on temp_c converted to °F and rh in %. Bands follow the heat block of
+risk_rules.yaml: HI >= advisory_start_hi is advisory, HI >= critical_hi is critical.
+
+- An alert (heat_advisory / heat_critical) fires once the band has held for
+  min_duration_min without a gap longer than MAX_GAP_S between readings; a critical
+  alert also settles the advisory for that run. Dropping below the band re-arms it.
+- heat_high_minutes (metrics spec KPI) is time spent at advisory or above per
+  sensor and UTC day: each reading's band holds until the next reading, capped at
+  MAX_GAP_S.
+
+HeatScorer does this per sensor with amortized O(1) work per reading (run-start
+tracking plus a ring buffer for the windowed mean HI, doubled when a window holds
+more readings than it has slots). score_day() does the same over a whole day
+as NumPy arrays, and backfill_high_minutes() runs it over historical JSONL files.
+"""
+import math
+from collections import defaultdict
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .ingest import iter_batches, loads, parse_ts, utc_iso
+from .proximity import alert_id
+from .rules import as_ruleset
+
+MAX_GAP_S = 300.0
+RING_CAPACITY = 256  # initial ring size; grows to hold the whole window
+LEVELS = ((2, "heat_critical"), (1, "heat_advisory"))
+
+HighMinutes = Dict[Tuple[str, str, str], float]  # (site_id, sensor_id, YYYY-MM-DD) -> minutes
+
+def heat_index_f(temp_c: float, rh: float) -> float:
+    """NWS Heat Index (°F) for one reading."""
+    t = temp_c * 9.0 / 5.0 + 32.0
+    simple = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + rh * 0.094)
+    if (simple + t) / 2.0 < 80.0:
+        return simple
+    hi = (-42.379 + 2.04901523 * t + 10.14333127 * rh - 0.22475541 * t * rh
+          - 0.00683783 * t * t - 0.05481717 * rh * rh + 0.00122874 * t * t * rh
+          + 0.00085282 * t * rh * rh - 0.00000199 * t * t * rh * rh)
+    if rh < 13.0 and 80.0 <= t <= 112.0:
+        hi -= ((13.0 - rh) / 4.0) * math.sqrt((17.0 - abs(t - 95.0)) / 17.0)
+    elif rh > 85.0 and 80.0 <= t <= 87.0:
+        hi += ((rh - 85.0) / 10.0) * ((87.0 - t) / 5.0)
+    return hi
+
+def heat_index_f_array(temp_c: np.ndarray, rh: np.ndarray) -> np.ndarray:
+    """Vectorized heat_index_f()."""
+    t = np.asarray(temp_c, dtype=float) * 9.0 / 5.0 + 32.0
+    rh = np.asarray(rh, dtype=float)
+    simple = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + rh * 0.094)
+    hi = (-42.379 + 2.04901523 * t + 10.14333127 * rh - 0.22475541 * t * rh
+          - 0.00683783 * t * t - 0.05481717 * rh * rh + 0.00122874 * t * t * rh
+          + 0.00085282 * t * rh * rh - 0.00000199 * t * t * rh * rh)
+    in_range = (t >= 80.0) & (t <= 112.0)
+    dry = (rh < 13.0) & in_range
+    hi = np.where(dry, hi - ((13.0 - rh) / 4.0) * np.sqrt(np.clip(17.0 - np.abs(t - 95.0), 0, None) / 17.0), hi)
+    humid = (rh > 85.0) & (t >= 80.0) & (t <= 87.0) & ~dry
+    hi = np.where(humid, hi + ((rh - 85.0) / 10.0) * ((87.0 - t) / 5.0), hi)
+    return np.where((simple + t) / 2.0 < 80.0, simple, hi)
+
+def thresholds(rules: Any) -> Tuple[float, float, float]:
+    """(advisory HI, critical HI, minimum duration in s) from raw rules or a Ruleset."""
+    rs = as_ruleset(rules)
+    return rs.heat_advisory, rs.heat_critical, rs.heat_min_duration_s
+
+def day_of(ts: float) -> str:
+    return utc_iso(ts)[:10]
+
+class SensorState:
+    """Per-sensor streaming state: current runs, last reading and the HI ring buffer."""
+    __slots__ = ("last_ts", "last_band", "since", "alerted", "ring_ts", "ring_hi", "head", "size", "hi_sum")
+
+    def __init__(self, capacity: int = RING_CAPACITY):
+        self.last_ts = -math.inf
+        self.last_band = 0
+        self.since = [math.inf, math.inf, math.inf]   # run start per band level (index 1, 2)
+        self.alerted = [False, False, False]
+        self.ring_ts = [0.0] * capacity
+        self.ring_hi = [0.0] * capacity
+        self.head = 0
+        self.size = 0
+        self.hi_sum = 0.0
+
+    def _grow(self) -> None:
+        """Double the ring, oldest reading first (a full ring still all inside the window)."""
+        cap = len(self.ring_ts)
+        order = [(self.head + i) % cap for i in range(self.size)]
+        self.ring_ts = [self.ring_ts[i] for i in order] + [0.0] * cap
+        self.ring_hi = [self.ring_hi[i] for i in order] + [0.0] * cap
+        self.head = 0
+
+    def push(self, ts: float, hi: float, window_s: float) -> float:
+        """Add a reading, drop readings older than the window; returns the window mean HI."""
+        cap = len(self.ring_ts)
+        while self.size and self.ring_ts[self.head] < ts - window_s:
+            self.hi_sum -= self.ring_hi[self.head]
+            self.head = (self.head + 1) % cap
+            self.size -= 1
+        if self.size == cap:
+            self._grow()
+            cap = len(self.ring_ts)
+        tail = (self.head + self.size) % cap
+        self.ring_ts[tail] = ts
+        self.ring_hi[tail] = hi
+        self.size += 1
+        self.hi_sum += hi
+        return self.hi_sum / self.size
+
+class HeatScorer:
+    """Streaming per-sensor Heat Index scorer."""
+
+    def __init__(self, rules: Any, site_id: str = "", max_gap_s: float = MAX_GAP_S):
+        self.apply_rules(rules)
+        self.site_id = site_id
+        self.max_gap_s = max_gap_s
+        self.sensors: Dict[Tuple[str, str], SensorState] = {}
+        self.high_minutes: HighMinutes = defaultdict(float)
+
+    def apply_rules(self, rules: Any) -> None:
+        """New thresholds; runs in progress are judged by them from the next reading."""
+        self.rules = as_ruleset(rules)
+        self.advisory, self.critical, self.min_duration_s = thresholds(self.rules)
+
+    def band(self, hi: float) -> int:
+        return 2 if hi >= self.critical else 1 if hi >= self.advisory else 0
+
+    def update(self, event: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Score one ingest event (non site/env events are ignored)."""
+        if event.get("topic") != "site/env":
+            return []
+        p = event["payload"]
+        return self.observe(p["sensor_id"], parse_ts(event["ts_event"]), p["temp_c"], p["rh"],
+                            event.get("site_id") or self.site_id)
+
+    def observe(self, sensor_id: str, ts: float, temp_c: float, rh: float,
+                site_id: str = "") -> List[Dict[str, Any]]:
+        key = (site_id, sensor_id)
+        st = self.sensors.get(key)
+        if st is None:
+            st = self.sensors[key] = SensorState()
+        if ts < st.last_ts:
+            return []  # late reading: the runs have moved on
+        hi = heat_index_f(temp_c, rh)
+        band = self.band(hi)
+        mean_hi = st.push(ts, hi, self.min_duration_s)
+
+        gap = ts - st.last_ts
+        if st.last_band and gap > 0:
+            self.high_minutes[(site_id, sensor_id, day_of(st.last_ts))] += min(gap, self.max_gap_s) / 60.0
+        broken = gap > self.max_gap_s
+        for level in (1, 2):
+            if band >= level and not broken and st.since[level] != math.inf:
+                continue  # run goes on
+            st.since[level] = ts if band >= level else math.inf
+            st.alerted[level] = False
+        st.last_ts = ts
+        st.last_band = band
+
+        for level, rule in LEVELS:
+            if band >= level and not st.alerted[level] and ts - st.since[level] >= self.min_duration_s:
+                for lower in range(1, level + 1):
+                    st.alerted[lower] = True
+                return [{
+                    "alert_id": alert_id(rule, site_id, sensor_id, ts),
+                    "kind": "heat",
+                    "rule": rule,
+                    "severity": self.rules.severity_of(rule),
+                    "site_id": site_id,
+                    "ts_event": utc_iso(ts),
+                    "sensor_id": sensor_id,
+                    "heat_index_f": round(hi, 1),
+                    "heat_index_window_mean_f": round(mean_hi, 1),
+                    "explain": (f"Heat Index {hi:.0f}°F at {sensor_id}, at or above "
+                                f"{self.critical if level == 2 else self.advisory:g}°F for "
+                                f"{(ts - st.since[level]) / 60.0:.0f} min (min {self.min_duration_s / 60.0:g})"),
+                }]
+        return []
+
+def score_day(ts: np.ndarray, temp_c: np.ndarray, rh: np.ndarray, rules: Dict[str, Any],
+              max_gap_s: float = MAX_GAP_S) -> Tuple[List[Tuple[float, str, float]], Dict[str, float]]:
+    """Batch-score one sensor's readings (any span; sorted here by ts).
+
+    Returns ([(ts, rule, heat_index_f), ...] alerts, {YYYY-MM-DD: high minutes}) matching
+    what HeatScorer emits for the same readings in order.
+    """
+    advisory, critical, min_duration_s = thresholds(rules)
+    ts = np.asarray(ts, dtype=float)
+    order = np.argsort(ts, kind="stable")
+    ts = ts[order]
+    hi = heat_index_f_array(np.asarray(temp_c)[order], np.asarray(rh)[order])
+    band = np.where(hi >= critical, 2, np.where(hi >= advisory, 1, 0))
+    n = len(ts)
+    if not n:
+        return [], {}
+
+    gaps = np.diff(ts)
+    minutes: Dict[str, float] = defaultdict(float)
+    credited = np.minimum(gaps, max_gap_s) * (band[:-1] > 0) / 60.0
+    if credited.any():
+        days = np.array([day_of(t) for t in ts[:-1]])
+        for day in np.unique(days[credited > 0]):
+            minutes[str(day)] += float(credited[days == day].sum())
+
+    broken = np.concatenate(([True], gaps > max_gap_s))
+    run_ids = {}
+    firsts = {}
+    for level in (1, 2):
+        mask = band >= level
+        starts = mask & (broken | ~np.concatenate(([False], mask[:-1])))
+        run_id = np.cumsum(starts)
+        run_start = np.where(starts, ts, 0.0)
+        run_start = np.maximum.accumulate(run_start)  # ts is sorted: latest start so far
+        qualifies = mask & (ts - run_start >= min_duration_s)
+        idx = np.flatnonzero(qualifies)
+        # first qualifying reading of each run
+        _, first = np.unique(run_id[idx], return_index=True)
+        firsts[level] = idx[first]
+        run_ids[level] = np.where(mask, run_id, -1)
+
+    alerts: List[Tuple[float, str, float]] = [(float(ts[i]), "heat_critical", float(hi[i])) for i in firsts[2]]
+    critical_at = {int(run_ids[1][i]): int(i) for i in firsts[2][::-1]}  # earliest critical per advisory run
+    for i in firsts[1]:
+        j = critical_at.get(int(run_ids[1][i]))
+        if j is None or j > i:
+            alerts.append((float(ts[i]), "heat_advisory", float(hi[i])))
+    alerts.sort()
+    return alerts, dict(minutes)
+
+def _env_reading(line: bytes) -> Optional[Tuple[str, str, float, float, float]]:
+    if b'"site/env"' not in line:  # cheap pre-filter before decoding
+        return None
+    try:
+        record = loads(line)
+        if record.get("topic") != "site/env":
+            return None
+        p = record["payload"]
+        ts = record.get("ts_event") or p["ts"]
+        return record.get("site_id") or "", p["sensor_id"], parse_ts(ts), float(p["temp_c"]), float(p["rh"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+def backfill_high_minutes(streams: Iterable[BinaryIO], rules: Dict[str, Any],
+                          site_id: str = "", max_gap_s: float = MAX_GAP_S) -> HighMinutes:
+    """heat_high_minutes per (site, sensor, day) from raw or ingested JSONL streams."""
+    columns: Dict[Tuple[str, str], Tuple[List[float], List[float], List[float]]] = {}
+    for stream in streams:
+        for lines in iter_batches(stream):
+            for line in lines:
+                r = _env_reading(line)
+                if r is None:
+                    continue
+                key = (r[0] or site_id, r[1])
+                cols = columns.get(key)
+                if cols is None:
+                    cols = columns[key] = ([], [], [])
+                cols[0].append(r[2])
+                cols[1].append(r[3])
+                cols[2].append(r[4])
+    out: HighMinutes = {}
+    for (site, sensor), (ts, temp_c, rh) in sorted(columns.items()):
+        _, minutes = score_day(np.array(ts), np.array(temp_c), np.array(rh), rules, max_gap_s)
+        for day, m in sorted(minutes.items()):
+            out[(site, sensor, day)] = m
+    return out
@@ -0,0 +1,250 @@
+"""
+haws.ingest — Streaming JSONL ingest for the site/* event topics.
+
+Reads `{"topic": ..., "payload": {...}}` lines (haws_bundle_v1/samples/sample_stream.jsonl)
+from files or stdin in batches, validates each payload against its topic's example in
+schemas/ingest_schema.json, stamps the required event fields from metrics_spec_v0_1.md
+(event_id, site_id, ts_event, ts_ingest) and routes the events to one sink per topic.
+
+Design:
+- Lines are read in byte batches (readlines with a size hint) and decoded with orjson
+  when installed, else the stdlib json module.
+- Validators are generated Python source per topic, compiled once: one flat function
+  of type checks per topic instead of walking the schema for every record.
+- ts_ingest is taken once per batch; event_id is a name-based UUID of site + line, so
+  re-ingesting the same file yields the same IDs (an `event_id` on the line is kept).
+
+The example payload is the contract: every key it shows is required, numbers accept
+int or float, and lists of objects are checked element by element.
+"""
+import hashlib
+import sys
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import BUNDLE_DIR
+
+try:
+    import orjson as _json_impl
+    loads = _json_impl.loads
+
+    def dumps(obj: Any) -> bytes:
+        return _json_impl.dumps(obj)
+except ImportError:  # stdlib fallback
+    import json as _json_impl
+    loads = _json_impl.loads
+
+    def dumps(obj: Any) -> bytes:
+        return _json_impl.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+DEFAULT_SCHEMA_PATH = BUNDLE_DIR / "schemas" / "ingest_schema.json"
+DEFAULT_SITE_ID = "site-a"
+BATCH_BYTES = 1 << 20
+
+TOPICS = ("site/env", "site/worker", "site/equipment", "site/geofence", "site/context")
+
+Validator = Callable[[Any], Optional[str]]
+Sink = Callable[[List[dict]], None]
+
+def load_schema(path: Path = DEFAULT_SCHEMA_PATH) -> Dict[str, dict]:
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+def _emit_check(out: List[str], var: str, example: Any, where: str, indent: int, counter: List[int]) -> None:
+    """Append source lines checking `var` against `example`; a failure returns the message."""
+    pad = " " * indent
+    if isinstance(example, bool):
+        out.append(f"{pad}if type({var}) is not bool: return {where + ': expected boolean'!r}")
+    elif isinstance(example, (int, float)):
+        out.append(f"{pad}if type({var}) not in _NUM: return {where + ': expected number'!r}")
+    elif isinstance(example, str):
+        out.append(f"{pad}if type({var}) is not str: return {where + ': expected string'!r}")
+    elif isinstance(example, list):
+        out.append(f"{pad}if type({var}) is not list: return {where + ': expected array'!r}")
+        if example and isinstance(example[0], (dict, list)):
+            counter[0] += 1
+            item = f"_i{counter[0]}"
+            out.append(f"{pad}for {item} in {var}:")
+            _emit_check(out, item, example[0], where + "[]", indent + 4, counter)
+    elif isinstance(example, dict):
+        out.append(f"{pad}if type({var}) is not dict: return {where + ': expected object'!r}")
+        for key, value in example.items():
+            counter[0] += 1
+            field = f"_v{counter[0]}"
+            path = f"{where}.{key}"
+            out.append(f"{pad}{field} = {var}.get({key!r}, _MISSING)")
+            out.append(f"{pad}if {field} is _MISSING: return {path + ': missing'!r}")
+            _emit_check(out, field, value, path, indent, counter)
+    # null examples carry no type information: anything goes
+
+def compile_validator(topic: str, example: Any) -> Validator:
+    """Compile one topic's example payload into a flat validation function."""
+    body: List[str] = []
+    _emit_check(body, "p", example, "payload", 4, [0])
+    name = "validate_" + "".join(c if c.isalnum() else "_" for c in topic)
+    src = f"def {name}(p):\n" + "\n".join(body + ["    return None"]) + "\n"
+    namespace: Dict[str, Any] = {"_NUM": (int, float), "_MISSING": object()}
+    exec(compile(src, f"<haws.ingest validator {topic}>", "exec"), namespace)
+    fn = namespace[name]
+    fn.source = src
+    return fn
+
+def compile_validators(schema: Dict[str, dict]) -> Dict[str, Validator]:
+    return {topic: compile_validator(topic, spec.get("example")) for topic, spec in schema.items()}
+
+def utc_iso(ts: float) -> str:
+    """ISO 8601 UTC with millisecond precision, e.g. 2025-07-15T12:00:02.125Z."""
+    whole = int(ts)
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(whole)) + f".{int((ts - whole) * 1000):03d}Z"
+
+_VARIANT = {c: "89ab"[int(c, 16) & 3] for c in "0123456789abcdef"}
+
+def stable_event_id(prefix: bytes, line: bytes) -> str:
+    """Name-based UUID (RFC 4122 layout, version 5 nibble) of site_prefix() + raw line."""
+    x = hashlib.blake2b(prefix + line, digest_size=16).hexdigest()
+    return f"{x[:8]}-{x[8:12]}-5{x[13:16]}-{_VARIANT[x[16]]}{x[17:20]}-{x[20:]}"
+
+def site_prefix(site_id: str) -> bytes:
+    return site_id.encode("utf-8") + b"\x00"
+
+@lru_cache(maxsize=1 << 14)
+def parse_ts(ts: str) -> float:
+    """ISO 8601 timestamp -> epoch seconds (naive values are taken as UTC)."""
+    dt = datetime.fromisoformat(ts[:-1] + "+00:00" if ts.endswith("Z") else ts)
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc).timestamp()
+    return dt.timestamp()
+
+def event_time(topic: str, payload: dict, ts_ingest: str) -> str:
+    """ts_event for a payload: its own `ts`, a context day's midnight, else ingest time."""
+    ts = payload.get("ts")
+    if ts is not None:
+        return ts
+    date = payload.get("date")
+    if date is not None:
+        return f"{date}T00:00:00Z"
+    return ts_ingest
+
+def iter_batches(stream: BinaryIO, batch_bytes: int = BATCH_BYTES) -> Iterator[List[bytes]]:
+    """Yield lists of raw lines, roughly batch_bytes at a time."""
+    while True:
+        lines = stream.readlines(batch_bytes)
+        if not lines:
+            return
+        yield lines
+
+class Ingestor:
+    """Validate, stamp and route batches of raw JSONL lines.
+
+    `sinks` maps topic -> callable taking the list of events for that topic in
+    one batch; `reject` gets (line_no, reason, raw line) for anything dropped.
+    Events are dicts: event_id, site_id, topic, ts_event, ts_ingest, payload.
+    """
+
+    def __init__(self, schema: Optional[Dict[str, dict]] = None, site_id: str = DEFAULT_SITE_ID,
+                 sinks: Optional[Dict[str, Sink]] = None,
+                 reject: Optional[Callable[[int, str, bytes], None]] = None,
+                 clock: Callable[[], float] = time.time):
+        self.validators = compile_validators(schema if schema is not None else load_schema())
+        self.site_id = site_id
+        self.sinks = sinks or {}
+        self.reject = reject
+        self.clock = clock
+        self.line_no = 0
+        self.counts: Dict[str, int] = {topic: 0 for topic in self.validators}
+        self.rejected = 0
+
+    def _reject(self, line_no: int, reason: str, line: bytes) -> None:
+        self.rejected += 1
+        if self.reject is not None:
+            self.reject(line_no, reason, line)
+
+    def decode(self, lines: Iterable[bytes]) -> List[dict]:
+        """Validate and stamp one batch; returns the accepted events in input order."""
+        ts_ingest = utc_iso(self.clock())
+        validators = self.validators
+        site_id = self.site_id
+        prefix = site_prefix(site_id)
+        events: List[dict] = []
+        append = events.append
+        line_no = self.line_no
+        for line in lines:
+            line_no += 1
+            try:
+                record = loads(line)
+            except ValueError as e:
+                if line.strip():
+                    self._reject(line_no, f"invalid JSON: {e}", line)
+                continue
+            if type(record) is not dict:
+                self._reject(line_no, "record: expected object", line)
+                continue
+            topic = record.get("topic")
+            validate = validators.get(topic) if type(topic) is str else None
+            if validate is None:
+                self._reject(line_no, f"unknown topic: {topic!r}", line)
+                continue
+            payload = record.get("payload")
+            err = validate(payload)
+            if err is not None:
+                self._reject(line_no, f"{topic}: {err}", line)
+                continue
+            ts_event = payload.get("ts")
+            if ts_event is None:
+                ts_event = event_time(topic, payload, ts_ingest)
+            append({
+                "event_id": record.get("event_id") or stable_event_id(prefix, line.rstrip(b"\r\n")),
+                "site_id": record.get("site_id") or site_id,
+                "topic": topic,
+                "ts_event": ts_event,
+                "ts_ingest": ts_ingest,
+                "payload": payload,
+            })
+        self.line_no = line_no
+        return events
+
+    def route(self, events: Iterable[dict]) -> Dict[str, List[dict]]:
+        """Group events by topic, count them and hand each group to its sink."""
+        routed: Dict[str, List[dict]] = {}
+        for event in events:
+            topic = event["topic"]
+            bucket = routed.get(topic)
+            if bucket is None:
+                bucket = routed[topic] = []
+            bucket.append(event)
+        for topic, bucket in routed.items():
+            self.counts[topic] += len(bucket)
+            sink = self.sinks.get(topic)
+            if sink is not None:
+                sink(bucket)
+        return routed
+
+    def feed(self, lines: Iterable[bytes]) -> Dict[str, List[dict]]:
+        """Process one batch; returns (and hands to the sinks) the events by topic."""
+        return self.route(self.decode(lines))
+
+    def run(self, stream: BinaryIO, batch_bytes: int = BATCH_BYTES) -> int:
+        """Ingest a whole stream; returns the number of accepted events."""
+        before = sum(self.counts.values())
+        for lines in iter_batches(stream, batch_bytes):
+            self.feed(lines)
+        return sum(self.counts.values()) - before
+
+def topic_filename(topic: str) -> str:
+    """Output file for a topic: site/env -> site_env.jsonl."""
+    return topic.replace("/", "_") + ".jsonl"
+
+def jsonl_sink(f: BinaryIO) -> Sink:
+    """Sink writing events as JSONL to an open binary file, one write per batch."""
+    def write(events: List[dict]) -> None:
+        f.write(b"\n".join(dumps(e) for e in events) + b"\n")
+    return write
+
+def open_stream(name: str) -> Tuple[BinaryIO, bool]:
+    """('-' or path) -> (binary stream, should_close)."""
+    if name == "-":
+        return sys.stdin.buffer, False
+    return open(name, "rb"), True
@@ -0,0 +1,243 @@
+"""
+haws.latency — Constant-memory latency histograms for the Ingest → Score → Serve KPIs.
+
+LogHistogram is an HDR-style histogram: fixed log-spaced buckets (GAMMA = 1.02, i.e.
+about 1% relative error) from MIN_MS to MAX_MS in one NumPy count array, so recording
+is O(1), memory is fixed (~1.2k buckets) and merging is an array add.
+
+LatencyRecorder keeps one histogram per (stage, site_id) and per hour slot, and rolls
+the last 24 hours by merging slots. Stages come from the metrics spec timestamps:
+
+  ingest        ts_event  -> ts_ingest
+  score         ts_ingest -> ts_scored
+  serve         ts_scored -> ts_served
+  event_to_api  ts_ingest -> ts_served   (latency_ms_event_to_api_p50 / _p95)
+
+Recorders export to JSON (sparse bucket counts) and merge across processes; the
+kpi() values feed the kpi_snapshot of the weekly manifest (bin/haws-latency).
+"""
+import json
+import math
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .ingest import parse_ts
+
+GAMMA = 1.02
+MIN_MS = 0.01
+MAX_MS = 1e8
+BUCKETS = int(math.ceil(math.log(MAX_MS / MIN_MS) / math.log(GAMMA))) + 2
+WINDOW_S = 86400
+SLOT_S = 3600
+
+STAGES = (("ingest", "ts_event", "ts_ingest"),
+          ("score", "ts_ingest", "ts_scored"),
+          ("serve", "ts_scored", "ts_served"),
+          ("event_to_api", "ts_ingest", "ts_served"))
+KPI_STAGE = "event_to_api"
+
+_LOG_GAMMA = math.log(GAMMA)
+
+class LogHistogram:
+    """Fixed log-bucket histogram of millisecond values."""
+    __slots__ = ("counts", "total", "sum", "min", "max")
+
+    def __init__(self):
+        self.counts = np.zeros(BUCKETS, dtype=np.int64)
+        self.total = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    @staticmethod
+    def bucket(ms: float) -> int:
+        if ms <= MIN_MS:
+            return 0
+        return min(BUCKETS - 1, 1 + int(math.log(ms / MIN_MS) / _LOG_GAMMA))
+
+    @staticmethod
+    def value(index: int) -> float:
+        """Representative (geometric middle) value of a bucket."""
+        if index <= 0:
+            return MIN_MS
+        return MIN_MS * GAMMA ** (index - 0.5)
+
+    def record(self, ms: float) -> None:
+        if ms < 0:
+            ms = 0.0  # clock skew between stamping hosts
+        self.counts[self.bucket(ms)] += 1
+        self.total += 1
+        self.sum += ms
+        if ms < self.min:
+            self.min = ms
+        if ms > self.max:
+            self.max = ms
+
+    def record_many(self, values: Iterable[float]) -> None:
+        ms = np.clip(np.asarray(values, dtype=float), 0.0, None)
+        if not len(ms):
+            return
+        with np.errstate(divide="ignore"):
+            idx = 1 + np.floor(np.log(ms / MIN_MS) / _LOG_GAMMA)
+        idx = np.where(ms <= MIN_MS, 0, np.clip(idx, 0, BUCKETS - 1)).astype(np.intp)
+        self.counts += np.bincount(idx, minlength=BUCKETS)
+        self.total += len(ms)
+        self.sum += float(ms.sum())
+        self.min = min(self.min, float(ms.min()))
+        self.max = max(self.max, float(ms.max()))
+
+    def merge(self, other: "LogHistogram") -> "LogHistogram":
+        self.counts += other.counts
+        self.total += other.total
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Nearest-rank quantile (q in [0, 1]); None when empty."""
+        if not self.total:
+            return None
+        rank = max(1, int(math.ceil(q * self.total)))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(max(self.value(index), self.min), self.max)
+
+    def mean(self) -> Optional[float]:
+        return self.sum / self.total if self.total else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        nz = np.flatnonzero(self.counts)
+        return {"total": self.total, "sum": self.sum,
+                "min": self.min if self.total else None, "max": self.max if self.total else None,
+                "buckets": {str(i): int(self.counts[i]) for i in nz.tolist()}}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "LogHistogram":
+        h = cls()
+        for i, n in d.get("buckets", {}).items():
+            h.counts[int(i)] = n
+        h.total = int(d.get("total", 0))
+        h.sum = float(d.get("sum", 0.0))
+        h.min = math.inf if d.get("min") is None else float(d["min"])
+        h.max = -math.inf if d.get("max") is None else float(d["max"])
+        return h
+
+Key = Tuple[str, str]  # (stage, site_id)
+
+class LatencyRecorder:
+    """Per stage and site histograms in hourly slots, rolled over a 24 h window."""
+
+    def __init__(self, window_s: int = WINDOW_S, slot_s: int = SLOT_S):
+        self.window_s = window_s
+        self.slot_s = slot_s
+        self.slots: Dict[Key, Dict[int, LogHistogram]] = {}
+
+    def _slot(self, key: Key, at: float) -> LogHistogram:
+        slot = int(at // self.slot_s)
+        by_slot = self.slots.get(key)
+        if by_slot is None:
+            by_slot = self.slots[key] = {}
+        h = by_slot.get(slot)
+        if h is None:
+            h = by_slot[slot] = LogHistogram()
+            # constant memory: drop slots that fell out of the window
+            oldest = slot - self.window_s // self.slot_s
+            for old in [s for s in by_slot if s <= oldest]:
+                del by_slot[old]
+        return h
+
+    def observe(self, stage: str, site_id: str, ms: float, at: Optional[float] = None) -> None:
+        self._slot((stage, site_id), time.time() if at is None else at).record(ms)
+
+    def observe_record(self, record: Dict[str, Any]) -> None:
+        """Record every stage whose two timestamps the alert/event carries."""
+        site_id = record.get("site_id") or ""
+        stamps: Dict[str, float] = {}
+        for _, start, end in STAGES:
+            for name in (start, end):
+                if name not in stamps and record.get(name):
+                    stamps[name] = parse_ts(record[name])
+        at = max(stamps.values()) if stamps else time.time()
+        for stage, start, end in STAGES:
+            if start in stamps and end in stamps:
+                self.observe(stage, site_id, (stamps[end] - stamps[start]) * 1000.0, at)
+
+    def observe_many(self, records: Iterable[Dict[str, Any]]) -> None:
+        for r in records:
+            self.observe_record(r)
+
+    def window(self, stage: str, site_id: Optional[str] = None, now: Optional[float] = None) -> LogHistogram:
+        """Merged histogram of the window ending at now (all sites when site_id is None)."""
+        now = time.time() if now is None else now
+        first = int((now - self.window_s) // self.slot_s) + 1
+        last = int(now // self.slot_s)
+        merged = LogHistogram()
+        for (st, site), by_slot in self.slots.items():
+            if st != stage or (site_id is not None and site != site_id):
+                continue
+            for slot, h in by_slot.items():
+                if first <= slot <= last:
+                    merged.merge(h)
+        return merged
+
+    def latest(self) -> Optional[float]:
+        """End of the newest slot recorded (a 'now' for replayed or imported data)."""
+        slots = [s for by_slot in self.slots.values() for s in by_slot]
+        return (max(slots) + 1) * self.slot_s - 1e-3 if slots else None
+
+    def kpi(self, now: Optional[float] = None, site_id: Optional[str] = None) -> Dict[str, Optional[float]]:
+        h = self.window(KPI_STAGE, site_id, now)
+        p50, p95 = h.quantile(0.50), h.quantile(0.95)
+        return {"latency_ms_event_to_api_p50": None if p50 is None else round(p50, 1),
+                "latency_ms_event_to_api_p95": None if p95 is None else round(p95, 1)}
+
+    def summary(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        rows = []
+        for stage, site in sorted(self.slots):
+            h = self.window(stage, site, now)
+            if h.total:
+                rows.append({"stage": stage, "site_id": site, "count": h.total, "mean": h.mean(),
+                             "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99),
+                             "max": h.max})
+        return rows
+
+    # ---- export / merge ---------------------------------------------------------------
+    def export(self) -> Dict[str, Any]:
+        return {"version": 1, "gamma": GAMMA, "min_ms": MIN_MS, "window_s": self.window_s, "slot_s": self.slot_s,
+                "histograms": [{"stage": stage, "site_id": site, "slot": slot, **h.to_dict()}
+                               for (stage, site), by_slot in sorted(self.slots.items())
+                               for slot, h in sorted(by_slot.items())]}
+
+    def merge_export(self, data: Dict[str, Any]) -> "LatencyRecorder":
+        if data.get("gamma") != GAMMA or data.get("min_ms") != MIN_MS or data.get("slot_s") != self.slot_s:
+            raise ValueError("latency export uses a different bucket layout")
+        for item in data.get("histograms", []):
+            key = (item["stage"], item["site_id"])
+            by_slot = self.slots.setdefault(key, {})
+            h = by_slot.get(item["slot"])
+            incoming = LogHistogram.from_dict(item)
+            if h is None:
+                by_slot[item["slot"]] = incoming
+            else:
+                h.merge(incoming)
+        return self
+
+    def merge(self, other: "LatencyRecorder") -> "LatencyRecorder":
+        return self.merge_export(other.export())
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.export(), f)
+
+    @classmethod
+    def load(cls, paths: Iterable[str]) -> "LatencyRecorder":
+        rec = None
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if rec is None:
+                rec = cls(window_s=data.get("window_s", WINDOW_S), slot_s=data.get("slot_s", SLOT_S))
+            rec.merge_export(data)
+        return rec or cls()
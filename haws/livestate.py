@@ -0,0 +1,187 @@
+"""
+haws.livestate — Latest state per worker/equipment in preallocated NumPy columns.
+
+One LiveTable per entity kind. Each entity id owns a slot (index dict id -> slot);
+its latest x, y, speed, heading, derived velocity, radius and event time sit at that
+slot in flat float64 columns, about 64 bytes per entity instead of a payload dict.
+Scorers read the columns as whole-array views (table.x[:table.high]) together with
+a live mask, so no per-tick copies or per-entity Python objects are made.
+
+- updates are buffered per slot (last one wins) and written by sync() in one fancy-
+  indexed assignment per column; vx/vy are computed there, vectorized
+- out-of-order updates (older than the slot's latest) are dropped
+- evict(cutoff) frees the slots of entities not seen since cutoff; freed slots have
+  ts = -inf (never live) and are reused, lowest first, by new ids
+- view(id) returns an Entity: a __slots__ record reading through to the columns
+"""
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+CAPACITY = 1024
+FIELDS = ("x", "y", "speed", "heading", "radius", "ts")  # buffered per update
+COLUMNS = FIELDS + ("vx", "vy")                           # vx/vy derived in sync()
+
+class Entity:
+    """Read-through view of one slot; valid until the entity is evicted."""
+    __slots__ = ("table", "slot")
+
+    def __init__(self, table: "LiveTable", slot: int):
+        self.table = table
+        self.slot = slot
+
+    @property
+    def id(self) -> Optional[str]:
+        return self.table.ids[self.slot]
+
+    @property
+    def kind(self) -> str:
+        return self.table.kinds[self.slot]
+
+    @property
+    def x(self) -> float:
+        return float(self.table.x[self.slot])
+
+    @property
+    def y(self) -> float:
+        return float(self.table.y[self.slot])
+
+    @property
+    def speed(self) -> float:
+        return float(self.table.speed[self.slot])
+
+    @property
+    def heading(self) -> float:
+        return float(self.table.heading[self.slot])
+
+    @property
+    def vx(self) -> float:
+        return float(self.table.vx[self.slot])
+
+    @property
+    def vy(self) -> float:
+        return float(self.table.vy[self.slot])
+
+    @property
+    def radius(self) -> float:
+        return float(self.table.radius[self.slot])
+
+    @property
+    def ts(self) -> float:
+        return float(self.table.ts[self.slot])
+
+    def __repr__(self) -> str:
+        return f"Entity({self.id!r}, x={self.x:g}, y={self.y:g}, ts={self.ts:g})"
+
+class LiveTable:
+    """Slot-per-entity columns with an id index, buffered writes and eviction."""
+
+    def __init__(self, capacity: int = CAPACITY):
+        self.index: Dict[str, int] = {}
+        self.ids: List[Optional[str]] = []    # by slot; None for a free slot
+        self.kinds: List[str] = []
+        self.last_ts: List[float] = []
+        self.free: List[int] = []             # heap of freed slots
+        self.pending: Dict[int, Tuple[float, float, float, float, float, float]] = {}
+        self.high = 0                         # slots in use or freed: columns are valid up to here
+        for name in COLUMNS:
+            setattr(self, name, np.full(capacity, -np.inf) if name == "ts" else np.zeros(capacity))
+
+    def __len__(self) -> int:
+        """Entities currently held (not the column extent; see high)."""
+        return len(self.index)
+
+    def __contains__(self, ident: str) -> bool:
+        return ident in self.index
+
+    @property
+    def capacity(self) -> int:
+        return len(self.x)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in COLUMNS)
+
+    def _grow(self) -> None:
+        n = self.capacity * 2
+        for name in COLUMNS:
+            col = getattr(self, name)
+            grown = np.full(n, -np.inf) if name == "ts" else np.zeros(n)
+            grown[:len(col)] = col
+            setattr(self, name, grown)
+
+    def upsert(self, ident: str, x: float, y: float, speed: float, heading: float, ts: float,
+               radius: float = 0.0, kind: str = "") -> Optional[int]:
+        """Buffer a state update; returns its slot, or None for an out-of-order update."""
+        slot = self.index.get(ident)
+        if slot is None:
+            if self.free:
+                slot = heapq.heappop(self.free)
+                self.ids[slot] = ident
+                self.kinds[slot] = kind
+                self.last_ts[slot] = ts
+            else:
+                slot = self.high
+                if slot == self.capacity:
+                    self._grow()
+                self.high += 1
+                self.ids.append(ident)
+                self.kinds.append(kind)
+                self.last_ts.append(ts)
+            self.index[ident] = slot
+        elif ts < self.last_ts[slot]:
+            return None  # keep the newer state
+        else:
+            self.kinds[slot] = kind
+            self.last_ts[slot] = ts
+        self.pending[slot] = (x, y, speed, heading, radius, ts)
+        return slot
+
+    def sync(self) -> None:
+        """Write buffered updates into the columns (and derive vx/vy for them)."""
+        if not self.pending:
+            return
+        slots = np.fromiter(self.pending.keys(), dtype=np.intp, count=len(self.pending))
+        values = np.array(list(self.pending.values()), dtype=float)
+        for i, name in enumerate(FIELDS):
+            getattr(self, name)[slots] = values[:, i]
+        # compass heading: 0 = +y, 90 = +x
+        h = np.radians(values[:, 3])
+        self.vx[slots] = values[:, 2] * np.sin(h)
+        self.vy[slots] = values[:, 2] * np.cos(h)
+        self.pending.clear()
+
+    def live(self, cutoff: float) -> np.ndarray:
+        """Mask over slots [0, high) of entities updated at or after cutoff."""
+        self.sync()
+        return self.ts[:self.high] >= cutoff
+
+    def evict(self, cutoff: float) -> List[Tuple[str, int]]:
+        """Free every entity last updated before cutoff; returns [(id, slot)]."""
+        self.sync()
+        stale = np.flatnonzero(self.ts[:self.high] < cutoff)
+        evicted = []
+        for slot in stale.tolist():
+            ident = self.ids[slot]
+            if ident is None:
+                continue
+            del self.index[ident]
+            self.ids[slot] = None
+            self.kinds[slot] = ""
+            self.last_ts[slot] = -np.inf
+            heapq.heappush(self.free, slot)
+            evicted.append((ident, slot))
+        if evicted:
+            slots = np.array([s for _, s in evicted], dtype=np.intp)
+            self.ts[slots] = -np.inf
+            for name in ("x", "y", "speed", "heading", "radius", "vx", "vy"):
+                getattr(self, name)[slots] = 0.0
+        return evicted
+
+    def view(self, ident: str) -> Optional[Entity]:
+        slot = self.index.get(ident)
+        if slot is None:
+            return None
+        self.sync()
+        return Entity(self, slot)
@@ -0,0 +1,147 @@
+"""
+haws.pipeline — In-process Ingest → Score pipeline over the haws scorers.
+
+Events are applied in time order:
+- site/geofence and site/context reload zones as they arrive
+- site/env is scored per reading by the heat scorer
+- site/worker / site/equipment update the proximity index; proximity and geofence
+  checks run on a fixed tick of event time (tick_s), once event time passes the tick
+
+A tick with no position update since the previous one is skipped, and a long quiet
+gap costs one tick, not one per tick_s. Alerts carry the ts_ingest of the event that
+raised them and ts_scored (wall clock), for the latency KPIs (haws.latency).
+"""
+import math
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .geofence import GeofenceEngine
+from .heat import HeatScorer
+from .ingest import DEFAULT_SITE_ID, Ingestor, parse_ts, utc_iso
+from .proximity import ProximityEngine
+from .rules import as_ruleset
+
+TICK_S = 1.0
+EVICT_EVERY_S = 60.0  # event-time interval between live-state eviction sweeps
+ZONE_TOPICS = ("site/geofence", "site/context")
+POSITION_TOPICS = ("site/worker", "site/equipment")
+
+class Pipeline:
+    """Ingest, score and collect alerts for one site."""
+
+    def __init__(self, rules: Any, site_id: str = DEFAULT_SITE_ID, tick_s: float = TICK_S,
+                 schema: Optional[Dict[str, dict]] = None, clock: Callable[[], float] = time.time):
+        rules = self.rules = as_ruleset(rules)
+        self.site_id = site_id
+        self.tick_s = tick_s
+        self.clock = clock
+        self.ingestor = Ingestor(schema, site_id=site_id, clock=clock)
+        self.proximity = ProximityEngine(rules, site_id=site_id)
+        self.geofence = GeofenceEngine(rules, site_id=site_id)
+        self.heat = HeatScorer(rules, site_id=site_id)
+        self.next_tick: Optional[float] = None
+        self.last_tick = -math.inf
+        self.last_evict = -math.inf
+        self.dirty = False
+        self.ticks = 0
+        self.last_ingest: Optional[str] = None
+
+    def apply_rules(self, rules: Any) -> None:
+        """Swap in a new ruleset between batches; scorer state (positions, zones, heat
+        runs, active pairs) carries over and is judged by the new rules from here on."""
+        rules = self.rules = as_ruleset(rules)
+        self.proximity.apply_rules(rules)
+        self.geofence.apply_rules(rules)
+        self.heat.apply_rules(rules)
+
+    @property
+    def watermark(self) -> float:
+        """Alerts with ts_event strictly before this are final."""
+        return self.last_tick
+
+    @property
+    def horizon(self) -> float:
+        """Lower bound on the ts_event of alerts still to come (time-ordered input).
+
+        A pending position tick fires at next_tick; otherwise only later events can
+        raise alerts, and they are at or after the latest event (>= next_tick - tick_s).
+        """
+        if self.next_tick is None:
+            return math.inf
+        return self.next_tick if self.dirty else self.next_tick - self.tick_s
+
+    def tick(self, t: float) -> List[Dict[str, Any]]:
+        """Run the position-based checks at event time t."""
+        self.last_tick = t
+        if not self.dirty:
+            return []
+        self.dirty = False
+        self.ticks += 1
+        alerts = self.proximity.score(t)
+        for table, entity in ((self.proximity.workers, "worker"), (self.proximity.equipment, "equipment")):
+            if len(table):
+                # whole-column views of the live state; the mask picks the live slots
+                n = table.high
+                alerts += self.geofence.score(table.ids, table.x[:n], table.y[:n], t, entity=entity,
+                                              mask=table.live(t - self.proximity.stale_s))
+        if t - self.last_evict >= EVICT_EVERY_S:
+            self.proximity.evict(t)
+            self.last_evict = t
+        return alerts
+
+    def process(self, events: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Apply time-ordered events; returns the alerts they raised."""
+        alerts: List[Dict[str, Any]] = []
+        tick_s = self.tick_s
+        for event in events:
+            topic = event["topic"]
+            self.last_ingest = event.get("ts_ingest")
+            if topic in ZONE_TOPICS:
+                self.geofence.update(event)
+                self.dirty = True
+                continue
+            t = parse_ts(event["ts_event"])
+            if self.next_tick is None:
+                self.next_tick = math.floor(t / tick_s) * tick_s + tick_s
+            if t >= self.next_tick:
+                alerts += self.tick(self.next_tick)
+                # a quiet stretch needs one tick; the next one is the first after t
+                self.next_tick = math.floor(t / tick_s) * tick_s + tick_s
+            if topic == "site/env":
+                alerts += self.heat.update(event)
+            elif topic in POSITION_TOPICS:
+                self.proximity.update(event)
+                self.dirty = True
+        return self._stamp(alerts)
+
+    def advance(self, t: float) -> List[Dict[str, Any]]:
+        """Stream time reached t (time-ordered input, maybe no event for this site): run
+        the pending tick if it is due by then, as the next event at or after t would."""
+        if self.next_tick is None or t < self.next_tick:
+            return []
+        alerts = self.tick(self.next_tick)
+        self.next_tick = math.floor(t / self.tick_s) * self.tick_s + self.tick_s
+        return self._stamp(alerts)
+
+    def feed_lines(self, lines: Iterable[bytes]) -> List[Dict[str, Any]]:
+        """Ingest raw JSONL lines (in time order) and score them."""
+        events = self.ingestor.decode(lines)
+        self.ingestor.route(events)
+        return self.process(events)
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """Final tick at the pending tick time (end of input)."""
+        if self.next_tick is None:
+            return []
+        alerts = self._stamp(self.tick(self.next_tick))
+        self.last_tick = math.inf
+        return alerts
+
+    def _stamp(self, alerts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if alerts:
+            ts_scored = utc_iso(self.clock())
+            for a in alerts:
+                if self.last_ingest:
+                    a.setdefault("ts_ingest", self.last_ingest)
+                a["ts_scored"] = ts_scored
+        return alerts
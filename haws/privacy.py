@@ -0,0 +1,226 @@
+"""
+haws.privacy — Guardrails for team views: n>=5 cohorts, >=60 min windows, value banding.
+
+Policy (haws_bundle_v1/templates/Anonymization_Policy.md, `suppression` in risk_rules.yaml):
+- a team view is rendered only if its cohort (distinct workers of the team and role
+  seen in the window) has n >= minimum_cohort_size; otherwise it is hidden
+- views aggregate over windows of at least min_time_aggregation_min
+- with band_values, metrics are shown as Low/Med/High per worker-hour, never raw
+- views carry team and role labels only, no worker ids
+
+Rows arrive as columnar batches (NumPy arrays plus interned labels). group_views()
+groups a batch by (window, team, role) in one np.unique pass and sums every metric
+with np.bincount; the cohort size is a second np.unique over (group, worker) pairs.
+TeamViews keeps rows per window and caches each window's rendered views until
+rows for that window arrive. Every show/suppress decision goes to the audit sink,
+once per window and data version.
+"""
+import math
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .ingest import utc_iso
+from .rules import as_ruleset
+
+# floors from the anonymization policy: config may be stricter, never looser
+POLICY_MIN_COHORT = 5
+POLICY_MIN_WINDOW_MIN = 60
+BANDS = ("Low", "Med", "High")
+DEFAULT_TEAM = "all"
+
+AuditSink = Callable[[List[Dict[str, Any]]], None]
+
+class Settings:
+    """The suppression settings of a compiled Ruleset (raw rules are compiled first)."""
+    __slots__ = ("min_cohort", "window_s", "band_values", "band_edges")
+
+    def __init__(self, rules: Any):
+        rs = as_ruleset(rules)
+        self.min_cohort = rs.min_cohort
+        self.window_s = rs.aggregation_s
+        self.band_values = rs.band_values
+        self.band_edges = rs.band_edges
+
+    def violations(self) -> List[str]:
+        """Where the configuration is looser than the policy floors."""
+        out = []
+        if self.min_cohort < POLICY_MIN_COHORT:
+            out.append(f"minimum_cohort_size {self.min_cohort} < {POLICY_MIN_COHORT}")
+        if self.window_s < POLICY_MIN_WINDOW_MIN * 60.0:
+            out.append(f"min_time_aggregation_min {self.window_s / 60.0:g} < {POLICY_MIN_WINDOW_MIN}")
+        if not self.band_values:
+            out.append("band_values is off")
+        if len(self.band_edges) != len(BANDS) - 1 or list(self.band_edges) != sorted(self.band_edges):
+            out.append(f"band_edges {list(self.band_edges)} must be {len(BANDS) - 1} ascending values")
+        return out
+
+def team_of(worker_id: str) -> str:
+    """Crew prefix of ids like crewA-07; workers without one share the site-wide team."""
+    head, sep, _ = worker_id.rpartition("-")
+    return head if sep and head else DEFAULT_TEAM
+
+class Labels:
+    """Interns strings to dense int codes, for the columnar batches."""
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.names: List[str] = []
+
+    def code(self, name: str) -> int:
+        c = self.index.get(name)
+        if c is None:
+            c = self.index[name] = len(self.names)
+            self.names.append(name)
+        return c
+
+    def codes(self, names: Iterable[str]) -> np.ndarray:
+        code = self.code
+        return np.fromiter((code(n) for n in names), dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+def band(rate: np.ndarray, edges: Sequence[float]) -> np.ndarray:
+    """Band index per value (0=Low .. 2=High)."""
+    return np.searchsorted(np.asarray(edges, dtype=float), rate, side="right")
+
+def group_views(settings: Settings, ts: np.ndarray, worker: np.ndarray, team: np.ndarray, role: np.ndarray,
+                metrics: Dict[str, np.ndarray], teams: Labels, roles: Labels,
+                site_id: str = "") -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Aggregate one batch into (views, audit entries).
+
+    ts/worker/team/role are row-aligned (codes from the Labels); metrics maps a name
+    to per-row amounts (0 for presence-only rows). Views failing the cohort rule are
+    left out of the first list and recorded as suppressed in the second.
+    """
+    if not len(ts):
+        return [], []
+    window_s = settings.window_s
+    bucket = np.floor_divide(ts, window_s).astype(np.int64)
+    n_roles = max(len(roles), 1)
+    n_teams = max(len(teams), 1)
+    key = (bucket * n_teams + team) * n_roles + role
+    keys, group = np.unique(key, return_inverse=True)
+    n_groups = len(keys)
+    n_workers = int(worker.max()) + 1
+    pairs = np.unique(group * n_workers + worker)
+    cohort = np.bincount(pairs // n_workers, minlength=n_groups)
+    g_role = keys % n_roles
+    g_team = (keys // n_roles) % n_teams
+    g_bucket = keys // (n_roles * n_teams)
+
+    names = sorted(metrics)
+    sums = np.vstack([np.bincount(group, weights=metrics[m], minlength=n_groups) for m in names]) \
+        if names else np.zeros((0, n_groups))
+    shown = cohort >= settings.min_cohort
+    hours = window_s / 3600.0
+    rates = sums / np.maximum(cohort, 1) / hours
+    banded = band(rates, settings.band_edges) if settings.band_values else None
+
+    views: List[Dict[str, Any]] = []
+    audit: List[Dict[str, Any]] = []
+    for g in range(n_groups):
+        start = float(g_bucket[g]) * window_s
+        label = {"site_id": site_id, "team": teams.names[g_team[g]], "role": roles.names[g_role[g]],
+                 "window_start": utc_iso(start), "window_end": utc_iso(start + window_s)}
+        n = int(cohort[g])
+        if not shown[g]:
+            audit.append({**label, "n": n, "decision": "suppressed",
+                          "reason": f"cohort n={n} < {settings.min_cohort}"})
+            continue
+        if banded is not None:
+            values = {m: BANDS[banded[i, g]] for i, m in enumerate(names)}
+        else:
+            values = {m: round(float(rates[i, g]), 2) for i, m in enumerate(names)}
+        views.append({**label, "cohort": f">={settings.min_cohort}", "metrics": values})
+        audit.append({**label, "n": n, "decision": "shown", "banded": banded is not None})
+    return views, audit
+
+class TeamViews:
+    """Windowed team views over streamed batches, with a per-window cache and audit.
+
+    add() takes worker rows (presence and/or alert amounts); views(t) returns the
+    rendered views of the window containing t. A window's views are computed once per
+    data version: the cache entry is dropped when new rows for that window arrive.
+    """
+
+    def __init__(self, rules: Dict[str, Any], metrics: Sequence[str], site_id: str = "",
+                 audit: Optional[AuditSink] = None, keep_windows: int = 48):
+        self.settings = Settings(rules)
+        self.metric_names = tuple(metrics)
+        self.site_id = site_id
+        self.audit = audit
+        self.keep_windows = keep_windows
+        self.workers = Labels()
+        self.teams = Labels()
+        self.roles = Labels()
+        self.team_code: List[int] = []  # by worker code
+        self.chunks: Dict[int, List[Tuple[np.ndarray, ...]]] = {}
+        self.cache: Dict[int, List[Dict[str, Any]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def window(self, t: float) -> int:
+        return int(math.floor(t / self.settings.window_s))
+
+    def add(self, ts: Sequence[float], worker_ids: Sequence[str], roles: Sequence[str],
+            metrics: Optional[Dict[str, Sequence[float]]] = None, teams: Optional[Sequence[str]] = None) -> None:
+        if not len(ts):
+            return
+        ts = np.asarray(ts, dtype=float)
+        worker = self.workers.codes(worker_ids)
+        while len(self.team_code) < len(self.workers):
+            self.team_code.append(self.teams.code(team_of(self.workers.names[len(self.team_code)])))
+        team = self.teams.codes(teams) if teams is not None else np.asarray(self.team_code, dtype=np.int64)[worker]
+        role = self.roles.codes(roles)
+        values = np.zeros((len(self.metric_names), len(ts)))
+        for i, m in enumerate(self.metric_names):
+            if metrics and m in metrics:
+                values[i] = metrics[m]
+        bucket = np.floor_divide(ts, self.settings.window_s).astype(np.int64)
+        for b in np.unique(bucket).tolist():
+            sel = bucket == b
+            self.chunks.setdefault(b, []).append((ts[sel], worker[sel], team[sel], role[sel], values[:, sel]))
+            self.cache.pop(b, None)
+        for old in sorted(self.chunks)[:-self.keep_windows]:
+            del self.chunks[old]
+            self.cache.pop(old, None)
+
+    def views(self, t: float) -> List[Dict[str, Any]]:
+        b = self.window(t)
+        cached = self.cache.get(b)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        chunks = self.chunks.get(b, [])
+        if not chunks:
+            return []
+        cols = [np.concatenate([c[i] for c in chunks]) for i in range(4)]
+        values = np.concatenate([c[4] for c in chunks], axis=1)
+        views, audit = group_views(self.settings, *cols, dict(zip(self.metric_names, values)),
+                                   self.teams, self.roles, self.site_id)
+        if len(chunks) > 1:
+            self.chunks[b] = [tuple(cols) + (values,)]  # compact for the next version
+        self.cache[b] = views
+        if self.audit is not None and audit:
+            decided = utc_iso(time.time())
+            for entry in audit:
+                entry["ts_decided"] = decided
+            self.audit(audit)
+        return views
+
+    def guardrail_pass(self) -> str:
+        return guardrail_status(self.settings)
+
+def guardrail_status(settings: Settings, audit: Iterable[Dict[str, Any]] = ()) -> str:
+    """'pass' when the config meets the policy floors and no audited view broke them."""
+    if settings.violations():
+        return "fail"
+    for entry in audit:
+        if entry.get("decision") == "shown" and (entry.get("n", 0) < settings.min_cohort
+                                                 or not entry.get("banded", False)):
+            return "fail"
+    return "pass"
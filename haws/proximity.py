@@ -0,0 +1,243 @@
+"""
+haws.proximity — Worker ↔ equipment proximity scoring on a uniform grid index.
+
+Latest positions of workers (site/worker) and equipment (site/equipment) are kept in
+live-state tables (haws.livestate: one slot per entity in NumPy columns) and bucketed
+into square grid cells; an event moves its entity between cells in O(1). A scoring
+tick only pairs workers with equipment in nearby cells, then computes time-to-collision
+for all candidate pairs at once with NumPy, so the cost grows with entities and local
+density instead of W×E.
+
+Rules (config/risk_rules.yaml, proximity block):
+- each asset has a danger radius: asset_type_radius_m[type] or default_radius_m
+- ttc is the time until the worker is inside that radius, assuming both keep their
+  current velocity; 0 when already inside
+- inside the radius -> proximity_high; ttc <= ttc_threshold_s -> proximity_med
+
+Velocities come from speed (m/s) and heading in compass degrees (0 = +y, 90 = +x).
+An alert is emitted when a pair enters a level or escalates, not on every tick.
+Entities silent for evict_s are evicted from the tables and the grid.
+"""
+import hashlib
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .ingest import parse_ts, utc_iso
+from .livestate import LiveTable
+from .rules import as_ruleset
+
+STALE_S = 10.0            # positions older than this (vs. the tick) are ignored
+EVICT_S = 300.0           # entities silent this long are dropped from the live state
+ASSUMED_CLOSING_MPS = 2.0  # sizes the default grid cell; actual speeds set the search reach
+
+Cell = Tuple[int, int]
+
+def alert_id(*parts: Any) -> str:
+    """Deterministic alert ID, so replays of the same input produce the same alerts."""
+    return hashlib.blake2b("|".join(map(str, parts)).encode("utf-8"), digest_size=8).hexdigest()
+
+class Grid:
+    """Square cells -> set of slots; tracks each slot's cell for O(1) moves."""
+
+    def __init__(self, cell_m: float):
+        self.cell_m = cell_m
+        self.cells: Dict[Cell, set] = {}
+        self.where: Dict[int, Cell] = {}
+
+    def cell_of(self, x: float, y: float) -> Cell:
+        return int(x // self.cell_m), int(y // self.cell_m)
+
+    def move(self, slot: int, x: float, y: float) -> None:
+        cell = (int(x // self.cell_m), int(y // self.cell_m))
+        old = self.where.get(slot)
+        if old == cell:
+            return
+        if old is not None:
+            members = self.cells[old]
+            members.discard(slot)
+            if not members:
+                del self.cells[old]
+        self.cells.setdefault(cell, set()).add(slot)
+        self.where[slot] = cell
+
+    def remove(self, slot: int) -> None:
+        old = self.where.pop(slot, None)
+        if old is not None:
+            members = self.cells[old]
+            members.discard(slot)
+            if not members:
+                del self.cells[old]
+
+def time_to_collision(px: np.ndarray, py: np.ndarray, vx: np.ndarray, vy: np.ndarray,
+                      radius: np.ndarray) -> np.ndarray:
+    """Vectorized ttc for relative position p and relative velocity v against radius.
+
+    Solves |p + v·t| = radius for the first t >= 0; 0 when already inside, inf when the
+    paths never come that close.
+    """
+    a = vx * vx + vy * vy
+    b = 2.0 * (px * vx + py * vy)
+    c = px * px + py * py - radius * radius
+    disc = b * b - 4.0 * a * c
+    ttc = np.full(px.shape, np.inf)
+    approaching = (a > 0) & (disc >= 0) & (b < 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = (-b - np.sqrt(np.where(approaching, disc, 0.0))) / np.where(approaching, 2.0 * a, 1.0)
+    ttc[approaching] = t[approaching]
+    ttc[c <= 0] = 0.0
+    return ttc
+
+class ProximityEngine:
+    """Incremental worker/equipment index plus vectorized ttc scoring."""
+
+    def __init__(self, rules: Any, cell_m: Optional[float] = None, stale_s: float = STALE_S,
+                 site_id: str = "", evict_s: float = EVICT_S):
+        self.workers = LiveTable()
+        self.equipment = LiveTable()
+        self.apply_rules(rules)
+        self.stale_s = stale_s
+        self.evict_s = max(evict_s, stale_s)
+        self.site_id = site_id
+        # fixed for the engine's lifetime; the search reach follows the current rules
+        self.cell_m = cell_m or self.max_radius + ASSUMED_CLOSING_MPS * self.ttc_threshold
+        self.worker_grid = Grid(self.cell_m)
+        self.equipment_grid = Grid(self.cell_m)
+        self.active: Dict[Tuple[int, int], str] = {}
+        self.now = -math.inf
+        self.last_candidates = 0
+
+    def apply_rules(self, rules: Any) -> None:
+        """Swap in new thresholds; equipment already tracked takes its new radius."""
+        rs = self.rules = as_ruleset(rules)
+        self.ttc_threshold = rs.ttc_threshold
+        self.max_radius = rs.max_radius
+        E = self.equipment
+        if E.high:
+            E.sync()
+            E.radius[:E.high] = rs.asset_radius[rs.radius_codes(E.kinds)]
+
+    def radius_for(self, asset_type: str) -> float:
+        return self.rules.radius_for(asset_type)
+
+    def update(self, event: Dict[str, Any]) -> bool:
+        """Apply one ingest event; returns True if it was a position update."""
+        topic = event.get("topic")
+        p = event.get("payload") or {}
+        if topic == "site/worker":
+            ts = parse_ts(event["ts_event"])
+            slot = self.workers.upsert(p["worker_id"], p["x"], p["y"], p.get("speed") or 0.0,
+                                       p.get("heading") or 0.0, ts, kind=p.get("role", ""))
+            if slot is not None:
+                self.worker_grid.move(slot, p["x"], p["y"])
+        elif topic == "site/equipment":
+            ts = parse_ts(event["ts_event"])
+            state = p.get("state") or {}
+            asset_type = p.get("type", "")
+            slot = self.equipment.upsert(p["asset_id"], p["x"], p["y"], state.get("speed") or 0.0,
+                                         p.get("heading") or 0.0, ts, radius=self.radius_for(asset_type),
+                                         kind=asset_type)
+            if slot is not None:
+                self.equipment_grid.move(slot, p["x"], p["y"])
+        else:
+            return False
+        if ts > self.now:
+            self.now = ts
+        return True
+
+    def update_many(self, events: Iterable[Dict[str, Any]]) -> int:
+        return sum(1 for e in events if self.update(e))
+
+    def evict(self, now: float) -> int:
+        """Drop entities silent since now - evict_s (tables, grid, pair state); returns how many."""
+        cutoff = now - self.evict_s
+        gone = 0
+        for table, grid, side in ((self.workers, self.worker_grid, 0), (self.equipment, self.equipment_grid, 1)):
+            evicted = table.evict(cutoff)
+            if not evicted:
+                continue
+            slots = {slot for _, slot in evicted}
+            for slot in slots:
+                grid.remove(slot)
+            # slots get reused: forget pair state that referred to them
+            self.active = {pair: rule for pair, rule in self.active.items() if pair[side] not in slots}
+            gone += len(evicted)
+        return gone
+
+    def candidate_pairs(self, now: float) -> Tuple[np.ndarray, np.ndarray]:
+        """(worker_slots, equipment_slots) for live entities within search reach on the grid."""
+        W, E = self.workers, self.equipment
+        if not len(W) or not len(E):
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        cutoff = now - self.stale_s
+        w_live = W.live(cutoff)
+        e_live = E.live(cutoff)
+        if not w_live.any() or not e_live.any():
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        # how far apart a pair can start and still meet within the ttc threshold
+        w_speed = np.abs(W.speed[:W.high][w_live]).max()
+        e_speed = np.abs(E.speed[:E.high][e_live]).max()
+        reach = self.max_radius + (w_speed + e_speed) * self.ttc_threshold
+        k = max(1, int(math.ceil(reach / self.cell_m)))
+        offsets = [(dx, dy) for dx in range(-k, k + 1) for dy in range(-k, k + 1)]
+
+        ws: List[int] = []
+        es: List[int] = []
+        wcells = self.worker_grid.cells
+        for (cx, cy), members in self.equipment_grid.cells.items():
+            near: List[int] = []
+            for dx, dy in offsets:
+                cell = wcells.get((cx + dx, cy + dy))
+                if cell:
+                    near.extend(cell)
+            if not near:
+                continue
+            for e in members:
+                ws.extend(near)
+                es.extend([e] * len(near))
+        if not ws:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        w_idx = np.array(ws, dtype=np.intp)
+        e_idx = np.array(es, dtype=np.intp)
+        live = w_live[w_idx] & e_live[e_idx]
+        return w_idx[live], e_idx[live]
+
+    def score(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Score all candidate pairs at `now` (default: latest event time); returns new alerts."""
+        now = self.now if now is None else now
+        w_idx, e_idx = self.candidate_pairs(now)
+        self.last_candidates = len(w_idx)
+        W, E = self.workers, self.equipment
+        ttc = time_to_collision(W.x[w_idx] - E.x[e_idx], W.y[w_idx] - E.y[e_idx],
+                                W.vx[w_idx] - E.vx[e_idx], W.vy[w_idx] - E.vy[e_idx], E.radius[e_idx])
+        hit = ttc <= self.ttc_threshold
+        level = np.where(ttc[hit] == 0.0, 2, 1)
+
+        alerts: List[Dict[str, Any]] = []
+        active: Dict[Tuple[int, int], str] = {}
+        for w, e, lv, t in zip(w_idx[hit].tolist(), e_idx[hit].tolist(), level.tolist(), ttc[hit].tolist()):
+            rule = "proximity_high" if lv == 2 else "proximity_med"
+            pair = (w, e)
+            active[pair] = rule
+            previous = self.active.get(pair)
+            if previous == rule or previous == "proximity_high":
+                continue  # still in the same (or a higher, not yet cleared) level
+            distance = math.hypot(W.x[w] - E.x[e], W.y[w] - E.y[e])
+            alerts.append({
+                "alert_id": alert_id(rule, W.ids[w], E.ids[e], now),
+                "kind": "proximity",
+                "rule": rule,
+                "severity": self.rules.severity_of(rule),
+                "site_id": self.site_id,
+                "ts_event": utc_iso(now),
+                "worker_id": W.ids[w],
+                "asset_id": E.ids[e],
+                "asset_type": E.kinds[e],
+                "distance_m": round(distance, 2),
+                "ttc_s": round(t, 2),
+                "explain": (f"{W.ids[w]} is {distance:.1f} m from {E.kinds[e] or 'asset'} {E.ids[e]} "
+                            f"(radius {E.radius[e]:g} m, ttc {t:.1f} s <= {self.ttc_threshold:g} s)"),
+            })
+        self.active = active
+        return alerts
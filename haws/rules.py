@@ -0,0 +1,256 @@
+"""
+haws.rules — Load config/risk_rules.yaml and compile it into the tables the scorers use.
+
+Units follow the YAML header: site coordinates in meters, temperature in °C, RH in %.
+
+compile_rules() checks the YAML once and flattens it into a Ruleset: typed
+thresholds, an asset-type radius array (asset_radius[type code], the default
+radius in the last slot) and alert/zone severities as codes into SEVERITIES, so
+scorers index arrays instead of walking nested dicts per event. The scorers
+accept either the raw dict or a Ruleset (as_ruleset), and swap a new one in with
+apply_rules() without losing their state.
+
+RuleWatcher polls the file (mtime, size, inode) and swaps in the new Ruleset by
+rebinding `current`; a file that fails to load or validate is reported and the
+last good ruleset stays in force.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import BUNDLE_DIR
+from .ingest import utc_iso
+
+try:
+    import yaml
+except ImportError:  # reported when rules are actually loaded
+    yaml = None
+
+DEFAULT_RULES_PATH = BUNDLE_DIR / "config" / "risk_rules.yaml"
+SEVERITIES = ("low", "medium", "high", "critical")
+SEVERITY_CODE = {name: code for code, name in enumerate(SEVERITIES)}
+DEFAULT_SEVERITY = "medium"
+ALERT_RULES = ("proximity_high", "proximity_med", "heat_advisory", "heat_critical", "geofence_violation")
+WATCH_INTERVAL_S = 1.0
+DEFAULT_BAND_EDGES = (0.5, 2.0)  # team-view bands per worker-hour: Low below 0.5, High from 2.0
+LOAD_ERRORS = (OSError, ValueError, RuntimeError) + ((yaml.YAMLError,) if yaml is not None else ())
+
+def parse_rules(text: str) -> Dict[str, Any]:
+    if yaml is None:
+        raise RuntimeError("PyYAML is required to read risk rules (pip install pyyaml)")
+    return yaml.safe_load(text) or {}
+
+def load_rules(path: Path = DEFAULT_RULES_PATH) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_rules(f.read())
+
+def severity(rules: Any, alert_key: str, default: str = DEFAULT_SEVERITY) -> str:
+    """Severity for an alert key (proximity_high, heat_critical, ...) from alerts.severity_map."""
+    if isinstance(rules, Ruleset):
+        return rules.severity_of(alert_key, default)
+    return ((rules.get("alerts") or {}).get("severity_map") or {}).get(alert_key, default)
+
+class Ruleset:
+    """Compiled, read-only risk rules (build with compile_rules)."""
+    __slots__ = ("version", "source", "raw", "default_radius", "ttc_threshold", "max_radius", "asset_types",
+                 "asset_code", "asset_radius", "heat_advisory", "heat_critical", "heat_min_duration_s",
+                 "alert_rules", "rule_code", "rule_severity", "zone_severity", "min_cohort",
+                 "aggregation_s", "band_values", "band_edges")
+
+    def __repr__(self) -> str:
+        return f"Ruleset(version={self.version!r}, source={self.source!r})"
+
+    def radius_for(self, asset_type: str) -> float:
+        return float(self.asset_radius[self.asset_code.get(asset_type, len(self.asset_types))])
+
+    def radius_codes(self, asset_types: Sequence[str]) -> np.ndarray:
+        """Asset type codes (unknown types -> the default slot) for indexing asset_radius."""
+        default = len(self.asset_types)
+        code = self.asset_code
+        return np.fromiter((code.get(t, default) for t in asset_types), dtype=np.intp, count=len(asset_types))
+
+    def severity_of(self, alert_key: str, default: str = DEFAULT_SEVERITY) -> str:
+        code = self.rule_code.get(alert_key)
+        sev = self.rule_severity[code] if code is not None else -1
+        return SEVERITIES[sev] if sev >= 0 else default
+
+    def zone_severity_of(self, zone_type: str) -> str:
+        code = self.zone_severity.get(zone_type)
+        return SEVERITIES[code] if code is not None else self.severity_of("geofence_violation")
+
+    def tables(self) -> Dict[str, Any]:
+        """The compiled tables as plain JSON-able values (bin/haws-rules compile)."""
+        return {
+            "version": self.version,
+            "source": self.source,
+            "proximity": {"default_radius_m": self.default_radius, "ttc_threshold_s": self.ttc_threshold,
+                          "max_radius_m": self.max_radius,
+                          "asset_radius_m": dict(zip(self.asset_types + ("*",), self.asset_radius.tolist()))},
+            "heat": {"advisory_start_hi": self.heat_advisory, "critical_hi": self.heat_critical,
+                     "min_duration_s": self.heat_min_duration_s},
+            "severity": {k: SEVERITIES[c] if c >= 0 else None
+                         for k, c in zip(self.alert_rules, self.rule_severity.tolist())},
+            "zone_severity": {k: SEVERITIES[v] for k, v in self.zone_severity.items()},
+            "suppression": {"minimum_cohort_size": self.min_cohort, "aggregation_s": self.aggregation_s,
+                            "band_values": self.band_values, "band_edges": list(self.band_edges)},
+        }
+
+def _number(errors: List[str], section: Dict[str, Any], key: str, where: str, default: float,
+            positive: bool = True) -> float:
+    value = section.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        errors.append(f"{where}.{key}: expected a number, got {value!r}")
+        return float(default)
+    if positive and value <= 0:
+        errors.append(f"{where}.{key}: must be > 0, got {value!r}")
+    return float(value)
+
+def _section(errors: List[str], parent: Dict[str, Any], key: str, where: str = "") -> Dict[str, Any]:
+    value = parent.get(key)
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        errors.append(f"{where}{key}: expected a mapping, got {type(value).__name__}")
+        return {}
+    return value
+
+def _severity_code(errors: List[str], value: Any, where: str) -> int:
+    code = SEVERITY_CODE.get(value) if isinstance(value, str) else None
+    if code is None:
+        errors.append(f"{where}: unknown severity {value!r} (expected one of {', '.join(SEVERITIES)})")
+        return SEVERITY_CODE[DEFAULT_SEVERITY]
+    return code
+
+def compile_rules(rules: Dict[str, Any], source: str = "") -> Ruleset:
+    """Validate raw rules and flatten them; raises ValueError listing every problem."""
+    errors: List[str] = []
+    if not isinstance(rules, dict):
+        raise ValueError(f"invalid risk rules: expected a mapping, got {type(rules).__name__}")
+    rs = Ruleset()
+    rs.raw = rules
+    rs.source = source
+    rs.version = hashlib.sha256(json.dumps(rules, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+
+    prox = _section(errors, rules, "proximity")
+    rs.default_radius = _number(errors, prox, "default_radius_m", "proximity", 3.0)
+    rs.ttc_threshold = _number(errors, prox, "ttc_threshold_s", "proximity", 4.0)
+    radii = _section(errors, prox, "asset_type_radius_m", "proximity.")
+    rs.asset_types = tuple(str(k) for k in radii)
+    rs.asset_code = {t: i for i, t in enumerate(rs.asset_types)}
+    rs.asset_radius = np.array([_number(errors, radii, k, "proximity.asset_type_radius_m", 0.0) for k in radii]
+                               + [rs.default_radius], dtype=float)
+    rs.max_radius = float(rs.asset_radius.max())
+
+    heat = _section(errors, rules, "heat")
+    rs.heat_advisory = _number(errors, heat, "advisory_start_hi", "heat", 90)
+    rs.heat_critical = _number(errors, heat, "critical_hi", "heat", 103)
+    rs.heat_min_duration_s = _number(errors, heat, "min_duration_min", "heat", 10, positive=False) * 60.0
+    if rs.heat_critical < rs.heat_advisory:
+        errors.append(f"heat.critical_hi {rs.heat_critical:g} is below advisory_start_hi {rs.heat_advisory:g}")
+
+    smap = _section(errors, _section(errors, rules, "alerts"), "severity_map", "alerts.")
+    rs.alert_rules = ALERT_RULES + tuple(k for k in smap if k not in ALERT_RULES)
+    rs.rule_code = {k: i for i, k in enumerate(rs.alert_rules)}
+    # -1: not in the map, callers fall back to their default
+    rs.rule_severity = np.array([_severity_code(errors, smap[k], f"alerts.severity_map.{k}") if k in smap
+                                 else -1 for k in rs.alert_rules], dtype=np.int8)
+    zones = _section(errors, _section(errors, rules, "geofence"), "violation_severity", "geofence.")
+    rs.zone_severity = {str(k): _severity_code(errors, v, f"geofence.violation_severity.{k}")
+                        for k, v in zones.items()}
+
+    sup = _section(errors, rules, "suppression")
+    rs.min_cohort = int(_number(errors, sup, "minimum_cohort_size", "suppression", 5))
+    rs.aggregation_s = _number(errors, sup, "min_time_aggregation_min", "suppression", 60) * 60.0
+    rs.band_values = bool(sup.get("band_values", True))
+    edges = sup.get("band_edges", DEFAULT_BAND_EDGES)
+    if not isinstance(edges, (list, tuple)) or any(isinstance(e, bool) or not isinstance(e, (int, float))
+                                                   for e in edges):
+        errors.append(f"suppression.band_edges: expected a list of numbers, got {edges!r}")
+        edges = DEFAULT_BAND_EDGES
+    rs.band_edges = tuple(float(e) for e in edges)  # count/order are policy checks (haws.privacy)
+
+    if errors:
+        raise ValueError("invalid risk rules: " + "; ".join(errors))
+    return rs
+
+def as_ruleset(rules: Any) -> Ruleset:
+    """A Ruleset as is, or a raw rules dict compiled."""
+    return rules if isinstance(rules, Ruleset) else compile_rules(rules)
+
+def load_ruleset(path: Path = DEFAULT_RULES_PATH) -> Ruleset:
+    return compile_rules(load_rules(path), source=str(path))
+
+def _file_key(path: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+class RuleWatcher:
+    """Poll a rules file and swap in its compiled Ruleset when it changes.
+
+    `current` is rebound in one assignment, so readers on other threads see the old
+    or the new ruleset, never a mix. on_change(old, new) runs on the polling thread.
+    """
+
+    def __init__(self, path: Path = DEFAULT_RULES_PATH, interval_s: float = WATCH_INTERVAL_S,
+                 on_change: Optional[Callable[[Ruleset, Ruleset], None]] = None):
+        self.path = Path(path)
+        self.interval_s = interval_s
+        self.on_change = on_change
+        self.key = _file_key(self.path)
+        self.current = load_ruleset(self.path)
+        self.loaded_at = time.time()
+        self.reloads = 0
+        self.error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check(self) -> Optional[Tuple[Ruleset, Ruleset]]:
+        """Reload if the file changed; returns (old, new) when a new ruleset was swapped in."""
+        key = _file_key(self.path)
+        if key == self.key:
+            return None
+        self.key = key
+        try:
+            new = load_ruleset(self.path)
+        except LOAD_ERRORS as e:
+            self.error = f"{type(e).__name__}: {e}"
+            return None
+        self.error = None
+        if new.version == self.current.version:
+            return None
+        old, self.current = self.current, new
+        self.loaded_at = time.time()
+        self.reloads += 1
+        if self.on_change is not None:
+            self.on_change(old, new)
+        return old, new
+
+    def status(self) -> Dict[str, Any]:
+        return {"path": str(self.path), "version": self.current.version,
+                "loaded_at": utc_iso(self.loaded_at),
+                "reloads": self.reloads, "error": self.error}
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self.check()
+
+    def start(self) -> "RuleWatcher":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="haws-rules-watch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,674 @@
+"""
+haws.serve — Asyncio Serve layer: alert fan-out over WebSocket, cached snapshots, telemetry.
+
+Stdlib only (asyncio streams, a minimal HTTP/1.1 parser and RFC 6455 framing):
+
+  POST /events             JSONL batch -> Ingest -> Score; alerts are pushed to subscribers
+  POST /flush              final scoring tick (end of a replay)
+  GET  /alerts/stream      WebSocket; ?site_id= filters; clients may send telemetry frames
+  GET  /snapshot           site snapshot JSON (TTL cached, ETag / If-None-Match -> 304)
+  GET  /team-views         banded team views through the privacy guard (haws.privacy)
+  POST /telemetry          {"alert_id", "action": "ack"|"explain", "user_role"} (or JSONL)
+  GET  /rules               compiled ruleset, watcher status, recent changes with their what-if
+  POST /rules/what-if       YAML body: alerts it would alter over the replay window (no swap)
+  GET  /stats, /health     counters, event_to_api latency KPI
+
+Fan-out: a batch of alerts is stamped with ts_served and encoded into one WebSocket
+frame once; each subscriber has a bounded queue and a writer task. A full queue
+drops its oldest frame (dashboards want the newest state) and a client that keeps
+falling behind (max_drops) is disconnected, so a slow socket never stalls the others.
+
+Scoring runs on one worker thread (batches stay in order); the loop only sees its
+results. Snapshots are built from that published state at most once per TTL, so
+polling clients share one encoded body. Telemetry and served alerts are appended to
+in-memory buffers and written to JSONL by a background task in the default executor,
+in the format bin/haws-export-week reads (--telemetry, --alerts).
+
+Rules hot reload (rules_path + watch_rules_s): a RuleWatcher (haws.rules) polls the
+file; a new ruleset is applied as a job on the scoring thread, between two batches,
+so ingest never stops and no batch sees a mix. The replay window (haws.sim) taken
+at that point is then re-scored under the old and new rules off the scoring thread,
+and the what-if report is kept with the change. Team-view suppression settings are
+read at start-up only.
+"""
+import asyncio
+import base64
+import hashlib
+import os
+import struct
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs
+
+from .ingest import dumps, loads, parse_ts, utc_iso
+from .latency import LatencyRecorder
+from .pipeline import Pipeline
+from .privacy import TeamViews
+from .rules import RuleWatcher, Ruleset, as_ruleset, compile_rules, parse_rules
+from .sim import REPLAY_LINES, ReplayWindow, what_if
+
+QUEUE_SIZE = 256          # frames buffered per subscriber
+MAX_DROPS = 1024          # frames a subscriber may lose before it is disconnected
+SNAPSHOT_TTL_S = 1.0
+RECENT_ALERTS = 100
+TRACKED_ALERTS = 10000    # alert ids remembered for the ack / explain rates (least recent dropped)
+PRESENCE_WINDOWS = 2      # team-view windows whose worker presence is remembered
+FLUSH_S = 1.0             # telemetry / alert log write interval
+MAX_BODY = 64 << 20
+MAX_WS_MESSAGE = 1 << 20
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+TELEMETRY_ACTIONS = ("ack", "explain")
+TEAM_METRICS = {"proximity": "near_misses", "geofence": "geofence_violations"}
+RULE_CHANGES = 10         # rule changes (with their what-if reports) kept for GET /rules
+WHAT_IF_ITEMS = 20        # alerts listed per kind in a what-if report
+
+OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x1, 0x2, 0x8, 0x9, 0xA
+REASONS = {200: "OK", 204: "No Content", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+# ---- WebSocket framing ----------------------------------------------------------------
+
+def ws_accept(key: str) -> str:
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode("ascii")).digest()).decode("ascii")
+
+def ws_frame(payload: bytes, opcode: int = OP_TEXT, mask: bool = False) -> bytes:
+    """One final frame; clients must mask (mask=True), servers must not."""
+    n = len(payload)
+    head = bytes([0x80 | opcode])
+    bit = 0x80 if mask else 0
+    if n < 126:
+        head += bytes([bit | n])
+    elif n < 1 << 16:
+        head += bytes([bit | 126]) + struct.pack("!H", n)
+    else:
+        head += bytes([bit | 127]) + struct.pack("!Q", n)
+    if not mask:
+        return head + payload
+    key = os.urandom(4)
+    return head + key + _unmask(payload, key)
+
+def _unmask(data: bytes, key: bytes) -> bytes:
+    n = len(data)
+    k = int.from_bytes((key * (n // 4 + 1))[:n], "big") if n else 0
+    return (int.from_bytes(data, "big") ^ k).to_bytes(n, "big") if n else b""
+
+async def ws_read(reader: asyncio.StreamReader, limit: int = MAX_WS_MESSAGE) -> Tuple[int, bytes]:
+    """Next (opcode, payload), reassembling fragments; raises ConnectionError on oversize."""
+    message = b""
+    first_op = None
+    while True:
+        b0, b1 = await reader.readexactly(2)
+        op, n = b0 & 0x0F, b1 & 0x7F
+        if n == 126:
+            n = struct.unpack("!H", await reader.readexactly(2))[0]
+        elif n == 127:
+            n = struct.unpack("!Q", await reader.readexactly(8))[0]
+        if n > limit:
+            raise ConnectionError("websocket message too large")
+        key = await reader.readexactly(4) if b1 & 0x80 else None
+        data = await reader.readexactly(n)
+        if key is not None:
+            data = _unmask(data, key)
+        if op >= 0x8:
+            return op, data  # control frames are never fragmented
+        if first_op is None:
+            first_op = op
+        message += data
+        if len(message) > limit:
+            raise ConnectionError("websocket message too large")
+        if b0 & 0x80:
+            return first_op, message
+
+async def ws_connect(host: str, port: int, path: str = "/alerts/stream") -> Tuple[asyncio.StreamReader,
+                                                                                 asyncio.StreamWriter]:
+    """Client handshake (for bin/haws-serve-load and local dashboards)."""
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_WS_MESSAGE)
+    key = base64.b64encode(os.urandom(16)).decode("ascii")
+    writer.write((f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\n"
+                  f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n")
+                 .encode("latin-1"))
+    await writer.drain()
+    status = await reader.readline()
+    accept = None
+    while True:
+        h = await reader.readline()
+        if h in (b"\r\n", b""):
+            break
+        k, _, v = h.decode("latin-1").partition(":")
+        if k.strip().lower() == "sec-websocket-accept":
+            accept = v.strip()
+    if b" 101 " not in status or accept != ws_accept(key):
+        writer.close()
+        raise ConnectionError(f"websocket handshake failed: {status.decode('latin-1').strip()}")
+    return reader, writer
+
+# ---- state pieces ---------------------------------------------------------------------
+
+class Subscriber:
+    __slots__ = ("queue", "site_id", "dropped", "sent", "peer")
+
+    def __init__(self, site_id: Optional[str], size: int, peer: str = ""):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+        self.site_id = site_id
+        self.dropped = 0
+        self.sent = 0
+        self.peer = peer
+
+class AlertHub:
+    """Fan-out of pre-encoded frames to bounded per-subscriber queues."""
+
+    def __init__(self, queue_size: int = QUEUE_SIZE, max_drops: int = MAX_DROPS):
+        self.queue_size = queue_size
+        self.max_drops = max_drops
+        self.subscribers: Set[Subscriber] = set()
+        self.published = 0
+        self.dropped = 0
+        self.evicted = 0
+
+    def subscribe(self, site_id: Optional[str] = None, peer: str = "") -> Subscriber:
+        sub = Subscriber(site_id, self.queue_size, peer)
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self.subscribers.discard(sub)
+
+    def publish(self, site_id: str, frame: bytes) -> None:
+        self.published += 1
+        for sub in self.subscribers:
+            if sub.site_id is not None and sub.site_id != site_id:
+                continue
+            q = sub.queue
+            if q.full():
+                q.get_nowait()  # drop the oldest: the newest alerts matter most
+                sub.dropped += 1
+                self.dropped += 1
+            q.put_nowait(frame)
+
+class SnapshotCache:
+    """Encoded snapshot per key, rebuilt at most once per ttl_s."""
+
+    def __init__(self, build: Callable[[str], Dict[str, Any]], ttl_s: float = SNAPSHOT_TTL_S,
+                 clock: Callable[[], float] = time.monotonic):
+        self.build = build
+        self.ttl_s = ttl_s
+        self.clock = clock
+        self.entries: Dict[str, Tuple[float, bytes, str]] = {}
+        self.hits = 0
+        self.builds = 0
+
+    def get(self, key: str) -> Tuple[bytes, str]:
+        now = self.clock()
+        entry = self.entries.get(key)
+        if entry is not None and now - entry[0] < self.ttl_s:
+            self.hits += 1
+            return entry[1], entry[2]
+        body = dumps(self.build(key))
+        etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+        self.entries[key] = (now, body, etag)
+        self.builds += 1
+        return body, etag
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        if key is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(key, None)
+
+class JsonlSpool:
+    """Append-only JSONL written by a background task, never from the request path."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.buffer: List[bytes] = []
+        self.written = 0
+
+    def append(self, record: Dict[str, Any]) -> None:
+        if self.path:
+            self.buffer.append(dumps(record))
+
+    def extend(self, records: List[Dict[str, Any]]) -> None:
+        if self.path:
+            self.buffer.extend(dumps(r) for r in records)
+
+    def _write(self, lines: List[bytes]) -> None:
+        with open(self.path, "ab") as f:
+            f.write(b"\n".join(lines) + b"\n")
+
+    async def flush(self) -> None:
+        if self.buffer:
+            lines, self.buffer = self.buffer, []
+            await asyncio.get_running_loop().run_in_executor(None, self._write, lines)
+            self.written += len(lines)
+
+# ---- the app --------------------------------------------------------------------------
+
+class ServeApp:
+    """One site's Ingest → Score → Serve endpoint."""
+
+    def __init__(self, rules: Any, site_id: str, queue_size: int = QUEUE_SIZE,
+                 max_drops: int = MAX_DROPS, snapshot_ttl_s: float = SNAPSHOT_TTL_S,
+                 telemetry_out: Optional[str] = None, alerts_out: Optional[str] = None,
+                 flush_s: float = FLUSH_S, rules_path: Optional[str] = None,
+                 watch_rules_s: Optional[float] = None, replay_lines: int = REPLAY_LINES,
+                 on_rules_change: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.site_id = site_id
+        self.watcher = RuleWatcher(rules_path, watch_rules_s) if rules_path and watch_rules_s else None
+        self.rules: Ruleset = self.watcher.current if self.watcher is not None else as_ruleset(rules)
+        self.on_rules_change = on_rules_change
+        self.rule_changes: Deque[Dict[str, Any]] = deque(maxlen=RULE_CHANGES)
+        self.replay = ReplayWindow(replay_lines)  # scoring thread only
+        rules = self.rules
+        self.pipeline = Pipeline(rules, site_id=site_id)
+        self.scorer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="haws-score")
+        self.hub = AlertHub(queue_size, max_drops)
+        self.snapshots = SnapshotCache(self.build_snapshot, snapshot_ttl_s)
+        self.team_views = TeamViews(rules, tuple(TEAM_METRICS.values()), site_id=site_id)
+        # window index -> workers with a presence row; the last PRESENCE_WINDOWS windows only
+        self.presence_seen: Dict[int, Set[str]] = {}  # scoring thread only, like roles
+        self.roles: Dict[str, str] = {}
+        self.telemetry = JsonlSpool(telemetry_out)
+        self.alert_log = JsonlSpool(alerts_out)
+        self.flush_s = flush_s
+        self.latency = LatencyRecorder()
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=RECENT_ALERTS)
+        self.alert_counts: Counter = Counter()
+        # the rates are running counts; the ids only dedupe, for the last TRACKED_ALERTS alerts
+        self.geofence_served: "OrderedDict[str, bool]" = OrderedDict()  # alert id -> acked
+        self.geofence_count = 0
+        self.geofence_acked = 0
+        self.explained: "OrderedDict[str, None]" = OrderedDict()
+        self.explained_count = 0
+        self.telemetry_counts: Counter = Counter()
+        self.state: Dict[str, Any] = {}
+        self.events_in = 0
+        self.requests = 0
+        self.server: Optional[asyncio.base_events.Server] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._watch: Optional[asyncio.Task] = None
+        self._conns: Set[asyncio.Task] = set()  # one handle() task per open connection
+
+    # ---- scoring (worker thread) ------------------------------------------------------
+    def _score(self, lines: List[bytes], final: bool) -> Tuple[List[Dict[str, Any]], Dict[str, Any], Any]:
+        p = self.pipeline
+        if final:
+            alerts = p.flush()
+            events: List[dict] = []
+        else:
+            self.replay.extend(lines)
+            events = p.ingestor.decode(lines)
+            p.ingestor.route(events)
+            alerts = p.process(events)
+        rows = self._team_rows(events, alerts)
+        prox = p.proximity
+        state = {"watermark": utc_iso(p.watermark) if abs(p.watermark) != float("inf") else None,
+                 "workers": len(prox.workers), "equipment": len(prox.equipment),
+                 "proximity_active": len(prox.active), "geofence_active": len(p.geofence.active_hits),
+                 "zones": len(p.geofence.zones), "events": len(events), "ticks": p.ticks}
+        return alerts, state, rows
+
+    async def score(self, lines: List[bytes], final: bool = False) -> List[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        alerts, state, rows = await loop.run_in_executor(self.scorer, self._score, lines, final)
+        self.events_in += state["events"]
+        self.state = state
+        if rows is not None:
+            self.team_views.add(*rows)
+        self.publish(alerts)
+        return alerts
+
+    def _team_rows(self, events: List[dict], alerts: List[Dict[str, Any]]) -> Optional[tuple]:
+        """Columns for the team views: one presence row per worker and window, one row per
+        worker alert. Runs on the scoring thread (presence_seen/roles are its state)."""
+        window_s = self.team_views.settings.window_s
+        ts: List[float] = []
+        workers: List[str] = []
+        roles: List[str] = []
+        metric: List[Optional[str]] = []
+        for e in events:
+            if e["topic"] != "site/worker":
+                continue
+            pl = e["payload"]
+            wid = pl["worker_id"]
+            role = self.roles[wid] = pl.get("role") or "unknown"
+            at = parse_ts(e["ts_event"])
+            window = int(at // window_s)
+            seen = self.presence_seen.get(window)
+            if seen is None:
+                seen = self.presence_seen[window] = set()
+                if len(self.presence_seen) > PRESENCE_WINDOWS:
+                    for old in sorted(self.presence_seen)[:-PRESENCE_WINDOWS]:
+                        del self.presence_seen[old]
+            if wid not in seen:
+                seen.add(wid)
+                ts.append(at); workers.append(wid); roles.append(role); metric.append(None)
+        for a in alerts:
+            name = TEAM_METRICS.get(a.get("kind"))
+            wid = a.get("worker_id")
+            if name and wid:
+                ts.append(parse_ts(a["ts_event"])); workers.append(wid)
+                roles.append(self.roles.get(wid, "unknown")); metric.append(name)
+        if not ts:
+            return None
+        amounts = {m: [1.0 if x == m else 0.0 for x in metric] for m in TEAM_METRICS.values()}
+        return ts, workers, roles, amounts
+
+    # ---- rules hot reload ----------------------------------------------------------------
+    def _swap_rules(self, new: Ruleset) -> List[bytes]:
+        """Scoring thread, between batches: the replay window as of now, then the swap."""
+        lines = self.replay.snapshot()
+        self.pipeline.apply_rules(new)
+        return lines
+
+    async def what_if(self, new: Ruleset, lines: Optional[List[bytes]] = None,
+                      old: Optional[Ruleset] = None) -> Dict[str, Any]:
+        """Re-score the replay window (or lines) under old (default: current) and new rules."""
+        loop = asyncio.get_running_loop()
+        if lines is None:
+            lines = await loop.run_in_executor(self.scorer, self.replay.snapshot)
+        return await loop.run_in_executor(None, what_if, lines, old or self.rules, new, self.site_id,
+                                          self.pipeline.tick_s, WHAT_IF_ITEMS)
+
+    async def apply_rules(self, new: Ruleset) -> Dict[str, Any]:
+        """Swap in a ruleset without pausing ingest; returns its what-if report."""
+        loop = asyncio.get_running_loop()
+        old = self.rules
+        lines = await loop.run_in_executor(self.scorer, self._swap_rules, new)
+        self.rules = new
+        self.snapshots.invalidate()
+        report = await self.what_if(new, lines, old)
+        report["ts_applied"] = utc_iso(time.time())
+        self.rule_changes.append(report)
+        if self.on_rules_change is not None:
+            self.on_rules_change(report)
+        return report
+
+    async def _watch_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.watcher.interval_s)
+            changed = await loop.run_in_executor(None, self.watcher.check)
+            if changed is not None:
+                await self.apply_rules(changed[1])
+
+    # ---- fan-out -----------------------------------------------------------------------
+    def publish(self, alerts: List[Dict[str, Any]]) -> None:
+        if not alerts:
+            return
+        ts_served = utc_iso(time.time())
+        for a in alerts:
+            a["ts_served"] = ts_served
+            self.alert_counts[a["rule"]] += 1
+            if a["rule"] == "geofence_violation" and a["alert_id"] not in self.geofence_served:
+                self.geofence_served[a["alert_id"]] = False
+                self.geofence_count += 1
+                if len(self.geofence_served) > TRACKED_ALERTS:
+                    self.geofence_served.popitem(last=False)
+        self.latency.observe_many(alerts)
+        self.recent.extend(alerts)
+        self.alert_log.extend(alerts)
+        frame = ws_frame(dumps({"type": "alerts", "site_id": self.site_id, "alerts": alerts}))
+        self.hub.publish(self.site_id, frame)
+
+    # ---- telemetry ---------------------------------------------------------------------
+    def record_telemetry(self, entry: Any) -> bool:
+        if type(entry) is not dict or entry.get("action") not in TELEMETRY_ACTIONS or not entry.get("alert_id"):
+            return False
+        record = {"alert_id": str(entry["alert_id"]), "action": entry["action"],
+                  "user_role": entry.get("user_role"), "site_id": self.site_id,
+                  "ts_click": entry.get("ts_click") or utc_iso(time.time())}
+        self.telemetry_counts[record["action"]] += 1
+        alert_id = record["alert_id"]
+        if record["action"] == "ack":
+            if self.geofence_served.get(alert_id) is False:
+                self.geofence_served[alert_id] = True
+                self.geofence_acked += 1
+        elif alert_id in self.explained:
+            self.explained.move_to_end(alert_id)
+        else:
+            self.explained[alert_id] = None
+            self.explained_count += 1
+            if len(self.explained) > TRACKED_ALERTS:
+                self.explained.popitem(last=False)
+        self.telemetry.append(record)
+        return True
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_s)
+            await self.telemetry.flush()
+            await self.alert_log.flush()
+
+    # ---- snapshot / stats --------------------------------------------------------------
+    def build_snapshot(self, site_id: str) -> Dict[str, Any]:
+        served = sum(self.alert_counts.values())
+        return {
+            "site_id": site_id,
+            "ts_snapshot": utc_iso(time.time()),
+            "state": self.state,
+            "alert_counts": dict(self.alert_counts),
+            "recent_alerts": list(self.recent)[-20:],
+            "geofence_violations_ack_rate": round(self.geofence_acked / self.geofence_count, 3)
+            if self.geofence_count else 0,
+            "explain_alert_click_rate": round(self.explained_count / served, 3) if served else 0,
+            **self.latency.kpi(now=self.latency.latest()),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        h = self.hub
+        return {"subscribers": len(h.subscribers), "published": h.published, "dropped": h.dropped,
+                "evicted": h.evicted, "events_in": self.events_in, "alerts": dict(self.alert_counts),
+                "snapshot_builds": self.snapshots.builds, "snapshot_hits": self.snapshots.hits,
+                "telemetry": dict(self.telemetry_counts), "telemetry_written": self.telemetry.written,
+                "requests": self.requests, "rules_version": self.rules.version,
+                **self.latency.kpi(now=self.latency.latest())}
+
+    # ---- HTTP --------------------------------------------------------------------------
+    async def start(self, host: str = "127.0.0.1", port: int = 8080, backlog: int = 4096) -> None:
+        self.server = await asyncio.start_server(self.handle, host, port, backlog=backlog, limit=1 << 16)
+        self._flusher = asyncio.create_task(self._flush_loop())
+        if self.watcher is not None:
+            self._watch = asyncio.create_task(self._watch_loop())
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self) -> None:
+        """Stop accepting, end every open connection and background task, then flush the logs."""
+        if self.server is not None:
+            self.server.close()
+        for sub in list(self.hub.subscribers):
+            self.hub.unsubscribe(sub)
+            if sub.queue.full():
+                sub.queue.get_nowait()
+            sub.queue.put_nowait(None)  # ends its writer task
+        tasks = [t for t in (self._flusher, self._watch) if t is not None] + list(self._conns)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+        await self.telemetry.flush()
+        await self.alert_log.flush()
+        self.scorer.shutdown(wait=True)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._conns.add(task)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "bad request line"}, close=True)
+                    return
+                headers: Dict[str, str] = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {"error": "body too large"}, close=True)
+                    return
+                body = await reader.readexactly(length) if length else b""
+                path, _, query = target.partition("?")
+                params = {k: v[-1] for k, v in parse_qs(query).items()}
+                self.requests += 1
+                if path == "/alerts/stream" and headers.get("upgrade", "").lower() == "websocket":
+                    await self.websocket(reader, writer, headers, params)
+                    return
+                close = headers.get("connection", "").lower() == "close" or version == "HTTP/1.0"
+                try:
+                    status, payload, extra = await self.route(method, path, params, headers, body)
+                except Exception as e:  # keep serving other clients
+                    status, payload, extra = 500, {"error": f"{type(e).__name__}: {e}"}, {}
+                await self._respond(writer, status, payload, extra, close)
+                if close:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.LimitOverrunError, ValueError):
+            return
+        except asyncio.CancelledError:
+            return  # close(): the connection just ends (a cancelled handler would be logged by asyncio)
+        finally:
+            self._conns.discard(task)
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: Any,
+                       extra: Optional[Dict[str, str]] = None, close: bool = False) -> None:
+        body = payload if isinstance(payload, bytes) else (dumps(payload) if payload is not None else b"")
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Length: {len(body)}",
+                "Content-Type: application/json", f"Connection: {'close' if close else 'keep-alive'}"]
+        head += [f"{k}: {v}" for k, v in (extra or {}).items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def route(self, method: str, path: str, params: Dict[str, str], headers: Dict[str, str],
+                    body: bytes) -> Tuple[int, Any, Dict[str, str]]:
+        if path == "/events":
+            if method != "POST":
+                return 405, {"error": "POST only"}, {}
+            alerts = await self.score(body.splitlines(keepends=True))
+            return 200, {"accepted": self.state.get("events", 0), "alerts": len(alerts)}, {}
+        if path == "/flush" and method == "POST":
+            alerts = await self.score([], final=True)
+            return 200, {"alerts": len(alerts)}, {}
+        if path == "/telemetry":
+            if method != "POST":
+                return 405, {"error": "POST only"}, {}
+            ok = bad = 0
+            for line in body.splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    entry = loads(line)
+                except ValueError:
+                    bad += 1
+                    continue
+                for e in entry if type(entry) is list else [entry]:
+                    if self.record_telemetry(e):
+                        ok += 1
+                    else:
+                        bad += 1
+            return (200 if ok or not bad else 400), {"recorded": ok, "rejected": bad}, {}
+        if path == "/rules/what-if":
+            if method != "POST":
+                return 405, {"error": "POST only"}, {}
+            try:
+                new = compile_rules(parse_rules(body.decode("utf-8")), source="POST /rules/what-if")
+            except Exception as e:  # YAML syntax or validation
+                return 400, {"error": f"{type(e).__name__}: {e}"}, {}
+            return 200, await self.what_if(new), {}
+        if method != "GET":
+            return 405, {"error": "GET only"}, {}
+        if path == "/rules":
+            return 200, {"version": self.rules.version, "tables": self.rules.tables(),
+                         "watch": self.watcher.status() if self.watcher is not None else None,
+                         "changes": list(self.rule_changes)}, {}
+        if path == "/snapshot":
+            site = params.get("site_id", self.site_id)
+            if site != self.site_id:
+                return 404, {"error": f"unknown site_id {site!r}"}, {}
+            body_bytes, etag = self.snapshots.get(site)
+            if headers.get("if-none-match") == etag:
+                return 304, None, {"ETag": etag}
+            return 200, body_bytes, {"ETag": etag, "Cache-Control": f"max-age={self.snapshots.ttl_s:g}"}
+        if path == "/team-views":
+            t = self.pipeline.proximity.now
+            views = self.team_views.views(t) if t != float("-inf") else []
+            return 200, {"site_id": self.site_id, "views": views,
+                         "guardrail": self.team_views.guardrail_pass()}, {}
+        if path == "/stats":
+            return 200, self.stats(), {}
+        if path == "/health":
+            return 200, {"ok": True}, {}
+        return 404, {"error": f"no route {path}"}, {}
+
+    async def websocket(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                        headers: Dict[str, str], params: Dict[str, str]) -> None:
+        key = headers.get("sec-websocket-key")
+        if not key:
+            await self._respond(writer, 400, {"error": "missing Sec-WebSocket-Key"}, close=True)
+            return
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {ws_accept(key)}\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+        peer = writer.get_extra_info("peername")
+        sub = self.hub.subscribe(params.get("site_id"), str(peer))
+        sender = asyncio.create_task(self._ws_send(sub, writer))
+        try:
+            while True:
+                op, data = await ws_read(reader)
+                if op == OP_CLOSE:
+                    break
+                if op == OP_PING:
+                    if not sub.queue.full():
+                        sub.queue.put_nowait(ws_frame(data, OP_PONG))
+                elif op == OP_TEXT:
+                    try:
+                        self.record_telemetry(loads(data))
+                    except ValueError:
+                        pass
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.hub.unsubscribe(sub)
+            sender.cancel()
+            try:
+                writer.write(ws_frame(b"", OP_CLOSE))
+            except (ConnectionError, RuntimeError):
+                pass
+
+    async def _ws_send(self, sub: Subscriber, writer: asyncio.StreamWriter) -> None:
+        q = sub.queue
+        try:
+            while True:
+                frame = await q.get()
+                if frame is None:
+                    break
+                writer.write(frame)
+                n = 1
+                while not q.empty():  # coalesce whatever queued up meanwhile into one drain
+                    frame = q.get_nowait()
+                    if frame is None:
+                        break
+                    writer.write(frame)
+                    n += 1
+                sub.sent += n
+                if sub.dropped > self.hub.max_drops:
+                    self.hub.evicted += 1
+                    break  # persistently too slow: let it reconnect and resync from /snapshot
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.hub.unsubscribe(sub)
+            writer.close()
@@ -0,0 +1,332 @@
+"""
+haws.shard — Ingest → Score sharded by site_id across worker processes.
+
+One ShardScheduler owns N worker processes. Each site_id is pinned to one shard
+(the one with the fewest sites when the site first shows up), and each shard keeps
+a Pipeline — proximity, geofence and heat state — per site it owns, so sites never
+share scorer state and a shard never waits on another.
+
+- batches: the coordinator splits raw JSONL lines by site_id (a byte search for the
+  top-level "site_id"; lines without one belong to the default site) and copies each
+  shard's lines into one of its shared-memory slots; the pipe only carries the slot
+  number and (site, start, end) offsets. Results come back as alert JSONL in the
+  slot's output segment (inline bytes on the pipe if they don't fit).
+- pipelining: SLOTS_PER_SHARD batches per shard can be in flight, so the coordinator
+  splits the next batch while the shards score the previous one.
+- merge: alerts are released in (ts_event, site_id, arrival) order. Each reply
+  carries the shard's frontier (Pipeline.horizon over its sites, capped by its
+  latest event time), a lower bound on the ts_event of anything it can still emit;
+  alerts before the lowest frontier are final. flush() releases the rest.
+- stream time: every batch also carries its stream time (the payload ts of its last
+  timed line), and every shard with sites gets it, lines or not: each of its
+  Pipelines runs a tick that is due by then (Pipeline.advance), so a quiet site
+  doesn't hold the frontier back and alerts don't pile up until flush().
+
+Ordering assumes time-ordered input, as the single-site Pipeline does; the output
+is the same for any worker count.
+"""
+import heapq
+import math
+import multiprocessing as mp
+import re
+import traceback
+from collections import deque
+from multiprocessing import shared_memory
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .ingest import BATCH_BYTES, DEFAULT_SITE_ID, dumps, iter_batches, load_schema, loads, parse_ts
+from .pipeline import TICK_S, Pipeline
+
+SLOTS_PER_SHARD = 2
+SLOT_BYTES = 2 * BATCH_BYTES   # initial segment size; grown (power of two) for larger batches
+_SITE_RE = re.compile(rb'"site_id"\s*:\s*"([^"\\]*)"')
+_SITE_KEY = b'"site_id"'
+_TS_KEY = b'"ts"'
+
+Part = Tuple[str, int, int]  # site_id, start, end in the slot
+
+def site_of(line: bytes) -> Optional[str]:
+    """The line's top-level site_id, if any (as Ingestor.decode reads it).
+
+    The byte match is taken when only the line's opening brace comes before it;
+    a site_id in a nested object (or after one, or with escapes) means parsing the line.
+    """
+    m = _SITE_RE.search(line)
+    if m is not None:
+        head = line[:m.start()]
+        if head.count(b"{") == 1 and b"}" not in head:
+            return m.group(1).decode("utf-8") or None
+    try:
+        record = loads(line)
+    except ValueError:
+        return None
+    site = record.get("site_id") if type(record) is dict else None
+    return site if type(site) is str and site else None
+
+def split_by_site(lines: List[bytes], default_site: str = DEFAULT_SITE_ID) -> Dict[str, List[bytes]]:
+    """Group raw lines by their top-level site_id, keeping input order per site."""
+    if not lines:
+        return {}
+    if not any(_SITE_KEY in line for line in lines):
+        return {default_site: lines}
+    sites: Dict[str, List[bytes]] = {}
+    for line in lines:
+        site = (site_of(line) if _SITE_KEY in line else None) or default_site
+        bucket = sites.get(site)
+        if bucket is None:
+            bucket = sites[site] = []
+        bucket.append(line)
+    return sites
+
+def stream_time(lines: List[bytes]) -> Optional[float]:
+    """Payload ts of the last line that has one (time-ordered input: the batch's latest)."""
+    for line in reversed(lines):
+        if _TS_KEY not in line:
+            continue
+        try:
+            record = loads(line)
+            ts = record["payload"]["ts"]
+            return parse_ts(ts) if type(ts) is str else None
+        except (ValueError, TypeError, KeyError):
+            continue
+    return None
+
+def frontier(pipelines: Iterable[Pipeline]) -> float:
+    """Lowest ts_event these pipelines (and sites still to come) can emit."""
+    low, latest = math.inf, -math.inf
+    for p in pipelines:
+        low = min(low, p.horizon)
+        if p.next_tick is not None:
+            latest = max(latest, p.next_tick - p.tick_s)
+    return min(low, latest)
+
+def _attach(name: str, cache: Dict[str, shared_memory.SharedMemory]) -> shared_memory.SharedMemory:
+    shm = cache.get(name)
+    if shm is None:
+        shm = cache[name] = shared_memory.SharedMemory(name=name)
+    return shm
+
+def _shard_main(conn, rules: Dict[str, Any], tick_s: float) -> None:
+    """Worker loop: (slot, in_name, out_name, parts, now, final) -> (slot, nbytes, inline, frontier, events)."""
+    segments: Dict[str, shared_memory.SharedMemory] = {}
+    pipelines: Dict[str, Pipeline] = {}
+    try:
+        schema = load_schema()
+        while True:
+            msg = conn.recv()
+            if msg is None:
+                break
+            slot, in_name, out_name, parts, now, final = msg
+            if in_name not in segments:
+                # the coordinator replaced a grown segment: drop the old mappings
+                for name in [n for n in segments if n != out_name]:
+                    segments.pop(name).close()
+            buf = _attach(in_name, segments).buf
+            alerts: List[Dict[str, Any]] = []
+            events = 0
+            for site, start, end in parts:
+                p = pipelines.get(site)
+                if p is None:
+                    p = pipelines[site] = Pipeline(rules, site_id=site, tick_s=tick_s, schema=schema)
+                lines = bytes(buf[start:end]).splitlines(keepends=True)
+                events += len(lines)
+                alerts += p.feed_lines(lines)
+            if now is not None:
+                for p in pipelines.values():
+                    alerts += p.advance(now)
+            if final:
+                for p in pipelines.values():
+                    alerts += p.flush()
+            data = b"".join(dumps(a) + b"\n" for a in alerts)
+            out = _attach(out_name, segments)
+            if len(data) <= out.size:
+                out.buf[:len(data)] = data
+                conn.send((slot, len(data), None, frontier(pipelines.values()), events))
+            else:
+                conn.send((slot, len(data), data, frontier(pipelines.values()), events))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    except Exception:
+        conn.send(("error", traceback.format_exc()))
+    finally:
+        for shm in segments.values():
+            shm.close()
+        conn.close()
+
+class Shard:
+    """Coordinator-side handle: process, pipe and shared-memory slots of one shard."""
+
+    def __init__(self, index: int, rules: Dict[str, Any], tick_s: float, slots: int, slot_bytes: int,
+                 ctx: Any):
+        self.index = index
+        self.inputs = [shared_memory.SharedMemory(create=True, size=slot_bytes) for _ in range(slots)]
+        self.outputs = [shared_memory.SharedMemory(create=True, size=slot_bytes) for _ in range(slots)]
+        self.free: Deque[int] = deque(range(slots))
+        self.inflight = 0
+        self.sites = 0
+        self.frontier = math.inf   # no sites yet: nothing to wait for
+        self.events = 0
+        self.batches = 0
+        self.inline = 0
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_shard_main, args=(child, rules, tick_s), daemon=True,
+                                   name=f"haws-shard-{index}")
+        self.process.start()
+        child.close()
+
+    def send(self, data: bytes, parts: List[Part], now: Optional[float], final: bool) -> None:
+        slot = self.free.popleft()
+        if len(data) > self.inputs[slot].size:
+            old = self.inputs[slot]
+            size = 1 << (len(data) - 1).bit_length()
+            self.inputs[slot] = shared_memory.SharedMemory(create=True, size=size)
+            old.close()
+            old.unlink()
+        self.inputs[slot].buf[:len(data)] = data
+        self.conn.send((slot, self.inputs[slot].name, self.outputs[slot].name, parts, now, final))
+        self.inflight += 1
+        self.batches += 1
+
+    def receive(self) -> List[Dict[str, Any]]:
+        """Wait for the oldest in-flight batch; returns its alerts (emission order)."""
+        try:
+            msg = self.conn.recv()
+        except EOFError:
+            raise RuntimeError(f"shard {self.index} exited (code {self.process.exitcode})") from None
+        if msg[0] == "error":
+            raise RuntimeError(f"shard {self.index} failed:\n{msg[1]}")
+        slot, nbytes, inline, self.frontier, events = msg
+        self.events += events
+        if inline is None:
+            data = bytes(self.outputs[slot].buf[:nbytes])
+        else:
+            data = inline
+            self.inline += 1
+        self.free.append(slot)
+        self.inflight -= 1
+        return [loads(line) for line in data.splitlines()]
+
+    def close(self) -> None:
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=10)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+        for shm in self.inputs + self.outputs:
+            shm.close()
+            shm.unlink()
+
+class ShardScheduler:
+    """Score a multi-site JSONL stream on `workers` processes, sharded by site_id.
+
+    submit(lines) and flush() return the alerts that became final, in ts_event
+    order; run(stream) does both over a whole stream. Use as a context manager (or
+    call close()) so the workers and shared-memory segments are released.
+    """
+
+    def __init__(self, rules: Dict[str, Any], workers: int, site_id: str = DEFAULT_SITE_ID,
+                 tick_s: float = TICK_S, slots: int = SLOTS_PER_SHARD, slot_bytes: int = SLOT_BYTES):
+        if workers < 1:
+            raise ValueError(f"workers must be >= 1: {workers}")
+        self.site_id = site_id
+        self.owner: Dict[str, int] = {}
+        self.heap: List[Tuple[float, str, int, Dict[str, Any]]] = []
+        self.seq = 0
+        self.shards: List[Shard] = []
+        ctx = mp.get_context()
+        try:
+            for i in range(workers):
+                self.shards.append(Shard(i, rules, tick_s, slots, slot_bytes, ctx))
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self) -> "ShardScheduler":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def watermark(self) -> float:
+        """Alerts with ts_event strictly before this have been released."""
+        return min(s.frontier for s in self.shards)
+
+    def shard_of(self, site: str) -> Shard:
+        index = self.owner.get(site)
+        if index is None:
+            shard = min(self.shards, key=lambda s: (s.sites, s.index))
+            if not shard.sites:
+                shard.frontier = -math.inf  # until its first reply
+            shard.sites += 1
+            index = self.owner[site] = shard.index
+        return self.shards[index]
+
+    def _collect(self, shard: Shard) -> None:
+        for a in shard.receive():
+            heapq.heappush(self.heap, (parse_ts(a["ts_event"]), a["site_id"], self.seq, a))
+            self.seq += 1
+
+    def _release(self, bound: float) -> List[Dict[str, Any]]:
+        heap = self.heap
+        out: List[Dict[str, Any]] = []
+        while heap and heap[0][0] < bound:
+            out.append(heapq.heappop(heap)[3])
+        return out
+
+    def _dispatch(self, lines: List[bytes], final: bool) -> None:
+        batches: Dict[int, Tuple[List[bytes], List[Part]]] = {}
+        for site, site_lines in split_by_site(lines, self.site_id).items():
+            chunk = b"".join(site_lines)
+            shard = self.shard_of(site)
+            chunks, parts = batches.setdefault(shard.index, ([], []))
+            start = parts[-1][2] if parts else 0
+            chunks.append(chunk)
+            parts.append((site, start, start + len(chunk)))
+        now = stream_time(lines)
+        for shard in self.shards:
+            if shard.index not in batches and not final:
+                # an idle shard only needs the stream time when a tick of its sites may be due by then
+                if not shard.sites or now is None or shard.frontier > now:
+                    continue
+            chunks, parts = batches.get(shard.index, ([], []))
+            if not shard.free:
+                self._collect(shard)
+            shard.send(b"".join(chunks), parts, now, final)
+
+    def submit(self, lines: List[bytes]) -> List[Dict[str, Any]]:
+        """Queue one batch of raw lines; returns alerts that became final."""
+        self._dispatch(lines, final=False)
+        # pick up whatever is already done, without waiting
+        for shard in self.shards:
+            while shard.inflight and shard.conn.poll():
+                self._collect(shard)
+        return self._release(self.watermark)
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """End of input: final ticks on every shard; returns all remaining alerts."""
+        self._dispatch([], final=True)
+        for shard in self.shards:
+            while shard.inflight:
+                self._collect(shard)
+        return self._release(math.inf)
+
+    def run(self, stream, batch_bytes: int = BATCH_BYTES) -> Iterator[Dict[str, Any]]:
+        """Score a whole stream, yielding alerts in ts_event order."""
+        for lines in iter_batches(stream, batch_bytes):
+            yield from self.submit(lines)
+        yield from self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": len(self.shards), "sites": len(self.owner), "pending_alerts": len(self.heap),
+                "shards": [{"shard": s.index, "sites": s.sites, "events": s.events, "batches": s.batches,
+                            "inline_results": s.inline} for s in self.shards]}
+
+    def close(self) -> None:
+        for shard in self.shards:
+            shard.close()
+        self.shards = []
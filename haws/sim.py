@@ -0,0 +1,399 @@
+"""
+haws.sim — Golden-data scenario replay and validation.
+
+A scenario is a time-ordered `.jsonl` of {"topic", "payload"} lines; its expected
+output is `<scenario>.expected.jsonl`, one compact alert per line:
+
+  {"alert_id": ..., "kind": ..., "rule": ..., "ts_event": ..., ...}
+
+(A `.json` path given as the expected file holds the older single document,
+{"scenario": "<name>", "alerts": [...]}, and is still read and written.)
+
+Replay sends the lines through a transport — the in-process Pipeline, or the same
+pipeline behind a local HTTP stand-in for the served API — paced at real time, N×,
+or as fast as possible. Alerts are diffed against the expected file as they come
+out: the pipeline's watermark says which alert times are final, so missing alerts
+are reported as soon as their time has passed and --fail-fast stops there.
+
+Alerts match on alert_id (deterministic per rule, subjects and time); matched
+alerts are compared field by field, ignoring the wall-clock stamps in VOLATILE.
+
+what_if() uses the same diff for rule changes: it replays recent lines (kept by a
+ReplayWindow) under the old and the new ruleset and reports the alerts the change
+adds, removes or alters.
+"""
+import http.client
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .ingest import BATCH_BYTES, DEFAULT_SITE_ID, dumps, iter_batches, loads, parse_ts, utc_iso
+from .latency import LatencyRecorder
+from .pipeline import TICK_S, Pipeline
+from .rules import DEFAULT_RULES_PATH, as_ruleset, load_rules
+
+VOLATILE = ("ts_scored", "ts_served", "ts_ingest")
+PACED_BATCH_LINES = 256
+REPLAY_LINES = 100_000    # events kept for what-if replays
+REPLAY_ZONE_LINES = 4096  # zone definitions kept (oldest dropped first)
+ZONE_MARKERS = (b'"site/geofence"', b'"site/context"')
+
+def parse_speed(text: str) -> float:
+    """'max' -> inf, 'realtime' -> 1, '10x' / '10' -> 10."""
+    text = text.strip().lower()
+    if text in ("max", "fast", "asap"):
+        return math.inf
+    if text in ("realtime", "real-time", "1x"):
+        return 1.0
+    value = float(text[:-1] if text.endswith("x") else text)
+    if value <= 0:
+        raise ValueError(f"speed must be positive: {text}")
+    return value
+
+def expected_path(scenario: Path) -> Path:
+    return scenario.with_name(scenario.stem + ".expected.jsonl")
+
+def read_expected(path: Path) -> List[Dict[str, Any]]:
+    with open(path, "rb") as f:
+        if path.suffix == ".json":
+            return loads(f.read()).get("alerts", [])
+        return [loads(line) for line in f if line.strip()]
+
+def write_expected(path: Path, scenario: str, alerts: List[Dict[str, Any]]) -> None:
+    """Atomically (re)write an expected file; `.json` paths get the single-document format."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        if path.suffix == ".json":
+            f.write(json.dumps({"scenario": scenario, "alerts": [comparable(a) for a in alerts]}, indent=1).encode())
+            f.write(b"\n")
+        else:
+            f.writelines(dumps(comparable(a)) + b"\n" for a in alerts)
+    os.replace(tmp, path)
+
+def line_time(line: bytes) -> Optional[float]:
+    try:
+        ts = loads(line)["payload"].get("ts")
+        return parse_ts(ts) if ts else None
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+def paced_batches(stream, speed: float) -> Iterator[List[bytes]]:
+    """Line batches released on the scenario's own clock scaled by speed."""
+    if speed == math.inf:
+        yield from iter_batches(stream, BATCH_BYTES)
+        return
+    start_wall = None
+    start_ts = None
+    pending: List[bytes] = []
+    for line in stream:
+        t = line_time(line)
+        if t is not None:
+            if start_ts is None:
+                start_ts, start_wall = t, time.monotonic()
+            delay = start_wall + (t - start_ts) / speed - time.monotonic()
+            if delay > 0:
+                if pending:
+                    yield pending
+                    pending = []
+                time.sleep(delay)
+        pending.append(line)
+        if len(pending) >= PACED_BATCH_LINES:
+            yield pending
+            pending = []
+    if pending:
+        yield pending
+
+# ---- transports ----------------------------------------------------------------------
+
+def stamp_served(alerts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if alerts:
+        ts_served = utc_iso(time.time())
+        for a in alerts:
+            a["ts_served"] = ts_served
+    return alerts
+
+class InProcessTransport:
+    """Calls the pipeline directly; returning the alerts counts as serving them."""
+
+    def __init__(self, pipeline: Pipeline):
+        self.pipeline = pipeline
+
+    def send(self, lines: List[bytes]) -> Tuple[List[Dict[str, Any]], float]:
+        return stamp_served(self.pipeline.feed_lines(lines)), self.pipeline.watermark
+
+    def finish(self) -> Tuple[List[Dict[str, Any]], float]:
+        return stamp_served(self.pipeline.flush()), math.inf
+
+    def close(self) -> None:
+        pass
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):  # keep replays quiet
+        pass
+
+    def _reply(self, body: Dict[str, Any]) -> None:
+        data = dumps(body)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        pipeline: Pipeline = self.server.pipeline
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        with self.server.lock:
+            if self.path == "/events":
+                alerts = pipeline.feed_lines(body.splitlines(keepends=True))
+            elif self.path == "/flush":
+                alerts = pipeline.flush()
+            else:
+                self.send_error(404)
+                return
+            watermark = pipeline.watermark
+        stamp_served(alerts)
+        # JSON has no infinities: null is "nothing final yet" (-inf), "final" marks end of stream
+        self._reply({"alerts": alerts, "watermark": watermark if math.isfinite(watermark) else None,
+                     "final": self.path == "/flush"})
+
+class StandInServer:
+    """Local HTTP stand-in for the served API: POST /events (JSONL) and /flush -> alerts."""
+
+    def __init__(self, pipeline: Pipeline, host: str = "127.0.0.1", port: int = 0):
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.pipeline = pipeline
+        self.httpd.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.httpd.server_address[:2]
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class HttpTransport:
+    """Posts batches to a StandInServer over one keep-alive connection."""
+
+    def __init__(self, pipeline: Pipeline):
+        self.server = StandInServer(pipeline)
+        self.conn = http.client.HTTPConnection(*self.server.address)
+
+    def _post(self, path: str, body: bytes) -> Tuple[List[Dict[str, Any]], float]:
+        self.conn.request("POST", path, body=body, headers={"Content-Type": "application/x-ndjson"})
+        resp = loads(self.conn.getresponse().read())
+        if resp.get("final"):
+            return resp["alerts"], math.inf
+        watermark = resp.get("watermark")
+        return resp["alerts"], (-math.inf if watermark is None else watermark)
+
+    def send(self, lines: List[bytes]) -> Tuple[List[Dict[str, Any]], float]:
+        return self._post("/events", b"".join(line if line.endswith(b"\n") else line + b"\n" for line in lines))
+
+    def finish(self) -> Tuple[List[Dict[str, Any]], float]:
+        return self._post("/flush", b"")
+
+    def close(self) -> None:
+        self.conn.close()
+        self.server.close()
+
+TRANSPORTS = {"inproc": InProcessTransport, "http": HttpTransport}
+
+# ---- validation ----------------------------------------------------------------------
+
+def comparable(alert: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in alert.items() if k not in VOLATILE}
+
+class IncrementalDiff:
+    """Streaming comparison of actual alerts against the expected list."""
+
+    def __init__(self, expected: List[Dict[str, Any]], max_items: int = 50):
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.by_time: List[Tuple[float, str]] = []
+        for a in expected:
+            self.pending[a["alert_id"]] = comparable(a)
+            self.by_time.append((parse_ts(a["ts_event"]), a["alert_id"]))
+        self.by_time.sort(reverse=True)  # pop() yields the earliest
+        self.expected = len(self.pending)
+        self.actual = 0
+        self.matched = 0
+        self.missing: List[Dict[str, Any]] = []
+        self.unexpected: List[Dict[str, Any]] = []
+        self.changed: List[Dict[str, Any]] = []
+        self.max_items = max_items
+
+    @property
+    def failures(self) -> int:
+        return len(self.missing) + len(self.unexpected) + len(self.changed)
+
+    def feed(self, alerts: List[Dict[str, Any]], watermark: float) -> None:
+        for a in alerts:
+            self.actual += 1
+            want = self.pending.pop(a["alert_id"], None)
+            got = comparable(a)
+            if want is None:
+                self.unexpected.append(got)
+            elif want != got:
+                fields = sorted(k for k in set(want) | set(got) if want.get(k) != got.get(k))
+                self.changed.append({"alert_id": a["alert_id"], "fields": {
+                    k: {"expected": want.get(k), "actual": got.get(k)} for k in fields}})
+            else:
+                self.matched += 1
+        # expected alerts whose time is final and never showed up
+        while self.by_time and self.by_time[-1][0] < watermark:
+            _, aid = self.by_time.pop()
+            want = self.pending.pop(aid, None)
+            if want is not None:
+                self.missing.append(want)
+
+    def result(self) -> Dict[str, Any]:
+        cap = self.max_items
+        return {
+            "status": "pass" if not self.failures else "fail",
+            "expected": self.expected,
+            "actual": self.actual,
+            "matched": self.matched,
+            "missing": self.missing[:cap],
+            "unexpected": self.unexpected[:cap],
+            "changed": self.changed[:cap],
+            "counts": {"missing": len(self.missing), "unexpected": len(self.unexpected),
+                       "changed": len(self.changed)},
+        }
+
+# ---- runner ---------------------------------------------------------------------------
+
+def run_scenario(scenario: str, expected: Optional[str] = None, record: bool = False,
+                 speed: float = math.inf, via: str = "inproc", rules_path: str = str(DEFAULT_RULES_PATH),
+                 site_id: str = DEFAULT_SITE_ID, tick_s: float = TICK_S, fail_fast: bool = False,
+                 max_items: int = 50, latency: bool = False) -> Dict[str, Any]:
+    """Replay one scenario; diff against (or with record=True, write) its expected file.
+
+    With latency=True the result carries a LatencyRecorder export of the alerts'
+    stage timings under "latency" (merge them with LatencyRecorder.merge_export).
+    """
+    path = Path(scenario)
+    exp_path = Path(expected) if expected else expected_path(path)
+    result: Dict[str, Any] = {"scenario": str(path), "expected_file": str(exp_path)}
+    t0 = time.perf_counter()
+    diff = None
+    if not record:
+        if not exp_path.is_file():
+            result.update(status="error", error=f"expected output not found: {exp_path} (use --record)")
+            return result
+        diff = IncrementalDiff(read_expected(exp_path), max_items)
+
+    transport = TRANSPORTS[via](Pipeline(load_rules(rules_path), site_id=site_id, tick_s=tick_s))
+    recorder = LatencyRecorder() if latency else None
+    recorded: List[Dict[str, Any]] = []
+    events = 0
+    stopped = False
+    try:
+        with open(path, "rb") as stream:
+            for lines in paced_batches(stream, speed):
+                events += len(lines)
+                alerts, watermark = transport.send(lines)
+                if recorder is not None:
+                    recorder.observe_many(alerts)
+                if diff is None:
+                    recorded += alerts
+                    continue
+                diff.feed(alerts, watermark)
+                if fail_fast and diff.failures:
+                    stopped = True
+                    break
+        if not stopped:
+            alerts, watermark = transport.finish()
+            if recorder is not None:
+                recorder.observe_many(alerts)
+            if diff is None:
+                recorded += alerts
+            else:
+                diff.feed(alerts, watermark)
+    finally:
+        transport.close()
+
+    result["lines"] = events
+    result["seconds"] = round(time.perf_counter() - t0, 3)
+    if recorder is not None:
+        result["latency"] = recorder.export()
+    if diff is None:
+        write_expected(exp_path, path.stem, recorded)
+        result.update(status="recorded", actual=len(recorded))
+    else:
+        result.update(diff.result())
+        if stopped:
+            result["stopped_early"] = True
+    return result
+
+# ---- what-if replay ---------------------------------------------------------------------
+
+class ReplayWindow:
+    """Recent raw lines for what-if replays: the last max_lines events, plus the zone
+    definitions (site/geofence, site/context) seen so far, which replay first."""
+
+    def __init__(self, max_lines: int = REPLAY_LINES, max_zone_lines: int = REPLAY_ZONE_LINES):
+        self.lines: Deque[bytes] = deque(maxlen=max_lines)
+        self.zones: Dict[bytes, None] = {}
+        self.max_zone_lines = max_zone_lines
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def extend(self, lines: Iterable[bytes]) -> None:
+        for line in lines:
+            if ZONE_MARKERS[0] in line or ZONE_MARKERS[1] in line:
+                self.zones.pop(line, None)  # re-sent: moves to the end
+                self.zones[line] = None
+                if len(self.zones) > self.max_zone_lines:
+                    del self.zones[next(iter(self.zones))]
+            else:
+                self.lines.append(line)
+
+    def snapshot(self) -> List[bytes]:
+        return list(self.zones) + list(self.lines)
+
+def replay(lines: List[bytes], rules: Any, site_id: str = DEFAULT_SITE_ID,
+           tick_s: float = TICK_S) -> List[Dict[str, Any]]:
+    """All alerts a fresh pipeline raises for lines under rules."""
+    pipeline = Pipeline(rules, site_id=site_id, tick_s=tick_s)
+    return pipeline.feed_lines(lines) + pipeline.flush()
+
+def what_if(lines: List[bytes], old_rules: Any, new_rules: Any, site_id: str = DEFAULT_SITE_ID,
+            tick_s: float = TICK_S, max_items: int = 50) -> Dict[str, Any]:
+    """Which alerts a rule change alters over lines: added, removed and changed (by field)."""
+    old, new = as_ruleset(old_rules), as_ruleset(new_rules)
+    t0 = time.perf_counter()
+    before = replay(lines, old, site_id, tick_s)
+    after = replay(lines, new, site_id, tick_s)
+    diff = IncrementalDiff(before, max_items)
+    diff.feed(after, math.inf)
+    r = diff.result()
+    rule_of = {a["alert_id"]: a["rule"] for a in before}
+    by_rule: Dict[str, Counter] = {}
+    for kind, items in (("added", diff.unexpected), ("removed", diff.missing), ("changed", diff.changed)):
+        for item in items:
+            rule = item.get("rule") or rule_of.get(item["alert_id"], "?")
+            by_rule.setdefault(rule, Counter())[kind] += 1
+    changed = [{"alert_id": c["alert_id"], "rule": rule_of.get(c["alert_id"]),
+                "fields": {k: {"before": v["expected"], "after": v["actual"]} for k, v in c["fields"].items()}}
+               for c in r["changed"]]
+    return {
+        "old_version": old.version, "new_version": new.version, "lines": len(lines),
+        "alerts_before": len(before), "alerts_after": len(after), "unchanged": r["matched"],
+        "counts": {"added": r["counts"]["unexpected"], "removed": r["counts"]["missing"],
+                   "changed": r["counts"]["changed"]},
+        "by_rule": {rule: dict(c) for rule, c in sorted(by_rule.items())},
+        "added": r["unexpected"], "removed": r["missing"], "changed": changed,
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
@@ -0,0 +1,333 @@
+"""
+haws.store — Append-only columnar store for ingested site/* events (NumPy segments).
+
+Layout (one directory per partition, one .npy file per column):
+
+  <root>/site=<site_id>/day=<YYYY-MM-DD>/topic=<site_env>/seg-000000/
+      meta.json       rows, ts_min, ts_max, column dtypes, string dictionaries
+      ts.npy          ts_event as epoch seconds (float64), sorted within the segment
+      ts_ingest.npy   epoch seconds
+      event_id.npy    fixed-width bytes
+      <column>.npy    payload fields: float64, or int32 codes into the meta dictionary
+
+Payload fields are flattened per topic (COLUMNS; gas.co -> co, state.speed -> speed).
+Topics without a column layout (site/geofence, site/context) keep the payload as
+JSON in a `payload` column (blob + offsets). The JSONL outputs stay the source of
+record; list-valued fields like worker `events` are not stored here.
+
+Writers buffer rows per partition and write a segment every segment_rows rows (and
+on close) into a temporary directory that is renamed into place, so readers never
+see half a segment and existing segments are never rewritten. site_id, day and topic
+become directory names, so events whose values could escape the store root (path
+separators, a leading dot) are not stored but counted in StoreWriter.rejected.
+
+Reads memory-map the column files (np.load(mmap_mode="r")). Predicates are pushed
+down: site and day prune partition directories, the topic is a directory, ts_min/
+ts_max in meta.json skip whole segments, and inside a segment the sorted ts column
+is binary-searched so only the rows (pages) in [start, end) are touched.
+"""
+import json
+import os
+import re
+import shutil
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .ingest import dumps, loads, parse_ts
+
+F8, STR = "f8", "str"
+SEGMENT_ROWS = 1 << 16
+EVENT_ID_WIDTH = 36
+PAYLOAD = "payload"
+# partition directory names come from event fields: no separators, no leading dot
+SITE_ID_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]{0,127}")
+DAY_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+TOPIC_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]*/[A-Za-z0-9._-]+")
+
+# topic -> ((column, kind, path into payload), ...)
+COLUMNS: Dict[str, Tuple[Tuple[str, str, Tuple[str, ...]], ...]] = {
+    "site/env": (("sensor_id", STR, ("sensor_id",)), ("temp_c", F8, ("temp_c",)), ("rh", F8, ("rh",)),
+                 ("pm25", F8, ("pm25",)), ("noise_db", F8, ("noise_db",)), ("lux", F8, ("lux",)),
+                 ("co", F8, ("gas", "co")), ("h2s", F8, ("gas", "h2s"))),
+    "site/worker": (("worker_id", STR, ("worker_id",)), ("role", STR, ("role",)), ("x", F8, ("x",)),
+                    ("y", F8, ("y",)), ("speed", F8, ("speed",)), ("heading", F8, ("heading",))),
+    "site/equipment": (("asset_id", STR, ("asset_id",)), ("type", STR, ("type",)), ("x", F8, ("x",)),
+                       ("y", F8, ("y",)), ("heading", F8, ("heading",)), ("speed", F8, ("state", "speed")),
+                       ("load", F8, ("state", "load")), ("engine", STR, ("state", "engine"))),
+}
+
+def topic_dir(topic: str) -> str:
+    return "topic=" + topic.replace("/", "_")
+
+def day_of(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d")
+
+def day_range(start: Optional[float], end: Optional[float]) -> Tuple[Optional[str], Optional[str]]:
+    """Inclusive day bounds for [start, end)."""
+    return (day_of(start) if start is not None else None,
+            day_of(end - 1e-6) if end is not None else None)
+
+def _field(payload: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+    v: Any = payload
+    for key in path:
+        if type(v) is not dict:
+            return None
+        v = v.get(key)
+    return v
+
+def _number(v: Any) -> float:
+    return float(v) if type(v) in (int, float) else np.nan
+
+def _floats(values: List[Any]) -> np.ndarray:
+    try:
+        return np.array(values, dtype=np.float64)  # None -> nan, in C
+    except (TypeError, ValueError):
+        return np.fromiter((_number(v) for v in values), dtype=np.float64, count=len(values))
+
+def partition_error(site_id: Any, day: str, topic: Any) -> Optional[str]:
+    """Why (site_id, day, topic) can't name a partition directory, or None if it can."""
+    if type(site_id) is not str or not SITE_ID_RE.fullmatch(site_id):
+        return f"unsafe site_id {site_id!r}"
+    if not DAY_RE.fullmatch(day):
+        return f"unsafe day {day!r}"
+    if type(topic) is not str or not TOPIC_RE.fullmatch(topic):
+        return f"unsafe topic {topic!r}"
+    return None
+
+def _event_day(ts_event: str) -> str:
+    # UTC stamps (haws.ingest writes ...Z) carry their day; anything else is parsed
+    if len(ts_event) >= 20 and ts_event[-1] == "Z" and ts_event[10] == "T":
+        return ts_event[:10]
+    return day_of(parse_ts(ts_event))
+
+class StoreWriter:
+    """Appends events (haws.ingest dicts) to the store; use as a context manager or close()."""
+
+    def __init__(self, root: str, segment_rows: int = SEGMENT_ROWS):
+        self.root = Path(root)
+        self.segment_rows = segment_rows
+        self.buffers: Dict[Tuple[str, str, str], List[dict]] = {}  # rows waiting per partition
+        self.segments_written = 0
+        self.rows_written = 0
+        self.rejected: Dict[str, int] = {}  # reason -> events not stored
+
+    def append(self, events: Iterable[dict]) -> None:
+        buffers = self.buffers
+        for e in events:
+            key = (e["site_id"], _event_day(e["ts_event"]), e["topic"])
+            rows = buffers.get(key)
+            if rows is None:
+                error = partition_error(*key)
+                if error is not None:
+                    self.rejected[error] = self.rejected.get(error, 0) + 1
+                    continue
+                rows = buffers[key] = []
+            rows.append(e)
+            if len(rows) >= self.segment_rows:
+                self._write(key, rows)
+                buffers[key] = []
+
+    def sink(self, events: List[dict]) -> None:
+        """haws.ingest sink signature: one topic's batch."""
+        self.append(events)
+
+    def flush(self) -> None:
+        for key, rows in self.buffers.items():
+            if rows:
+                self._write(key, rows)
+        self.buffers.clear()
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> "StoreWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if exc[0] is None:
+            self.close()
+
+    def _write(self, key: Tuple[str, str, str], rows: List[dict]) -> None:
+        site_id, day, topic = key
+        part = self.root / f"site={site_id}" / f"day={day}" / topic_dir(topic)
+        part.mkdir(parents=True, exist_ok=True)
+        ts = np.fromiter((parse_ts(e["ts_event"]) for e in rows), dtype=np.float64, count=len(rows))
+        order = np.argsort(ts, kind="stable")
+        rows = [rows[i] for i in order.tolist()]
+        cols: Dict[str, np.ndarray] = {
+            "ts": ts[order],
+            "ts_ingest": np.fromiter((parse_ts(e["ts_ingest"]) if e.get("ts_ingest") else np.nan for e in rows),
+                                     dtype=np.float64, count=len(rows)),
+            "event_id": np.array([(e.get("event_id") or "").encode("ascii", "replace") for e in rows],
+                                 dtype=f"S{EVENT_ID_WIDTH}"),
+        }
+        dictionaries: Dict[str, List[str]] = {}
+        layout = COLUMNS.get(topic)
+        if layout is None:
+            blobs = [dumps(e["payload"]) for e in rows]
+            cols["payload_offsets"] = np.cumsum([0] + [len(b) for b in blobs], dtype=np.int64)
+            cols["payload_blob"] = np.frombuffer(b"".join(blobs), dtype=np.uint8)
+        else:
+            payloads = [e["payload"] for e in rows]
+            for name, kind, path in layout:
+                if len(path) == 1:
+                    k = path[0]
+                    values = [p.get(k) for p in payloads]
+                else:
+                    values = [_field(p, path) for p in payloads]
+                if kind == F8:
+                    cols[name] = _floats(values)
+                else:
+                    uniq = list(dict.fromkeys(values))
+                    index = {v: i for i, v in enumerate(uniq)}
+                    cols[name] = np.fromiter(map(index.__getitem__, values), dtype=np.int32, count=len(values))
+                    dictionaries[name] = ["" if v is None else str(v) for v in uniq]
+
+        seq = 1 + max((int(p.name[4:]) for p in part.glob("seg-*") if p.name[4:].isdigit()), default=-1)
+        final = part / f"seg-{seq:06d}"
+        tmp = part / f".tmp-seg-{seq:06d}-{os.getpid()}"
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        tmp.mkdir()
+        for name, arr in cols.items():
+            np.save(tmp / f"{name}.npy", arr, allow_pickle=False)
+        meta = {"version": 1, "site_id": site_id, "day": day, "topic": topic, "rows": len(rows),
+                "ts_min": float(cols["ts"][0]), "ts_max": float(cols["ts"][-1]),
+                "columns": {n: str(a.dtype) for n, a in cols.items()}, "dictionaries": dictionaries}
+        with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.rename(tmp, final)
+        self.segments_written += 1
+        self.rows_written += len(rows)
+
+class Batch:
+    """Columns of one segment slice (memory-mapped); string columns are int32 codes."""
+    __slots__ = ("site_id", "day", "topic", "columns", "dictionaries")
+
+    def __init__(self, site_id: str, day: str, topic: str, columns: Dict[str, np.ndarray],
+                 dictionaries: Dict[str, List[str]]):
+        self.site_id = site_id
+        self.day = day
+        self.topic = topic
+        self.columns = columns
+        self.dictionaries = dictionaries
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def strings(self, name: str) -> np.ndarray:
+        """A dictionary-encoded column as a NumPy string array."""
+        labels = np.asarray(self.dictionaries[name], dtype=str)
+        return labels[self.columns[name]] if len(labels) else np.zeros(len(self), dtype=str)
+
+    def payloads(self) -> List[dict]:
+        """Decoded JSON payloads (topics stored without a column layout)."""
+        offsets, blob = self.columns["payload_offsets"], self.columns["payload_blob"]
+        return [loads(blob[offsets[i]:offsets[i + 1]].tobytes()) for i in range(len(offsets) - 1)]
+
+class EventStore:
+    """Reader with partition/segment pruning and ts pushdown."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def partitions(self, topic: Optional[str] = None, sites: Optional[Sequence[str]] = None,
+                   start: Optional[float] = None, end: Optional[float] = None) -> List[Tuple[str, str, str, Path]]:
+        """[(site_id, day, topic, path)] matching the predicates, by site then day."""
+        first, last = day_range(start, end)
+        out = []
+        for site_dir in sorted(self.root.glob("site=*")):
+            site = site_dir.name[5:]
+            if sites is not None and site not in sites:
+                continue
+            for day_dir in sorted(site_dir.glob("day=*")):
+                day = day_dir.name[4:]
+                if (first is not None and day < first) or (last is not None and day > last):
+                    continue
+                topics = [day_dir / topic_dir(topic)] if topic else sorted(day_dir.glob("topic=*"))
+                for t in topics:
+                    if t.is_dir():
+                        out.append((site, day, t.name[6:].replace("_", "/", 1), t))
+        return out
+
+    def segments(self, topic: Optional[str] = None, sites: Optional[Sequence[str]] = None,
+                 start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Tuple[Path, Dict[str, Any]]]:
+        """(segment dir, meta) for segments whose ts range overlaps [start, end)."""
+        for _, _, _, part in self.partitions(topic, sites, start, end):
+            for seg in sorted(part.glob("seg-*")):
+                with open(seg / "meta.json", "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                if (start is not None and meta["ts_max"] < start) or (end is not None and meta["ts_min"] >= end):
+                    continue
+                yield seg, meta
+
+    def scan(self, topic: str, columns: Optional[Sequence[str]] = None, sites: Optional[Sequence[str]] = None,
+             start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Batch]:
+        """Memory-mapped batches of the requested columns (default: all), rows in [start, end)."""
+        for seg, meta in self.segments(topic, sites, start, end):
+            names = list(columns) if columns is not None else [n for n in meta["columns"]
+                                                               if not n.startswith(PAYLOAD)]
+            if PAYLOAD in names:
+                names.remove(PAYLOAD)
+                names += ["payload_offsets", "payload_blob"]
+            lo, hi = 0, meta["rows"]
+            if start is not None or end is not None:
+                ts = np.load(seg / "ts.npy", mmap_mode="r")
+                if start is not None and meta["ts_min"] < start:
+                    lo = int(np.searchsorted(ts, start, side="left"))
+                if end is not None and meta["ts_max"] >= end:
+                    hi = int(np.searchsorted(ts, end, side="left"))
+            if hi <= lo:
+                continue
+            cols = {}
+            for name in names:
+                if name not in meta["columns"]:
+                    raise KeyError(f"{topic}: no column {name!r} (have {sorted(meta['columns'])})")
+                arr = np.load(seg / f"{name}.npy", mmap_mode="r")
+                cols[name] = arr if name == "payload_blob" else arr[lo:hi]
+            if "payload_offsets" in cols:
+                cols["payload_offsets"] = np.load(seg / "payload_offsets.npy", mmap_mode="r")[lo:hi + 1]
+            yield Batch(meta["site_id"], meta["day"], topic, cols,
+                        {n: meta["dictionaries"][n] for n in names if n in meta["dictionaries"]})
+
+    def read(self, topic: str, columns: Sequence[str], sites: Optional[Sequence[str]] = None,
+             start: Optional[float] = None, end: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """Concatenated columns (string columns decoded) plus a site_id column."""
+        parts: Dict[str, List[np.ndarray]] = {n: [] for n in columns}
+        site_parts: List[np.ndarray] = []
+        for batch in self.scan(topic, columns, sites, start, end):
+            for n in columns:
+                if n in batch.dictionaries:
+                    parts[n].append(batch.strings(n))
+                elif batch[n].dtype.kind == "S":
+                    parts[n].append(batch[n].astype(str))
+                else:
+                    parts[n].append(np.asarray(batch[n]))
+            site_parts.append(np.full(len(batch), batch.site_id))
+        out = {n: np.concatenate(v) if v else np.zeros(0) for n, v in parts.items()}
+        out["site_id"] = np.concatenate(site_parts) if site_parts else np.zeros(0, dtype=str)
+        return out
+
+    def count(self, topic: Optional[str] = None, sites: Optional[Sequence[str]] = None,
+              start: Optional[float] = None, end: Optional[float] = None) -> Dict[Tuple[str, str], int]:
+        """Rows per (site_id, topic); whole segments are counted from meta.json alone."""
+        counts: Dict[Tuple[str, str], int] = {}
+        for seg, meta in self.segments(topic, sites, start, end):
+            n = meta["rows"]
+            if (start is not None and meta["ts_min"] < start) or (end is not None and meta["ts_max"] >= end):
+                ts = np.load(seg / "ts.npy", mmap_mode="r")
+                n = int(np.searchsorted(ts, end, side="left") if end is not None else n) - \
+                    int(np.searchsorted(ts, start, side="left") if start is not None else 0)
+            key = (meta["site_id"], meta["topic"])
+            counts[key] = counts.get(key, 0) + n
+        return counts
+
+def day_bounds(day: str) -> Tuple[float, float]:
+    start = datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    return start.timestamp(), (start + timedelta(days=1)).timestamp()
@@ -23,6 +23,8 @@ Design:
 - When both are selected, a single pass computes move targets for each view, and files are placed in both trees (copy) unless --link is used.
   To keep it simple and reliable across platforms, this tool moves to the *domain* tree by default and *copies* to the *type* tree when both are requested.
 - Deduplication is content-hash based; duplicates are skipped with a pointer in the manifest.
+- Name collisions are resolved against an in-memory index of the destination (built once at startup;
+  reorg_haws_v2.DestIndex), so each existing file is hashed at most once.
 """
 
 import argparse
@@ -30,8 +32,12 @@ import csv
 import hashlib
 import os
 import shutil
+import sys
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from reorg_haws_v2 import DestIndex  # noqa: E402
 
 DOMAIN_MAP = {
     "docs": ("docs", ".pdf", ".docx", ".pptx", ".txt", ".rtf"),
@@ -143,6 +149,8 @@ def main():
 
     # content hash registry to skip duplicates
     seen_hashes: Dict[str, Path] = {}
+    # existing destination files, indexed once (collisions become dict lookups)
+    dest_index = DestIndex.build(dst, manifest=manifest_path)
     entries = []  # rows for manifest
     undo_lines = []
 
@@ -152,7 +160,7 @@ def main():
         for fname in files:
             if fname in IGNORED_NAMES:
                 continue
-            if args.ignore-locks and fname.startswith(LOCK_PREFIXES):
+            if args.ignore_locks and fname.startswith(LOCK_PREFIXES):
                 continue
 
             spath = Path(root) / fname
@@ -214,12 +222,8 @@ def main():
                 else:
                     seen_hashes[file_hash] = spath
                     # ensure unique filename if conflict at destination
-                    final_domain_target = domain_target
-                    i = 1
-                    while final_domain_target.exists() and sha256sum(final_domain_target) != file_hash:
-                        stem = final_domain_target.stem
-                        final_domain_target = final_domain_target.with_name(f"{stem}__{i}{final_domain_target.suffix}")
-                        i += 1
+                    final_domain_target = dest_index.resolve(domain_target, file_hash)
+                    dest_index.add(final_domain_target, file_hash)
 
                     if args.verbose:
                         print(f"[{'MOVE' if args.apply else 'DRY'}] {rel} -> domains/{domain}/{final_domain_target.name}")
@@ -233,12 +237,8 @@ def main():
             type_written = ""
             if type_target is not None:
                 # copy to type view, dedupe by hash + name
-                final_type_target = type_target
-                i = 1
-                while final_type_target.exists() and sha256sum(final_type_target) != file_hash:
-                    stem = final_type_target.stem
-                    final_type_target = final_type_target.with_name(f"{stem}__{i}{final_type_target.suffix}")
-                    i += 1
+                final_type_target = dest_index.resolve(type_target, file_hash)
+                dest_index.add(final_type_target, file_hash)
 
                 if args.verbose:
                     print(f"[{'COPY' if args.apply else 'DRY'}] {rel} -> library/{TYPE_BUCKETS.get(ext, 'other')}/{final_type_target.name}")
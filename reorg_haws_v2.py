@@ -9,6 +9,17 @@ Key improvements vs v1:
 - New: Better validation and user-friendly error messages
 - New: Optional --flatten to discard original subfolder context instead of --keep-tree
 - New: --report prints a compact summary at the end
+- New: --jobs hashes files on a worker pool, pipelined behind the directory walk
+- New: --dedupe staged settles duplicates by size, then head/tail hash, before any full SHA-256
+- New: content hashes are cached in --dst across runs; unchanged files are not re-read (--rehash to force)
+- New: name collisions are resolved against an in-memory destination index (no exists()/rehash loop)
+- New: --link-mode places the type library as hardlinks/symlinks/reflinks instead of full copies;
+  same-device domain moves use a plain rename
+- New: --incremental starts from the previous manifest.csv and only plans new or changed files
+- New: manifest.csv and undo.sh are streamed with periodic fsync checkpoints; --resume continues a crashed run
+- New: --inspect-archives hashes .zip members in place and dedupes them against loose files
+- New: --report breaks the run down by phase (time, bytes, per-file latency); --profile writes cProfile or trace JSON
+- New: single-pass os.scandir walk: one stat per file at most, domains classified once per directory
 
 USAGE (dry run by default):
   python3 reorg_haws_v2.py --src "/path/to/source" --dst "/path/to/organized" --by-domain --by-type --keep-tree --ignore-locks --verbose
@@ -23,22 +34,66 @@ Options:
   --keep-tree        Preserve original subfolders under each bucket (exclusive with --flatten)
   --flatten          Do NOT preserve original subfolders (exclusive with --keep-tree)
   --lowercase        Lowercase filenames when moving/copying
-  --manifest         Output manifest CSV (default: manifest.csv in --dst)
+  --manifest         Output manifest CSV (default: manifest.csv in --dst); its "applied" column is
+                     "no" on rows written by a dry run
   --undo-script      Emit a shell undo script to restore moves (and delete type copies)
   --ignore-locks     Ignore temp/lock files (e.g., ~$*.xlsx)
   --fail-fast        Abort on first error (default: continue and log as warning)
   --report           Print a compact end-of-run summary (moved/copied/skipped/duplicates)
+  --jobs N           Hash files on N workers while the walk continues (default: 1, serial)
+  --pool KIND        Worker pool for --jobs: thread (default) or process
+  --dedupe MODE      full (default): SHA-256 every file; staged: size -> head/tail hash -> SHA-256,
+                     only escalating files that still collide. The manifest hash column shows the
+                     tier that settled each file: "size:<bytes>", "partial:<hex>" or the bare SHA-256.
+  --hash-cache NAME  SQLite hash cache in --dst (default: .reorg_hashes.sqlite), keyed by
+                     (path, size, mtime_ns, inode); entries for files no longer walked are evicted
+  --no-hash-cache    Do not read or write the hash cache
+  --rehash           Ignore cached hashes (the cache is still refreshed)
+  --link-mode MODE   How --by-type places files in /library: copy (default), hardlink, symlink or
+                     reflink (copy-on-write clone). Falls back to copy where the filesystem refuses.
+                     With --by-domain the library entry points at the moved file under /domains.
+  --incremental      Use the existing manifest in --dst as a baseline: sources already listed (and,
+                     with the hash cache, unchanged since) are skipped without being hashed, their
+                     content still counts for dedupe, and new rows/undo lines are appended. When a
+                     source appears more than once in the manifest, its last row wins. Only
+                     baseline rows settled by a full SHA-256 take part in dedupe. With --apply,
+                     rows a dry run wrote (applied=no) do not count as done.
+  --checkpoint-every N
+                     Flush + fsync manifest.csv and undo.sh every N manifest rows (default: 1000)
+  --resume           Continue an interrupted run: every source already in the manifest is skipped
+                     (no stat check), a torn last line is trimmed, and output is appended. With
+                     --apply, a file whose "pending" row (written and flushed before its move/copy)
+                     has no later row is finished from that row first.
+  --inspect-archives After the walk, stream every .zip member through SHA-256 (nothing is extracted)
+                     and add a manifest row per member as "archive.zip!member/path": action
+                     archive-member, or archive-duplicate when the content already exists as a loose
+                     file or an earlier member. Archives whose members are all loose duplicates get
+                     an extra archive-redundant row: candidates to drop.
+  --profile PATH     Profile the run: PATH ending in .json gets Chrome/Perfetto trace events, one
+                     track per phase; anything else gets cProfile stats (main thread only)
   --verbose          Print each planned action
 """
 
 import argparse
+import cProfile
 import csv
+import errno
 import hashlib
+import json
+import math
 import os
+import re
 import shutil
+import sqlite3
 import sys
+import time
+import zipfile
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 DOMAIN_MAP = {
     "docs": ("docs", ".pdf", ".docx", ".pptx", ".txt", ".rtf"),
@@ -77,64 +132,954 @@ TYPE_BUCKETS = {
     ".eps": "eps",
 }
 
+# bytes read from each end of a file for the staged-dedupe partial hash
+PARTIAL_EDGE_BYTES = 4 << 20
+
+# extension -> domain, precompiled from DOMAIN_MAP (first listing wins)
+EXT_DOMAIN: Dict[str, str] = {}
+for _domain, (_folder, *_exts) in DOMAIN_MAP.items():
+    for _ext in _exts:
+        EXT_DOMAIN.setdefault(_ext, _domain)
+
+LINK_MODES = ("copy", "hardlink", "symlink", "reflink")
+
+MANIFEST_FIELDS = ["source", "action", "domain_dst", "type_dst", "hash", "applied"]
+
 LOCK_PREFIXES = ("~$",)
 IGNORED_NAMES = {"__MACOSX", ".DS_Store"}
 
-def sha256sum(path: Path, block_size: int = 1 << 20) -> str:
+def read_manifest(path: Path) -> Iterator[Dict[str, str]]:
+    """Yield the rows of an existing manifest CSV (nothing if it does not exist)."""
+    if not path.is_file():
+        return
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+def trim_partial_line(path: Path) -> None:
+    """Drop a torn trailing line (no final newline) left behind by a crash mid-write."""
+    if not path.is_file():
+        return
+    with open(path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        tail = 1 << 16
+        f.seek(max(0, size - tail))
+        chunk = f.read()
+        if chunk.endswith(b"\n"):
+            return
+        cut = chunk.rfind(b"\n")
+        f.truncate(max(0, size - tail) + cut + 1 if cut >= 0 else 0)
+
+def upgrade_manifest(path: Path) -> None:
+    """Rewrite a manifest with an older header under MANIFEST_FIELDS (new columns left empty)."""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames in (None, MANIFEST_FIELDS):
+            return
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", newline="", encoding="utf-8") as out:
+            writer = csv.DictWriter(out, fieldnames=MANIFEST_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(reader)
+    os.replace(tmp, path)
+
+class RunOutputs:
+    """Manifest rows and undo lines, written as they are produced.
+
+    Nothing is buffered beyond the file objects, so memory does not grow with
+    the tree. Every `every` manifest rows both files are flushed and fsync'ed
+    together (a checkpoint); after a crash the manifest holds every row up to
+    the last checkpoint, which is what --resume picks up from.
+
+    Rows are stamped applied=yes/no from `applied`; in a dry run the undo lines
+    are written commented out, since nothing they would undo has happened.
+
+    Before a file is moved or copied its plan goes out as a "pending" row
+    (intent()), flushed together with everything written so far, so a killed
+    run always leaves a record of the step it was in; its own row follows once
+    the step is done. Power-loss durability is still per checkpoint.
+    """
+
+    def __init__(self, manifest_path: Path, undo_path: Optional[Path], append: bool, every: int = 1000,
+                 timer: Optional["PhaseTimer"] = None, applied: bool = True):
+        self.timer = timer
+        self.every = max(1, every)
+        self.rows = 0
+        self.applied = "yes" if applied else "no"
+        self.manifest_path = manifest_path
+        self.undo_path = undo_path
+        new_manifest = not (append and manifest_path.is_file())
+        if not new_manifest:
+            upgrade_manifest(manifest_path)
+        self.manifest = open(manifest_path, "w" if new_manifest else "a", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.manifest, fieldnames=MANIFEST_FIELDS)
+        if new_manifest:
+            self.writer.writeheader()
+        self.undo = None
+        if undo_path is not None:
+            new_undo = not (append and undo_path.is_file())
+            self.undo = open(undo_path, "w" if new_undo else "a", encoding="utf-8")
+            if new_undo:
+                self.undo.write("#!/usr/bin/env bash\nset -euo pipefail\n\n")
+            os.chmod(undo_path, 0o755)
+
+    def row(self, entry: Dict[str, str]) -> None:
+        t0 = time.perf_counter()
+        entry.setdefault("applied", self.applied)
+        written = self.writer.writerow(entry) or 0
+        self.rows += 1
+        if self.rows % self.every == 0:
+            self.checkpoint()
+        if self.timer is not None:
+            self.timer.add("manifest", time.perf_counter() - t0, written=written)
+
+    def intent(self, entry: Dict[str, str]) -> None:
+        """Write `entry` as a pending row and flush both files (not fsync'ed)."""
+        t0 = time.perf_counter()
+        if self.undo is not None:
+            self.undo.flush()
+        written = self.writer.writerow(dict(entry, action="pending", applied=self.applied)) or 0
+        self.manifest.flush()
+        if self.timer is not None:
+            self.timer.add("manifest", time.perf_counter() - t0, written=written)
+
+    def undo_line(self, line: str) -> None:
+        if self.undo is not None:
+            t0 = time.perf_counter()
+            if self.applied == "no":
+                line = "# dry run: " + line
+            written = self.undo.write(line + "\n")
+            if self.timer is not None:
+                self.timer.add("manifest", time.perf_counter() - t0, written=written)
+
+    def checkpoint(self) -> None:
+        for f in (self.manifest, self.undo):
+            if f is not None:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def close(self) -> None:
+        try:
+            self.checkpoint()
+        finally:
+            self.manifest.close()
+            if self.undo is not None:
+                self.undo.close()
+
+class PhaseTimer:
+    """Cumulative wall time, bytes and per-call latency for each phase of a run.
+
+    Latencies go into log-spaced buckets (~5% wide) rather than a sample list,
+    so p50/p95/p99 cost constant memory however many files are processed.
+    With trace=True every span is also kept as a Chrome trace event (capped).
+    """
+
+    PHASES = ("walk", "stat", "hash", "plan", "collision", "copy/move", "manifest", "archives")
+    _BASE = 1e-6
+    _STEP = math.log(1.05)
+
+    def __init__(self, trace: bool = False, max_events: int = 500_000):
+        self.wall: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.bytes_read: Dict[str, int] = defaultdict(int)
+        self.bytes_written: Dict[str, int] = defaultdict(int)
+        self.buckets: Dict[str, Counter] = defaultdict(Counter)
+        self.t0 = time.perf_counter()
+        self.events: Optional[list] = [] if trace else None
+        self.max_events = max_events
+
+    def add(self, phase: str, seconds: float, read: int = 0, written: int = 0,
+            end: Optional[float] = None) -> None:
+        self.wall[phase] += seconds
+        self.calls[phase] += 1
+        self.bytes_read[phase] += read
+        self.bytes_written[phase] += written
+        b = int(math.log(seconds / self._BASE) / self._STEP) if seconds > self._BASE else 0
+        self.buckets[phase][b] += 1
+        if self.events is not None and len(self.events) < self.max_events:
+            end = time.perf_counter() if end is None else end
+            self.events.append({
+                "name": phase, "ph": "X", "pid": 0,
+                "tid": self.PHASES.index(phase) if phase in self.PHASES else len(self.PHASES),
+                "ts": round((end - seconds - self.t0) * 1e6, 1), "dur": round(seconds * 1e6, 1),
+            })
+
+    @contextmanager
+    def phase(self, name: str, read: int = 0, written: int = 0):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            t1 = time.perf_counter()
+            self.add(name, t1 - t0, read, written, end=t1)
+
+    def timed_body(self, name: str, iterable: Iterable, nested=("collision", "copy/move", "manifest")):
+        """Wrap the iterator a loop runs over, charging each loop body to `name`.
+
+        Time spent in the `nested` phases inside the body is subtracted, so
+        the phases add up instead of double counting.
+        """
+        for item in iterable:
+            before = sum(self.wall[n] for n in nested)
+            t0 = time.perf_counter()
+            yield item
+            t1 = time.perf_counter()
+            inner = sum(self.wall[n] for n in nested) - before
+            self.add(name, max(0.0, t1 - t0 - inner), end=t1)
+
+    def timed_iter(self, name: str, iterable: Iterable):
+        """Wrap an iterator, charging the time spent producing each item to `name`."""
+        it = iter(iterable)
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            t1 = time.perf_counter()
+            self.add(name, t1 - t0, end=t1)
+            yield item
+
+    def percentile(self, phase: str, q: float) -> float:
+        counts = self.buckets[phase]
+        total = sum(counts.values())
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for b in sorted(counts):
+            seen += counts[b]
+            if seen >= rank:
+                return self._BASE * math.exp((b + 0.5) * self._STEP)
+        return 0.0
+
+    def summary_lines(self) -> List[str]:
+        lines = [f"  {'phase':<10} {'calls':>9} {'wall s':>9} {'MB read':>9} {'MB wrtn':>9} "
+                 f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"]
+        for phase in self.PHASES:
+            if not self.calls.get(phase):
+                continue
+            lines.append(
+                f"  {phase:<10} {self.calls[phase]:>9} {self.wall[phase]:>9.3f} "
+                f"{self.bytes_read[phase] / 1e6:>9.1f} {self.bytes_written[phase] / 1e6:>9.1f} "
+                f"{self.percentile(phase, 0.50) * 1e3:>8.3f} {self.percentile(phase, 0.95) * 1e3:>8.3f} "
+                f"{self.percentile(phase, 0.99) * 1e3:>8.3f}"
+            )
+        return lines
+
+    def write_trace(self, path: Path) -> None:
+        meta = [{"name": "thread_name", "ph": "M", "pid": 0, "tid": i, "args": {"name": name}}
+                for i, name in enumerate(self.PHASES)]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": meta + (self.events or []), "displayTimeUnit": "ms"}, f)
+
+def _sha256_counted(path: Path, block_size: int = 1 << 20) -> Tuple[str, int]:
     h = hashlib.sha256()
+    n = 0
     with path.open("rb") as f:
         while True:
             b = f.read(block_size)
             if not b:
                 break
             h.update(b)
-    return h.hexdigest()
+            n += len(b)
+    return h.hexdigest(), n
+
+def sha256sum(path: Path, block_size: int = 1 << 20) -> str:
+    return _sha256_counted(path, block_size)[0]
+
+def _partial_hash_counted(path: Path, edge: int = PARTIAL_EDGE_BYTES) -> Tuple[str, int]:
+    size = path.stat().st_size
+    if size <= 2 * edge:
+        return _sha256_counted(path)
+    h = hashlib.sha256(str(size).encode("ascii"))
+    with path.open("rb") as f:
+        h.update(f.read(edge))
+        f.seek(-edge, os.SEEK_END)
+        h.update(f.read(edge))
+    return "partial:" + h.hexdigest(), 2 * edge
+
+def partial_hash(path: Path, edge: int = PARTIAL_EDGE_BYTES) -> str:
+    """Cheap content fingerprint: size + first/last `edge` bytes.
+
+    Files no larger than 2 * edge are read completely anyway, so for those the
+    full SHA-256 is returned (bare hex) instead of a "partial:" value.
+    """
+    return _partial_hash_counted(path, edge)[0]
+
+def _run_hash_job(fn: Callable[[Path], Tuple[str, int]], path: Path):
+    # runs on a pool worker -> (value, error, seconds, bytes read); errors travel back
+    # as text so process pools can pickle them
+    t0 = time.perf_counter()
+    try:
+        value, nbytes = fn(path)
+        return value, None, time.perf_counter() - t0, nbytes
+    except Exception as e:
+        return None, str(e), time.perf_counter() - t0, 0
+
+def _hash_job(path: Path):
+    return _run_hash_job(_sha256_counted, path)
+
+def _partial_hash_job(path: Path):
+    return _run_hash_job(_partial_hash_counted, path)
+
+HASH_JOBS: Dict[str, Callable[[Path], Tuple[Optional[str], Optional[str], float, int]]] = {
+    "sha256": _hash_job,
+    "partial": _partial_hash_job,
+}
+
+class HashCache:
+    """Persistent content-hash cache (SQLite), keyed by (path, size, mtime_ns, inode).
+
+    A cached value is only returned while the file's size, mtime and inode
+    are unchanged. Every walked path is stamped with the current run id, and
+    close(evict=True) drops rows for paths the run did not see (moved or
+    deleted files). Only used from the main thread; pool workers never touch it.
+    """
+
+    def __init__(self, path: Path, rehash: bool = False, batch: int = 1000):
+        self.path = path
+        self.rehash = rehash
+        self.batch = batch
+        self.run_id = time.time_ns()
+        self.hits = 0
+        self.misses = 0
+        self._puts = []
+        self._seen = []
+        self.db = sqlite3.connect(str(path))
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            " path TEXT NOT NULL, kind TEXT NOT NULL,"
+            " size INTEGER, mtime_ns INTEGER, inode INTEGER,"
+            " digest TEXT NOT NULL, last_run INTEGER,"
+            " PRIMARY KEY (path, kind))"
+        )
+        self.db.commit()
+
+    @staticmethod
+    def stat_key(path: Path) -> Tuple[int, int, int]:
+        st = path.stat()
+        return st.st_size, st.st_mtime_ns, st.st_ino
+
+    def get(self, path: Path, kind: str, key: Tuple[int, int, int]) -> Optional[str]:
+        if self.rehash:
+            self.misses += 1
+            return None
+        row = self.db.execute(
+            "SELECT digest FROM hashes WHERE path = ? AND kind = ? AND size = ? AND mtime_ns = ? AND inode = ?",
+            (str(path), kind) + key,
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, path: Path, kind: str, key: Tuple[int, int, int], digest: str) -> None:
+        self._puts.append((str(path), kind) + key + (digest, self.run_id))
+        if len(self._puts) >= self.batch:
+            self.flush()
+
+    def is_current(self, path: Path, key: Tuple[int, int, int]) -> bool:
+        """True if any cached value for `path` was recorded under this exact stat key."""
+        row = self.db.execute(
+            "SELECT 1 FROM hashes WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ? LIMIT 1",
+            (str(path),) + key,
+        ).fetchone()
+        return row is not None
+
+    def mark_seen(self, path: Path) -> None:
+        self._seen.append((self.run_id, str(path)))
+        if len(self._seen) >= self.batch:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._puts:
+            self.db.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?)", self._puts)
+            self._puts = []
+        if self._seen:
+            self.db.executemany("UPDATE hashes SET last_run = ? WHERE path = ?", self._seen)
+            self._seen = []
+        self.db.commit()
+
+    def close(self, evict: bool = False) -> int:
+        """Flush pending writes; with evict=True drop rows not seen this run. Returns rows evicted."""
+        self.flush()
+        evicted = 0
+        if evict:
+            evicted = self.db.execute("DELETE FROM hashes WHERE last_run IS NULL OR last_run != ?", (self.run_id,)).rowcount
+            self.db.commit()
+        self.db.close()
+        return evicted
+
+StatKey = Callable[[Path], Tuple[int, int, int]]
+
+_SUFFIX_RE = re.compile(r"^(?P<stem>.*)__(?P<n>\d+)$")
+
+class DestIndex:
+    """In-memory index of destination files and their content hashes.
+
+    Built once at startup from a single walk of the destination views and
+    updated as targets are planned, so dry runs see their own earlier
+    decisions too. Collision resolution is a dictionary lookup: each base
+    target maps content hashes to the slot (`name`, `name__1`, `name__2`, ...)
+    holding them and remembers the next free suffix. An existing file with no
+    known hash is hashed at most once, the first time its name collides.
+
+    A previous manifest's hash for a placed file is only trusted while the
+    hash cache still holds that file under its current stat key (recorded by
+    placed() when it was written); a file edited since, or any file when there
+    is no cache, starts unhashed so the edit is never overwritten.
+    """
+
+    def __init__(self, cache: Optional[HashCache] = None):
+        self.cache = cache
+        self.hashes: Dict[Path, Optional[str]] = {}
+        self.by_hash: Dict[Path, Dict[str, Path]] = {}
+        self.unhashed: Dict[Path, List[Path]] = {}
+        self.next_suffix: Dict[Path, int] = {}
+
+    @classmethod
+    def build(cls, dst: Path, views=("domains", "library"), manifest: Optional[Path] = None,
+              cache: Optional[HashCache] = None) -> "DestIndex":
+        known: Dict[Path, str] = {}
+        if manifest is not None:
+            for row in read_manifest(manifest):
+                value = row.get("hash") or ""
+                if not value or ":" in value or row.get("applied") == "no" or row.get("action") == "pending":
+                    continue  # only full SHA-256 values of placed files vouch for on-disk content
+                # domain_dst is only a placed file on "moved" rows
+                if row.get("domain_dst") and row.get("action") == "moved":
+                    known[dst / row["domain_dst"]] = value
+                if row.get("type_dst"):
+                    known[dst / row["type_dst"]] = value
+        index = cls(cache)
+        for view in views:
+            for root, dirs, files in os.walk(dst / view):
+                for fname in files:
+                    path = Path(root) / fname
+                    if cache is not None:
+                        cache.mark_seen(path)  # keep destination rows past close(evict=True)
+                    value = known.get(path)
+                    index.add(path, value if value is not None and index._unchanged(path) else None)
+        return index
+
+    @staticmethod
+    def base_of(path: Path) -> Tuple[Path, int]:
+        m = _SUFFIX_RE.match(path.stem)
+        if m is None:
+            return path, 0
+        return path.with_name(m.group("stem") + path.suffix), int(m.group("n"))
+
+    def add(self, path: Path, file_hash: Optional[str]) -> None:
+        base, n = self.base_of(path)
+        if path not in self.hashes:
+            self.next_suffix[base] = max(self.next_suffix.get(base, 1), n + 1)
+        self.hashes[path] = file_hash
+        if file_hash is None:
+            self.unhashed.setdefault(base, []).append(path)
+        else:
+            self.by_hash.setdefault(base, {}).setdefault(file_hash, path)
+
+    def _unchanged(self, path: Path) -> bool:
+        """True if the cache recorded `path` under its current stat key (not edited since)."""
+        if self.cache is None or self.cache.rehash:
+            return False
+        try:
+            return self.cache.is_current(path, HashCache.stat_key(path))
+        except OSError:
+            return False
+
+    def placed(self, path: Path, file_hash: str) -> None:
+        """Record a file just written with `file_hash` in the cache, so later runs trust its hash."""
+        if self.cache is None or ":" in file_hash:
+            return
+        try:
+            self.cache.put(path, "sha256", HashCache.stat_key(path), file_hash)
+        except OSError:
+            pass
+
+    def _hash_existing(self, path: Path) -> Optional[str]:
+        try:
+            key = HashCache.stat_key(path)
+            value = self.cache.get(path, "sha256", key) if self.cache is not None else None
+            if value is None:
+                value = sha256sum(path)
+                if self.cache is not None:
+                    self.cache.put(path, "sha256", key, value)
+            return value
+        except Exception:
+            return None
+
+    def resolve(self, target: Path, file_hash: str) -> Path:
+        """Return a slot for `target`: one already holding the same content, else a free one."""
+        if target not in self.hashes:
+            return target
+        base, _ = self.base_of(target)
+        # staged "size:"/"partial:" values can't match on-disk content, so don't read it for them
+        if ":" not in file_hash:
+            for slot in self.unhashed.pop(base, ()):
+                value = self._hash_existing(slot)
+                if value is not None:
+                    self.hashes[slot] = value
+                    self.by_hash.setdefault(base, {}).setdefault(value, slot)
+        slot = self.by_hash.get(base, {}).get(file_hash)
+        if slot is not None:
+            return slot
+        n = self.next_suffix.get(base, 1)
+        candidate = base.with_name(f"{base.stem}__{n}{base.suffix}")
+        while candidate in self.hashes:
+            n += 1
+            candidate = base.with_name(f"{base.stem}__{n}{base.suffix}")
+        self.next_suffix[base] = n + 1
+        return candidate
+
+def hash_pipeline(paths: Iterable[Path], jobs: int, pool: str = "thread", backlog: int = 0,
+                  kind: str = "sha256", cache: Optional[HashCache] = None,
+                  timer: Optional[PhaseTimer] = None, stat_key: StatKey = HashCache.stat_key,
+                  ) -> Iterator[Tuple[Path, Optional[str], Optional[str]]]:
+    """Yield (path, hash, error) for each path, in input order.
+
+    With jobs > 1 the paths are hashed on a worker pool while the caller keeps
+    walking/planning. At most `backlog` files (default: 8 per worker) are in
+    flight, so the walker never runs far ahead of the planner. Results are
+    always yielded in the order the paths came in, so the manifest and the
+    dedupe decisions do not depend on the number of workers.
+
+    `kind` picks the hash ("sha256" or "partial"). With a `cache`, files whose
+    stat key is unchanged are answered from it and never reach the pool.
+    A `timer` is charged the workers' own hashing time and bytes ("hash").
+    `stat_key` lets the walker hand over stat results it already has.
+    """
+    job = HASH_JOBS[kind]
+
+    def lookup(path: Path):
+        # -> (stat key or None, cached value or None)
+        if cache is None:
+            return None, None
+        try:
+            if timer is not None:
+                with timer.phase("stat"):
+                    key = stat_key(path)
+            else:
+                key = stat_key(path)
+        except Exception:
+            return None, None
+        return key, cache.get(path, kind, key)
+
+    def finish(path: Path, key, result):
+        value, err, seconds, nbytes = result
+        if timer is not None:
+            timer.add("hash", seconds, read=nbytes)
+        if cache is not None and key is not None and value is not None:
+            cache.put(path, kind, key, value)
+        return path, value, err
+
+    if jobs <= 1:
+        for path in paths:
+            key, cached = lookup(path)
+            if cached is not None:
+                yield path, cached, None
+            else:
+                yield finish(path, key, job(path))
+        return
+
+    backlog = backlog or jobs * 8
+    executor_cls = ProcessPoolExecutor if pool == "process" else ThreadPoolExecutor
+    executor = executor_cls(max_workers=jobs)
+    pending = deque()
+
+    def drain_one():
+        path, key, cached, fut = pending.popleft()
+        if fut is None:
+            return path, cached, None
+        return finish(path, key, fut.result())
+
+    try:
+        for path in paths:
+            key, cached = lookup(path)
+            fut = None if cached is not None else executor.submit(job, path)
+            pending.append((path, key, cached, fut))
+            if len(pending) >= backlog:
+                yield drain_one()
+        while pending:
+            yield drain_one()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def hash_archive_members(path: Path, block_size: int = 1 << 20) -> List[Tuple[str, int, str]]:
+    """[(member name, size, sha256)] for the files inside a zip, streamed without extracting."""
+    members = []
+    with zipfile.ZipFile(path) as zf:
+        for info in zf.infolist():
+            if info.is_dir() or any(part in IGNORED_NAMES for part in info.filename.split("/")):
+                continue
+            h = hashlib.sha256()
+            with zf.open(info) as f:
+                while True:
+                    b = f.read(block_size)
+                    if not b:
+                        break
+                    h.update(b)
+            members.append((info.filename, info.file_size, h.hexdigest()))
+    return members
+
+def _archive_job(path: Path) -> Tuple[Optional[List[Tuple[str, int, str]]], Optional[str]]:
+    try:
+        return hash_archive_members(path), None
+    except Exception as e:
+        return None, str(e)
+
+def inspect_archives(archives: List[Tuple[Path, Path]], loose_hashes: Dict[str, Path],
+                     unsettled: List[Path], out: "RunOutputs", stats: Dict[str, int],
+                     jobs: int = 1, pool: str = "thread", verbose: bool = False) -> None:
+    """Hash the members of each (relative path, current location) archive and record them.
+
+    `loose_hashes` maps the SHA-256 of every loose file to its relative path.
+    `unsettled` lists loose files that --dedupe staged settled without a full
+    hash; those are only read if a member has the same size.
+    """
+    results = []
+    executor_cls = ProcessPoolExecutor if pool == "process" else ThreadPoolExecutor
+    with executor_cls(max_workers=max(1, jobs)) as executor:
+        futures = [executor.submit(_archive_job, location) for _rel, location in archives]
+        for (rel, location), fut in zip(archives, futures):
+            results.append((rel, location, fut.result()))
+
+    unsettled_by_size: Dict[int, List[Path]] = {}
+    if unsettled:
+        member_sizes = {size for _r, _l, (members, _e) in results for _n, size, _h in (members or ())}
+        for loose in unsettled:
+            try:
+                size = loose.stat().st_size
+            except OSError:
+                continue
+            if size in member_sizes:
+                unsettled_by_size.setdefault(size, []).append(loose)
+
+    seen_members: Dict[str, str] = {}
+    for rel, location, (members, err) in results:
+        if err is not None:
+            stats["errors"] += 1
+            if verbose:
+                print(f"[warn] unreadable archive: {rel} ({err})", file=sys.stderr)
+            out.row({"source": str(rel), "action": "error-archive", "domain_dst": "", "type_dst": "", "hash": ""})
+            continue
+        loose_dups = 0
+        for name, size, digest in members:
+            # settle same-size loose files the staged dedupe never fully hashed
+            for loose in unsettled_by_size.pop(size, ()):
+                try:
+                    loose_hashes.setdefault(sha256sum(loose), loose)
+                except Exception:
+                    pass
+            source = f"{rel}!{name}"
+            match = loose_hashes.get(digest)
+            if match is not None:
+                loose_dups += 1
+            elif digest in seen_members:
+                match = seen_members[digest]
+            else:
+                seen_members[digest] = source
+            if match is not None:
+                stats["archive_dups"] += 1
+                if verbose:
+                    print(f"[dup] {source} matches {match}")
+            stats["archive_members"] += 1
+            out.row({
+                "source": source,
+                "action": "archive-duplicate" if match is not None else "archive-member",
+                "domain_dst": "",
+                "type_dst": "",
+                "hash": digest,
+            })
+        if members and loose_dups == len(members):
+            stats["redundant_archives"] += 1
+            if verbose:
+                print(f"[redundant] {rel}: all {len(members)} members exist as loose files")
+            out.row({"source": str(rel), "action": "archive-redundant", "domain_dst": "", "type_dst": "", "hash": ""})
+
+def staged_hash_pipeline(paths: Iterable[Path], jobs: int, pool: str = "thread",
+                         tiers: Optional[Dict[str, int]] = None, cache: Optional[HashCache] = None,
+                         timer: Optional[PhaseTimer] = None, stat_key: StatKey = HashCache.stat_key,
+                         known_sizes: Optional[Counter] = None,
+                         ) -> Iterator[Tuple[Path, Optional[str], Optional[str]]]:
+    """Like hash_pipeline(), but only reads as much of each file as dedupe needs.
+
+    Tier 1 groups files by size: a file whose size is unique cannot have a
+    duplicate and is settled as "size:<bytes>" without reading it. Files that
+    share a size get a head/tail partial hash; only those whose partial hash
+    still collides are read in full. Needs the whole walk up front, so the
+    results are yielded (in input order) once all tiers are settled.
+
+    `known_sizes` counts the sizes of content already placed under a full
+    SHA-256 (the --incremental baseline): a file of such a size is never
+    settled early and always gets its full hash, so it can match that content.
+    """
+    paths = list(paths)
+    results: Dict[Path, Tuple[Optional[str], Optional[str]]] = {}
+    keys: Dict[Path, Tuple[int, int, int]] = {}
+    for path in paths:
+        t0 = time.perf_counter()
+        try:
+            keys[path] = stat_key(path)
+        except Exception as e:
+            results[path] = (None, str(e))
+        if timer is not None:
+            timer.add("stat", time.perf_counter() - t0)
+
+    # tier 1: unique sizes are settled without opening the file
+    size_counts = Counter(key[0] for key in keys.values())
+    if known_sizes:
+        size_counts.update(known_sizes)
+    colliding: List[Path] = []
+    for path, key in keys.items():
+        if size_counts[key[0]] == 1:
+            results[path] = (f"size:{key[0]}", None)
+            if cache is not None:
+                # nothing to save on re-reads, but it records the file's stat key (--incremental)
+                cache.put(path, "size", key, results[path][0])
+        else:
+            colliding.append(path)
+
+    # tier 2: head/tail hash for files sharing a size
+    partial_counts: Counter = Counter()
+    for path, value, err in hash_pipeline(colliding, jobs, pool, kind="partial", cache=cache, timer=timer,
+                                           stat_key=stat_key):
+        results[path] = (value, err)
+        if value is not None:
+            partial_counts[value] += 1
+
+    # tier 3: full SHA-256 only where the partial hash still collides
+    # (and for sizes seen in the baseline, whose partial hashes were never recorded)
+    escalate = [p for p in colliding
+                if results[p][0] is not None and results[p][0].startswith("partial:")
+                and (partial_counts[results[p][0]] > 1 or (known_sizes and keys[p][0] in known_sizes))]
+    for path, value, err in hash_pipeline(escalate, jobs, pool, cache=cache, timer=timer, stat_key=stat_key):
+        results[path] = (value, err)
+
+    for path in paths:
+        value, err = results[path]
+        if tiers is not None and value is not None:
+            tiers[value.split(":", 1)[0] if ":" in value else "sha256"] += 1
+        yield (path, value, err)
+
+@lru_cache(maxsize=1 << 16)
+def segment_domain(segment: str) -> Optional[str]:
+    """Domain implied by a single path segment (folder or file name), if any."""
+    seg = segment.lower()
+    if "template" in seg or seg.endswith("templates"):
+        return "templates"
+    if "schema" in seg or seg.endswith("schemas"):
+        return "schemas"
+    if seg in ("config", "configs"):
+        return "config"
+    if "sample" in seg or seg.endswith("samples"):
+        return "samples"
+    if "tracker" in seg or "trackers" in seg:
+        return "trackers"
+    if seg in ("docs", "doc", "documents"):
+        return "docs"
+    if seg in ("media", "images", "img", "assets"):
+        return "media"
+    return None
 
 def guess_domain(ext: str, rel: Path) -> str:
-    ext = ext.lower()
-    # strong hints from path segments
+    # strong hints from path segments (the outermost one wins)
     for segment in rel.parts:
-        seg = segment.lower()
-        if "template" in seg or seg.endswith("templates"):
-            return "templates"
-        if "schema" in seg or seg.endswith("schemas"):
-            return "schemas"
-        if seg in ("config", "configs"):
-            return "config"
-        if "sample" in seg or seg.endswith("samples"):
-            return "samples"
-        if "tracker" in seg or "trackers" in seg:
-            return "trackers"
-        if seg in ("docs", "doc", "documents"):
-            return "docs"
-        if seg in ("media", "images", "img", "assets"):
-            return "media"
-
+        hint = segment_domain(segment)
+        if hint is not None:
+            return hint
     # fallback to extension-based
-    for domain, (_folder, *exts) in DOMAIN_MAP.items():
-        if ext in exts:
-            return domain
-    return "docs"
+    return EXT_DOMAIN.get(ext.lower(), "docs")
+
+class SourceWalker:
+    """Single-pass os.scandir walk of `src` in a stable (sorted, top-down) order.
+
+    Yields the regular files to reorganize, in the same order as a sorted
+    os.walk. The DirEntry of each yielded file is kept until release(), so its
+    stat (at most one syscall, cached on the entry) is shared by the hash cache,
+    staged dedupe and --incremental instead of each stat-ing again. Domain hints
+    are worked out once per directory and inherited by everything below it, so
+    only the file name itself is checked per file (see guess_domain()).
+    """
+
+    def __init__(self, src: Path, ignore_locks: bool, stats: Dict[str, int],
+                 timer: Optional[PhaseTimer] = None):
+        self.src = src
+        self.ignore_locks = ignore_locks
+        self.stats = stats
+        self.timer = timer
+        self._entries: Dict[Path, Tuple[os.DirEntry, str]] = {}
+
+    def __iter__(self) -> Iterator[Path]:
+        timer = self.timer
+        stack: List[Tuple[str, Optional[str]]] = [(str(self.src), None)]
+        while stack:
+            folder, hint = stack.pop()
+            t0 = time.perf_counter()
+            try:
+                with os.scandir(folder) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError:
+                continue  # unreadable folder: skipped, like os.walk
+            if timer is not None:
+                timer.add("walk", time.perf_counter() - t0)
+
+            subdirs = []
+            for entry in entries:
+                name = entry.name
+                t0 = time.perf_counter()
+                try:
+                    is_dir = entry.is_dir()
+                    is_file = not is_dir and entry.is_file()
+                except OSError:
+                    is_dir = is_file = False
+                if timer is not None:
+                    timer.add("stat", time.perf_counter() - t0)
+                if is_dir:
+                    # skip junk dirs; like os.walk, don't descend into symlinked dirs
+                    if name not in IGNORED_NAMES and not entry.is_symlink():
+                        subdirs.append((entry.path, hint or segment_domain(name)))
+                    continue
+                if name in IGNORED_NAMES:
+                    self.stats["skipped"] += 1
+                    continue
+                if self.ignore_locks and name.startswith(LOCK_PREFIXES):
+                    self.stats["skipped"] += 1
+                    continue
+                if not is_file:
+                    self.stats["skipped"] += 1
+                    continue
+                path = Path(entry.path)
+                ext = os.path.splitext(name)[1].lower()
+                domain = hint or segment_domain(name) or EXT_DOMAIN.get(ext, "docs")
+                self._entries[path] = (entry, domain)
+                yield path
+            stack.extend(reversed(subdirs))
+
+    def stat_key(self, path: Path) -> Tuple[int, int, int]:
+        held = self._entries.get(path)
+        st = held[0].stat() if held is not None else path.stat()
+        return st.st_size, st.st_mtime_ns, st.st_ino
+
+    def release(self, path: Path) -> Optional[str]:
+        """Forget a yielded file once it is planned; returns its domain."""
+        held = self._entries.pop(path, None)
+        return held[1] if held is not None else None
 
 def normalize_name(name: str, lowercase: bool) -> str:
     return name.lower() if lowercase else name
 
-def safe_copy_or_move(src: Path, dst: Path, apply: bool, move: bool) -> None:
+def reflink_file(src: Path, dst: Path) -> None:
+    """Copy-on-write clone of src at dst; raises OSError where the filesystem can't clone."""
+    if sys.platform.startswith("linux"):
+        import fcntl
+        FICLONE = 0x40049409
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            except OSError:
+                fdst.close()
+                os.unlink(dst)
+                raise
+        shutil.copystat(str(src), str(dst))
+    elif sys.platform == "darwin":
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(str(src)), os.fsencode(str(dst)), 0) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(dst))
+    else:
+        raise OSError(errno.ENOTSUP, "reflink not supported on this platform", str(dst))
+
+def safe_copy_or_move(src: Path, dst: Path, apply: bool, move: bool,
+                      link_mode: str = "copy", same_device: bool = False) -> str:
+    """Place src at dst; returns how it was (or, in a dry run, would be) placed.
+
+    Moves return "rename" (same device, plain os.rename) or "move". Non-moves
+    use `link_mode` and return it, or "copy" if the link could not be made
+    (cross-device hardlink, no reflink support, no symlink privilege, ...).
+    """
     dst.parent.mkdir(parents=True, exist_ok=True)
-    if not apply:
-        return
     if move:
+        if not apply:
+            return "rename" if same_device else "move"
+        if same_device:
+            try:
+                os.rename(src, dst)
+                return "rename"
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
         shutil.move(str(src), str(dst))
-    else:
-        shutil.copy2(str(src), str(dst))
+        return "move"
+    if not apply:
+        return link_mode
+    if link_mode != "copy":
+        if os.path.lexists(dst):
+            # slot already holds the same content (see DestIndex.resolve); replace it with the link
+            os.unlink(dst)
+        try:
+            if link_mode == "hardlink":
+                os.link(src, dst)
+            elif link_mode == "symlink":
+                os.symlink(os.path.abspath(src), dst)
+            else:
+                reflink_file(src, dst)
+            return link_mode
+        except (OSError, NotImplementedError):
+            pass  # fall back to a plain copy
+    shutil.copy2(str(src), str(dst))
+    return "copy"
 
-def build_undo_line(src: Path, dst: Path, moved: bool) -> str:
+def build_undo_line(src: Path, dst: Path, moved: bool, placed: str = "copy") -> str:
     if moved:
         # reverse the move
         return f'mkdir -p "{src.parent}" && mv "{dst}" "{src}"'
-    else:
-        # reverse the copy (delete the destination)
-        return f'rm -f "{dst}"'
+    if placed == "symlink":
+        # only ever remove the link we created, never a file that replaced it
+        return f'if [ -L "{dst}" ]; then rm -f "{dst}"; fi'
+    # reverse the copy/hardlink/reflink (delete the destination name; the moved
+    # original keeps its own link/blocks, so this never loses data)
+    return f'rm -f "{dst}"'
+
+def finish_pending(row: Dict[str, str], src: Path, dst: Path, out: RunOutputs, link_mode: str,
+                   same_device: bool, undone: set) -> Tuple[Dict[str, str], Optional[str]]:
+    """Finish the move/copy a killed run left as a pending row; returns (row written, type placement).
+
+    A source still in --src is moved now (over any partial copy); one already at its
+    domain target counts as moved. The type view entry is always placed again. Undo
+    lines already in undo.sh (`undone`) are not written twice.
+    """
+    spath = src / row["source"]
+    domain_dst = dst / row["domain_dst"] if row.get("domain_dst") else None
+    type_dst = dst / row["type_dst"] if row.get("type_dst") else None
+    entry = {"source": row["source"], "action": "skipped", "domain_dst": "", "type_dst": "", "hash": row["hash"]}
+    lines = []
+    origin = spath
+    if domain_dst is not None:
+        if spath.is_file():
+            safe_copy_or_move(spath, domain_dst, True, move=True, same_device=same_device)
+        elif not domain_dst.is_file():
+            origin = None
+        if origin is not None:
+            origin = domain_dst
+            entry.update(action="moved", domain_dst=row["domain_dst"])
+            lines.append(build_undo_line(spath, domain_dst, moved=True))
+    placed = None
+    if origin is None or not origin.is_file():
+        entry.update(action="error-missing", hash="")  # in neither place: nothing left to finish
+    elif type_dst is not None:
+        placed = safe_copy_or_move(origin, type_dst, True, move=False, link_mode=link_mode)
+        entry["type_dst"] = row["type_dst"]
+        lines.append(build_undo_line(spath, type_dst, moved=False, placed=placed))
+    for line in lines:
+        if line not in undone:
+            out.undo_line(line)
+    out.row(entry)
+    return entry, placed
 
 def main():
     ap = argparse.ArgumentParser()
@@ -152,6 +1097,18 @@ def main():
     ap.add_argument("--fail-fast", action="store_true", dest="fail_fast", help="Abort on first error (default: continue)")
     ap.add_argument("--report", action="store_true", help="Print a compact summary at the end")
     ap.add_argument("--verbose", action="store_true", help="Verbose logging")
+    ap.add_argument("--jobs", type=int, default=1, help="Hash files on N parallel workers (default: 1)")
+    ap.add_argument("--pool", choices=("thread", "process"), default="thread", help="Worker pool used by --jobs (default: thread)")
+    ap.add_argument("--dedupe", choices=("full", "staged"), default="full", help="Duplicate detection: full SHA-256, or staged size/partial/full (default: full)")
+    ap.add_argument("--hash-cache", default=".reorg_hashes.sqlite", dest="hash_cache", help="Hash cache filename (in --dst)")
+    ap.add_argument("--no-hash-cache", action="store_true", dest="no_hash_cache", help="Disable the persistent hash cache")
+    ap.add_argument("--rehash", action="store_true", help="Ignore cached hashes and re-read every file")
+    ap.add_argument("--link-mode", choices=LINK_MODES, default="copy", dest="link_mode", help="How the type library is populated (default: copy)")
+    ap.add_argument("--incremental", action="store_true", help="Only plan files not already in the existing manifest (or changed since)")
+    ap.add_argument("--checkpoint-every", type=int, default=1000, dest="checkpoint_every", help="fsync manifest/undo every N rows (default: 1000)")
+    ap.add_argument("--resume", action="store_true", help="Resume an interrupted run from the manifest checkpoint")
+    ap.add_argument("--inspect-archives", action="store_true", dest="inspect_archives", help="Hash .zip members and dedupe them against loose files")
+    ap.add_argument("--profile", default=None, help="Write cProfile stats, or Chrome trace events if the path ends in .json")
     args = ap.parse_args()
 
     # sanity checks
@@ -159,6 +1116,10 @@ def main():
         print("[error] --keep-tree and --flatten are mutually exclusive", file=sys.stderr)
         sys.exit(2)
 
+    if args.jobs < 1:
+        print("[error] --jobs must be >= 1", file=sys.stderr)
+        sys.exit(2)
+
     if not args.by_type and not args.by_domain:
         # default to domain view
         args.by_domain = True
@@ -179,182 +1140,367 @@ def main():
     manifest_path = dst / args.manifest
     undo_path = dst / "undo.sh" if args.undo_script else None
 
+    # per-phase instrumentation (always on: a few counters per file); --profile adds detail
+    trace_path = args.profile if args.profile and args.profile.endswith(".json") else None
+    timer = PhaseTimer(trace=trace_path is not None)
+    profiler = None
+    if args.profile and trace_path is None:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
     # content hash registry to skip duplicates
     seen_hashes: Dict[str, Path] = {}
-    entries = []  # rows for manifest
-    undo_lines = []
 
-    stats = {"moved": 0, "copied": 0, "skipped": 0, "duplicates": 0, "errors": 0}
+    stats = {"moved": 0, "copied": 0, "skipped": 0, "duplicates": 0, "errors": 0, "unchanged": 0,
+             "archive_members": 0, "archive_dups": 0, "redundant_archives": 0}
+    # --inspect-archives: loose content by SHA-256, staged files without one, and zips seen
+    loose_hashes: Dict[str, Path] = {}
+    unsettled: List[Path] = []
+    archives: List[Tuple[Path, Path]] = []
+    tiers = {"size": 0, "partial": 0, "sha256": 0}  # which tier settled each file (--dedupe staged)
 
-    try:
-        for root, dirs, files in os.walk(src):
-            # skip junk dirs
-            dirs[:] = [d for d in dirs if d not in IGNORED_NAMES]
-            for fname in files:
-                if fname in IGNORED_NAMES:
-                    stats["skipped"] += 1
-                    continue
-                if args.ignore_locks and fname.startswith(LOCK_PREFIXES):
-                    stats["skipped"] += 1
-                    continue
+    cache = None
+    if not args.no_hash_cache:
+        try:
+            cache = HashCache(dst / args.hash_cache, rehash=args.rehash)
+        except Exception as e:
+            print(f"[warn] hash cache unavailable, hashing everything: {dst / args.hash_cache} ({e})", file=sys.stderr)
+    walk_completed = False
+    evicted = 0
 
-                spath = Path(root) / fname
-                if not spath.is_file():
-                    stats["skipped"] += 1
-                    continue
+    # --incremental: the previous manifest is the baseline; listed sources that have not
+    # changed are neither hashed nor re-planned, but their content still counts for dedupe
+    baseline: Dict[str, str] = {}
+    # --dedupe staged: sizes of baseline content, and the staged (size:/partial:) placements per size,
+    # full-hashed only once a new file of that size needs comparing
+    baseline_sizes: Counter = Counter()
+    baseline_staged: Dict[int, List[Tuple[str, Path]]] = defaultdict(list)
+    pending: Dict[str, Dict[str, str]] = {}  # source -> pending row with no later row (killed mid-step)
+    if args.resume:
+        # a row torn by the crash must not count as done (nor reach DestIndex below)
+        trim_partial_line(manifest_path)
+        if undo_path is not None:
+            trim_partial_line(undo_path)
+    append_outputs = (args.incremental or args.resume) and manifest_path.is_file()
+    if args.incremental or args.resume:
+        for row in read_manifest(manifest_path):
+            value = row.get("hash")
+            if not row.get("source") or value is None:
+                continue  # short row (no hash column at all): not done
+            if args.apply and row.get("applied") == "no":
+                continue  # planned by a dry run: nothing was placed (rows from before the column count)
+            if row.get("action") == "pending":
+                pending[row["source"]] = row
+                baseline.pop(row["source"], None)
+                continue
+            pending.pop(row["source"], None)
+            if not value and not args.resume:
+                continue  # errored rows are retried
+            baseline[row["source"]] = value
+            if not value:
+                continue
+            if args.inspect_archives and ":" not in value and not (row.get("action") or "").startswith("archive-"):
+                loose_hashes.setdefault(value, Path(row["source"]))
+            # staged size:/partial: values are only unique within their own run
+            if row.get("action") == "moved" and ":" not in value:
+                seen_hashes.setdefault(value, src / row["source"])
+            if row.get("action") == "moved" and args.dedupe == "staged":
+                # placed at domain_dst; still in src if only a dry run planned it
+                candidates = [src / row["source"]]
+                if row.get("domain_dst"):
+                    candidates.insert(0, dst / row["domain_dst"])
+                for where in candidates:
+                    try:
+                        size = where.stat().st_size
+                    except OSError:
+                        continue
+                    baseline_sizes[size] += 1
+                    if ":" in value:
+                        baseline_staged[size].append((row["source"], where))
+                    break
+        if args.verbose:
+            print(f"[{'resume' if args.resume else 'incremental'}] baseline: {len(baseline)} sources from {manifest_path}")
+        if pending and not args.apply:
+            print(f"[warn] {len(pending)} file(s) were mid-move when a run was killed; "
+                  f"--resume --apply finishes them", file=sys.stderr)
 
+    def skip_unchanged(paths: Iterable[Path]) -> Iterator[Path]:
+        for spath in paths:
+            rel = str(spath.relative_to(src))
+            if rel in baseline:
                 try:
-                    rel = spath.relative_to(src)
+                    current = args.resume or cache is None or cache.is_current(spath, walker.stat_key(spath))
                 except Exception:
-                    rel = Path(fname)
+                    current = False
+                if current:
+                    walker.release(spath)
+                    stats["unchanged"] += 1
+                    if cache is not None:
+                        cache.mark_seen(spath)
+                    continue
+            yield spath
 
-                ext = spath.suffix.lower()
-                domain = guess_domain(ext, rel)
+    walker = SourceWalker(src, args.ignore_locks, stats, timer=timer)
 
-                # compute content hash for dedupe check
-                try:
-                    file_hash = sha256sum(spath)
-                except Exception as e:
+    # same filesystem: domain moves are a plain rename (per-file EXDEV still falls back)
+    try:
+        same_device = src.stat().st_dev == dst.stat().st_dev
+    except OSError:
+        same_device = False
+    placements = {mode: 0 for mode in LINK_MODES}  # how type-view entries were placed
+
+    # one pass over the existing destination views instead of exists()/rehash per collision
+    dest_index = DestIndex.build(dst, manifest=manifest_path, cache=cache)
+    try:
+        out = RunOutputs(manifest_path, undo_path, append=append_outputs, every=args.checkpoint_every, timer=timer,
+                         applied=args.apply)
+    except Exception as e:
+        print(f"[error] cannot write manifest/undo in --dst: {manifest_path} ({e})", file=sys.stderr)
+        sys.exit(2)
+
+    try:
+        if pending and args.apply:
+            undone = set()
+            if undo_path is not None and undo_path.is_file():
+                undone = set(undo_path.read_text(encoding="utf-8").splitlines())
+            for rel_src, row in pending.items():
+                with timer.phase("copy/move"):
+                    entry, placed = finish_pending(row, src, dst, out, args.link_mode, same_device, undone)
+                if args.verbose:
+                    print(f"[finish] {rel_src}: {entry['action']}")
+                if entry["action"] == "error-missing":
                     stats["errors"] += 1
-                    msg = f"[warn] unreadable: {rel} ({e})"
-                    if args.fail_fast:
-                        print(msg, file=sys.stderr)
-                        sys.exit(1)
-                    if args.verbose:
-                        print(msg, file=sys.stderr)
-                    entries.append({
+                    continue
+                baseline[rel_src] = entry["hash"]
+                if entry["action"] == "moved":
+                    stats["moved"] += 1
+                    dest_index.add(dst / entry["domain_dst"], entry["hash"])
+                    dest_index.placed(dst / entry["domain_dst"], entry["hash"])
+                    if ":" not in entry["hash"]:
+                        seen_hashes.setdefault(entry["hash"], src / rel_src)
+                if placed is not None:
+                    stats["copied"] += 1
+                    placements[placed] += 1
+                    dest_index.add(dst / entry["type_dst"], entry["hash"])
+                    dest_index.placed(dst / entry["type_dst"], entry["hash"])
+
+        sources: Iterable[Path] = walker
+        if baseline:
+            sources = skip_unchanged(sources)
+        if args.dedupe == "staged":
+            hashed = staged_hash_pipeline(sources, args.jobs, args.pool, tiers=tiers, cache=cache, timer=timer,
+                                          stat_key=walker.stat_key, known_sizes=baseline_sizes)
+        else:
+            hashed = hash_pipeline(sources, args.jobs, args.pool, cache=cache, timer=timer, stat_key=walker.stat_key)
+        for spath, file_hash, hash_error in timer.timed_body("plan", hashed):
+            if cache is not None:
+                cache.mark_seen(spath)
+            try:
+                rel = spath.relative_to(src)
+            except Exception:
+                rel = Path(spath.name)
+
+            ext = spath.suffix.lower()
+            domain = walker.release(spath) or guess_domain(ext, rel)
+
+            # content hash for dedupe check (computed by the hash pipeline)
+            if hash_error is not None:
+                stats["errors"] += 1
+                msg = f"[warn] unreadable: {rel} ({hash_error})"
+                if args.fail_fast:
+                    print(msg, file=sys.stderr)
+                    sys.exit(1)
+                if args.verbose:
+                    print(msg, file=sys.stderr)
+                out.row({
+                    "source": str(rel),
+                    "action": "error-unreadable",
+                    "domain_dst": "",
+                    "type_dst": "",
+                    "hash": "",
+                })
+                continue
+
+            if baseline_staged and ":" not in file_hash:
+                # earlier placements of this size were settled without a full hash: hash them now
+                try:
+                    size = walker.stat_key(spath)[0]
+                except OSError:
+                    size = None
+                for rel_src, placed in baseline_staged.pop(size, ()):
+                    value = dest_index._hash_existing(placed)
+                    if value is not None:
+                        seen_hashes.setdefault(value, src / rel_src)
+
+            # decide base names
+            base_name = normalize_name(spath.name, args.lowercase)
+
+            # DOMAIN TARGET (primary move target when --by-domain)
+            domain_target = None
+            if args.by_domain:
+                domain_root = dst / "domains" / domain
+                if args.keep_tree:
+                    preserved = Path(*rel.parts[:-1]) if len(rel.parts) > 1 else Path()
+                    domain_target = domain_root / preserved / base_name
+                else:
+                    domain_target = domain_root / base_name
+
+            # TYPE TARGET (secondary copy target when both views requested)
+            type_target = None
+            if args.by_type:
+                type_bucket = TYPE_BUCKETS.get(ext, "other")
+                type_root = dst / "library" / type_bucket
+                if args.keep_tree:
+                    preserved = Path(*rel.parts[:-1]) if len(rel.parts) > 1 else Path()
+                    type_target = type_root / preserved / base_name
+                else:
+                    type_target = type_root / base_name
+
+            # dedupe by content hash (only for the primary domain move)
+            moved = False
+            final_domain_target = final_type_target = None
+            if domain_target is not None:
+                if file_hash in seen_hashes:
+                    # skip moving duplicate content into domain tree; track as duplicate
+                    stats["duplicates"] += 1
+                    out.row({
                         "source": str(rel),
-                        "action": "error-unreadable",
+                        "action": "duplicate-skip",
                         "domain_dst": "",
                         "type_dst": "",
-                        "hash": "",
+                        "hash": file_hash,
                     })
-                    continue
-
-                # decide base names
-                base_name = normalize_name(spath.name, args.lowercase)
-
-                # DOMAIN TARGET (primary move target when --by-domain)
-                domain_target = None
-                if args.by_domain:
-                    domain_root = dst / "domains" / domain
-                    if args.keep_tree:
-                        preserved = Path(*rel.parts[:-1]) if len(rel.parts) > 1 else Path()
-                        domain_target = domain_root / preserved / base_name
-                    else:
-                        domain_target = domain_root / base_name
-
-                # TYPE TARGET (secondary copy target when both views requested)
-                type_target = None
-                if args.by_type:
-                    type_bucket = TYPE_BUCKETS.get(ext, "other")
-                    type_root = dst / "library" / type_bucket
-                    if args.keep_tree:
-                        preserved = Path(*rel.parts[:-1]) if len(rel.parts) > 1 else Path()
-                        type_target = type_root / preserved / base_name
-                    else:
-                        type_target = type_root / base_name
-
-                # dedupe by content hash (only for the primary domain move)
-                moved = False
-                if domain_target is not None:
-                    if file_hash in seen_hashes:
-                        # skip moving duplicate content into domain tree; track as duplicate
-                        stats["duplicates"] += 1
-                        entries.append({
-                            "source": str(rel),
-                            "action": "duplicate-skip",
-                            "domain_dst": "",
-                            "type_dst": "",
-                            "hash": file_hash,
-                        })
-                        if args.verbose:
-                            print(f"[dup] {rel} matches {seen_hashes[file_hash].relative_to(src)}; skipping domain move")
-                    else:
-                        seen_hashes[file_hash] = spath
-                        # ensure unique filename if conflict at destination
-                        final_domain_target = domain_target
-                        i = 1
-                        while final_domain_target.exists():
-                            # if same hash, it's a duplicate in the target; skip creating another copy
-                            try:
-                                if sha256sum(final_domain_target) == file_hash:
-                                    break
-                            except Exception:
-                                pass
-                            stem = final_domain_target.stem
-                            final_domain_target = final_domain_target.with_name(f"{stem}__{i}{final_domain_target.suffix}")
-                            i += 1
-
-                        if args.verbose:
-                            print(f"[{'MOVE' if args.apply else 'DRY'}] {rel} -> domains/{domain}/{final_domain_target.name}")
-                        safe_copy_or_move(spath, final_domain_target, args.apply, move=True)
-                        moved = True
-                        stats["moved"] += 1 if args.apply else 0
-                        if args.undo_script:
-                            undo_lines.append(build_undo_line(spath, final_domain_target, moved=True))
-                        domain_target = final_domain_target
-
-                # TYPE COPY (optional)
-                type_written = ""
-                if type_target is not None:
-                    final_type_target = type_target
-                    i = 1
-                    while final_type_target.exists():
-                        try:
-                            if sha256sum(final_type_target) == file_hash:
-                                break
-                        except Exception:
-                            pass
-                        stem = final_type_target.stem
-                        final_type_target = final_type_target.with_name(f"{stem}__{i}{final_type_target.suffix}")
-                        i += 1
-
                     if args.verbose:
-                        print(f"[{'COPY' if args.apply else 'DRY'}] {rel} -> library/{TYPE_BUCKETS.get(ext, 'other')}/{final_type_target.name}")
-                    safe_copy_or_move(spath, final_type_target, args.apply, move=False)
-                    type_written = str(final_type_target.relative_to(dst))
-                    stats["copied"] += 1 if args.apply else 0
-                    if args.undo_script:
-                        undo_lines.append(build_undo_line(spath, final_type_target, moved=False))
-
-                entries.append({
+                        print(f"[dup] {rel} matches {seen_hashes[file_hash].relative_to(src)}; skipping domain move")
+                else:
+                    seen_hashes[file_hash] = spath
+                    # ensure unique filename if conflict at destination (same content reuses the slot)
+                    with timer.phase("collision"):
+                        final_domain_target = dest_index.resolve(domain_target, file_hash)
+                        dest_index.add(final_domain_target, file_hash)
+            if type_target is not None:
+                with timer.phase("collision"):
+                    final_type_target = dest_index.resolve(type_target, file_hash)
+                    dest_index.add(final_type_target, file_hash)
+
+            if args.apply and (final_domain_target is not None or final_type_target is not None):
+                # on disk before anything is touched: a run killed mid-step is finished by --resume
+                out.intent({
                     "source": str(rel),
-                    "action": "moved" if moved else "skipped",
-                    "domain_dst": "" if domain_target is None else str(domain_target.relative_to(dst)),
-                    "type_dst": type_written,
+                    "domain_dst": "" if final_domain_target is None else str(final_domain_target.relative_to(dst)),
+                    "type_dst": "" if final_type_target is None else str(final_type_target.relative_to(dst)),
                     "hash": file_hash,
                 })
+
+            if final_domain_target is not None:
+                if args.verbose:
+                    print(f"[{'MOVE' if args.apply else 'DRY'}] {rel} -> domains/{domain}/{final_domain_target.name}")
+                with timer.phase("copy/move"):
+                    how = safe_copy_or_move(spath, final_domain_target, args.apply, move=True, same_device=same_device)
+                if args.apply:
+                    dest_index.placed(final_domain_target, file_hash)
+                if args.apply and how == "move":
+                    # cross-device: the bytes were copied, not renamed
+                    timer.bytes_written["copy/move"] += final_domain_target.stat().st_size
+                moved = True
+                stats["moved"] += 1 if args.apply else 0
+                if args.undo_script:
+                    out.undo_line(build_undo_line(spath, final_domain_target, moved=True))
+                domain_target = final_domain_target
+
+            # TYPE COPY (optional)
+            type_written = ""
+            if final_type_target is not None:
+                # once the domain move has happened the content lives there, not at spath
+                type_source = domain_target if (moved and args.apply) else spath
+                with timer.phase("copy/move"):
+                    placed = safe_copy_or_move(type_source, final_type_target, args.apply, move=False,
+                                               link_mode=args.link_mode)
+                if args.apply:
+                    dest_index.placed(final_type_target, file_hash)
+                if args.apply and placed == "copy":
+                    timer.bytes_written["copy/move"] += final_type_target.stat().st_size
+                if args.verbose:
+                    label = placed.upper() if args.apply else "DRY"
+                    print(f"[{label}] {rel} -> library/{TYPE_BUCKETS.get(ext, 'other')}/{final_type_target.name}")
+                type_written = str(final_type_target.relative_to(dst))
+                stats["copied"] += 1 if args.apply else 0
+                placements[placed] += 1 if args.apply else 0
+                if args.undo_script:
+                    out.undo_line(build_undo_line(spath, final_type_target, moved=False, placed=placed))
+
+            out.row({
+                "source": str(rel),
+                "action": "moved" if moved else "skipped",
+                "domain_dst": "" if domain_target is None else str(domain_target.relative_to(dst)),
+                "type_dst": type_written,
+                "hash": file_hash,
+            })
+
+            if args.inspect_archives:
+                # where the content lives now (the walk may already have moved it)
+                location = domain_target if (moved and args.apply) else spath
+                if ":" not in file_hash:
+                    loose_hashes.setdefault(file_hash, rel)
+                else:
+                    unsettled.append(location)
+                if ext == ".zip":
+                    archives.append((rel, location))
+        walk_completed = True
+
+        if args.inspect_archives and archives:
+            with timer.phase("archives"):
+                inspect_archives(archives, loose_hashes, unsettled, out, stats,
+                                 jobs=args.jobs, pool=args.pool, verbose=args.verbose)
     finally:
-        # write manifest even if errors
         try:
-            with open(manifest_path, "w", newline="", encoding="utf-8") as f:
-                writer = csv.DictWriter(f, fieldnames=["source", "action", "domain_dst", "type_dst", "hash"])
-                writer.writeheader()
-                writer.writerows(entries)
+            out.close()
         except Exception as e:
-            print(f"[error] failed to write manifest: {manifest_path} ({e})", file=sys.stderr)
+            print(f"[error] failed to finish manifest/undo: {manifest_path} ({e})", file=sys.stderr)
 
-        if undo_path is not None:
+        if cache is not None:
             try:
-                with open(undo_path, "w", encoding="utf-8") as f:
-                    f.write("#!/usr/bin/env bash\nset -euo pipefail\n\n")
-                    for line in undo_lines:
-                        f.write(line + "\n")
-                os.chmod(undo_path, 0o755)
+                # only evict after a complete walk, otherwise unseen != gone
+                evicted = cache.close(evict=walk_completed)
             except Exception as e:
-                print(f"[error] failed to write undo script: {undo_path} ({e})", file=sys.stderr)
+                print(f"[warn] failed to update hash cache: {cache.path} ({e})", file=sys.stderr)
 
         if args.report:
             print("\n=== Reorg Summary ===")
             print(f"  moved:      {stats['moved']}")
             print(f"  copied:     {stats['copied']}")
+            if args.link_mode != "copy":
+                print("  placed as:  " + " ".join(f"{mode}={n}" for mode, n in placements.items()))
             print(f"  duplicates: {stats['duplicates']}")
             print(f"  skipped:    {stats['skipped']}")
             print(f"  errors:     {stats['errors']}")
+            if args.incremental or args.resume:
+                print(f"  unchanged:  {stats['unchanged']}")
+            if args.inspect_archives:
+                print(f"  archives:   {len(archives)} ({stats['archive_members']} members, "
+                      f"{stats['archive_dups']} duplicate, {stats['redundant_archives']} redundant)")
+            if args.dedupe == "staged":
+                print(f"  tiers:      size={tiers['size']} partial={tiers['partial']} sha256={tiers['sha256']}")
+            if cache is not None:
+                print(f"  hash cache: {cache.hits} hits, {cache.misses} misses, {evicted} evicted")
             print(f"  manifest:   {manifest_path}")
             if undo_path is not None:
                 print(f"  undo:       {undo_path}")
+            print("\n=== Phases ===")
+            for line in timer.summary_lines():
+                print(line)
+
+        if profiler is not None:
+            profiler.disable()
+            try:
+                profiler.dump_stats(args.profile)
+            except Exception as e:
+                print(f"[error] failed to write profile: {args.profile} ({e})", file=sys.stderr)
+        elif trace_path is not None:
+            try:
+                timer.write_trace(Path(trace_path))
+            except Exception as e:
+                print(f"[error] failed to write trace: {trace_path} ({e})", file=sys.stderr)
 
 if __name__ == "__main__":
     main()
@@ -1,13 +1,15 @@
 #!/usr/bin/env bash
 set -euo pipefail
-if [[ $# -ne 1 ]]; then
-  echo "Usage: $0 <YYYY-WW>"; exit 1
+if [[ $# -lt 1 ]]; then
+  echo "Usage: $0 <YYYY-WW> [haws-export-week options: --events ... --alerts ... --latency ...]"; exit 1
 fi
-ROOT="HAWS_20_PRODUCT_DEVELOPMENT/reports/weekly/$1"
+WEEK="$1"; shift
+ROOT="HAWS_20_PRODUCT_DEVELOPMENT/reports/weekly/$WEEK"
 mkdir -p "$ROOT"
+if [[ ! -f "$ROOT/manifest.json" ]]; then
 cat > "$ROOT/manifest.json" <<JSON
 {
-  "week": "$1",
+  "week": "$WEEK",
   "generated_at": "$(date -u +"%Y-%m-%dT%H:%M:%SZ")",
   "artifacts": [],
   "kpi_snapshot": {
@@ -24,5 +26,12 @@ cat > "$ROOT/manifest.json" <<JSON
   }
 }
 JSON
+fi
 touch "$ROOT/.gitkeep"
-echo "Created $ROOT with starter manifest.json"
+# evidence.csv + a kpi_snapshot computed from the week's logs, when given
+if [[ $# -gt 0 ]]; then
+  "$(dirname "$0")/../bin/haws-export-week" "$WEEK" --out "$ROOT" "$@"
+  echo "Exported evidence for $WEEK into $ROOT"
+else
+  echo "Created $ROOT with starter manifest.json"
+fi
@@ -0,0 +1,20 @@
+"""
+Tests for the haws library and tools (stdlib unittest; pytest runs them too).
+
+  make test                                  # python3 -m unittest discover -s tests -t .
+  python3 -m unittest tests.test_heat -v     # one module
+
+Fixtures are generated in temporary directories; the golden scenarios under
+HAWS_20_PRODUCT_DEVELOPMENT/tests/data/simulations/ are used where a test says so.
+"""
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from haws.rules import DEFAULT_RULES_PATH, load_rules  # noqa: E402
+
+RULES = load_rules(DEFAULT_RULES_PATH)
+GOLDEN_DIR = REPO_ROOT / "HAWS_20_PRODUCT_DEVELOPMENT" / "tests" / "data" / "simulations"
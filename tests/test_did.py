@@ -0,0 +1,83 @@
+"""DiD estimates (haws.did) on hand-built rollups: the 2x2 estimate, job-independent CIs, the result cache."""
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from haws.did import Rollups, analyze, did_estimate
+
+def cohort(site, controls=("site-b",)):
+    return {"key": f"pilot/{site}/heat", "pilot": "Pilot", "cohort": site, "site": site, "metric": "heat",
+            "rollup_metric": "heat", "date": "2026-06-18", "intervention_start": "2026-06-15",
+            "controls": list(controls), "baseline_value": None, "current_value": None, "delta_pct": None,
+            "notes": ""}
+
+def rollups():
+    """Two pre days (06-13, 06-14) and two post days (06-15, 06-16) of two units per site, plus
+    a day outside both periods that must not count."""
+    r = Rollups()
+    means = {"site-a": (10.0, 6.0), "site-b": (8.0, 7.0), "site-c": (5.0, 5.0)}
+    for site, (pre, post) in means.items():
+        for unit, jitter in (("u1", -1.0), ("u2", 1.0)):
+            r.add("heat", site, unit, "2026-06-10", 100.0)
+            for day, mean in (("2026-06-13", pre), ("2026-06-14", pre), ("2026-06-15", post), ("2026-06-16", post)):
+                r.add("heat", site, unit, day, mean + jitter)
+    return r
+
+class DidTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp(prefix="haws-test-"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def run_did(self, cohorts, data, out="out", **kw):
+        kw.setdefault("reps", 1000)
+        return analyze(cohorts, data, str(self.tmp / out), pre_days=2, post_days=2, **kw)
+
+    def test_estimate(self):
+        cells = {"treated_pre": np.array([9.0, 11.0]), "treated_post": np.array([6.0]),
+                 "control_pre": np.array([8.0]), "control_post": np.array([6.0, 8.0])}
+        self.assertEqual(did_estimate(cells), (6 - 10) - (7 - 8))
+        r = self.run_did([cohort("site-a")], rollups())["results"][0]
+        self.assertEqual((r["method"], r["controls"], r["estimate"]), ("did", "site-b", -3.0))
+        self.assertEqual([r[f"n_{c}"] for c in ("treated_pre", "treated_post", "control_pre", "control_post")],
+                         [4, 4, 4, 4])
+        self.assertEqual((r["treated_pre_mean"], r["control_post_mean"]), (10.0, 7.0))
+        self.assertLessEqual(r["ci_low"], -3.0)
+        self.assertGreaterEqual(r["ci_high"], -3.0)
+
+    def test_ci_independent_of_jobs(self):
+        cohorts = [cohort("site-a"), cohort("site-c")]
+        serial = self.run_did(cohorts, rollups(), out="serial", jobs=1)
+        parallel = self.run_did(cohorts, rollups(), out="parallel", jobs=3)
+        self.assertEqual(serial["bootstrap_chunks"], 4)
+        for a, b in zip(serial["results"], parallel["results"]):
+            self.assertEqual({k: a[k] for k in ("estimate", "se", "ci_low", "ci_high")},
+                             {k: b[k] for k in ("estimate", "se", "ci_low", "ci_high")})
+        self.assertEqual((self.tmp / "serial" / "did_results.csv").read_bytes(),
+                         (self.tmp / "parallel" / "did_results.csv").read_bytes())
+
+    def test_cache_and_reports(self):
+        cohorts = [cohort("site-a"), cohort("site-c")]
+        first = self.run_did(cohorts, rollups())
+        self.assertEqual((first["computed"], len(first["reports_written"])), (2, 2))
+
+        again = self.run_did(cohorts, rollups())
+        self.assertEqual((again["computed"], again["cache_hits"], again["reports_written"]), (0, 2, []))
+        self.assertEqual(again["results"], first["results"])
+
+        # a new post value for site-a changes only the site-a cohort's cells
+        data = rollups()
+        data.add("heat", "site-a", "u1", "2026-06-16", 1.0)
+        report_c = self.tmp / "out" / "reports" / "pilot__site-c__heat.md"
+        mtime = report_c.stat().st_mtime_ns
+        changed = self.run_did(cohorts, data)
+        self.assertEqual((changed["computed"], changed["reports_written"]), (1, ["pilot__site-a__heat.md"]))
+        self.assertEqual(report_c.stat().st_mtime_ns, mtime)
+        self.assertNotEqual(changed["results"][0]["input_hash"], first["results"][0]["input_hash"])
+
+if __name__ == "__main__":
+    unittest.main()
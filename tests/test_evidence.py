@@ -0,0 +1,54 @@
+"""The evidence export's HashingWriter/Artifact: manifest sha256 values match the bytes on disk (haws.evidence)."""
+import csv
+import hashlib
+import io
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests import GOLDEN_DIR
+
+from haws.evidence import Artifact, HashingWriter, export_week
+
+class HashingWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp(prefix="haws-test-"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_hash_of_written_bytes(self):
+        raw = io.BytesIO()
+        sink = HashingWriter(raw)
+        w = csv.writer(sink, lineterminator="\n")
+        rows = [["week", "site_id", "note"], ["2025-W29", "site-ä", 'quote " and, comma'], ["2025-W29", "s", "€"]]
+        w.writerows(rows)
+        self.assertEqual(sink.write("tail\n"), 5)
+        data = raw.getvalue()
+        self.assertEqual(sink.hexdigest(), hashlib.sha256(data).hexdigest())
+        self.assertEqual(sink.bytes, len(data))
+        self.assertEqual(list(csv.reader(io.StringIO(data.decode("utf-8"))))[:3], rows)
+
+    def test_artifact_commit_and_discard(self):
+        kept, dropped = Artifact(self.tmp / "kept.csv"), Artifact(self.tmp / "dropped.csv")
+        for a in (kept, dropped):
+            a.sink.write("a,b\n")
+        self.assertFalse(kept.path.exists())
+        kept.commit()
+        dropped.discard()
+        self.assertEqual(sorted(p.name for p in self.tmp.iterdir()), ["kept.csv"])
+        self.assertEqual(hashlib.sha256(kept.path.read_bytes()).hexdigest(), kept.sink.hexdigest())
+
+    def test_manifest_hashes_match_files(self):
+        manifest = export_week("2025-W29", str(self.tmp), events=[str(GOLDEN_DIR / "15min_midday_heat_peak.jsonl")])
+        artifacts = {a["path"].rsplit("/", 1)[1]: a["sha256"] for a in manifest["artifacts"]}
+        self.assertEqual(set(artifacts), {"evidence.csv", "team_views.csv", "privacy_audit.jsonl"})
+        for name, digest in artifacts.items():
+            self.assertEqual(hashlib.sha256((self.tmp / name).read_bytes()).hexdigest(), digest, name)
+        self.assertEqual(manifest["export_stats"]["evidence_bytes"], (self.tmp / "evidence.csv").stat().st_size)
+        self.assertGreater(len((self.tmp / "evidence.csv").read_text().splitlines()), 1)
+        self.assertEqual([p.name for p in self.tmp.glob("*.tmp")], [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""Batched point-in-polygon (haws.geofence) against a scalar even-odd ray cast."""
+import math
+import random
+import unittest
+
+import numpy as np
+
+from tests import RULES
+
+from haws.geofence import SCAN_ZONES, GeofenceEngine, Zone, window
+
+def ray_cast(x, y, polygon):
+    """Reference even-odd test, one point at a time."""
+    inside = False
+    n = len(polygon)
+    for i in range(n):
+        x1, y1 = polygon[i]["x"], polygon[i]["y"]
+        x2, y2 = polygon[(i + 1) % n]["x"], polygon[(i + 1) % n]["y"]
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+    return inside
+
+def random_polygon(r, cx, cy, radius, vertices):
+    """Star-shaped (possibly concave) polygon around (cx, cy)."""
+    angles = sorted(r.uniform(0, 2 * math.pi) for _ in range(vertices))
+    return [{"x": cx + r.uniform(0.2, 1.0) * radius * math.cos(a),
+             "y": cy + r.uniform(0.2, 1.0) * radius * math.sin(a)} for a in angles]
+
+def geofence_event(zone_id, polygon, ztype="dropzone"):
+    return {"topic": "site/geofence", "payload": {"zone_id": zone_id, "type": ztype, "polygon": polygon}}
+
+class ContainsTest(unittest.TestCase):
+    def test_matches_scalar_ray_cast(self):
+        r = random.Random(14)
+        for _ in range(50):
+            poly = random_polygon(r, 50, 50, 30, r.randint(3, 12))
+            px = np.array([r.uniform(0, 100) for _ in range(400)])
+            py = np.array([r.uniform(0, 100) for _ in range(400)])
+            got = Zone("z", "dropzone", poly, "high").contains(px, py)
+            want = [ray_cast(x, y, poly) for x, y in zip(px.tolist(), py.tolist())]
+            self.assertEqual(got.tolist(), want)
+
+    def test_horizontal_edges_and_vertices(self):
+        square = [{"x": 0, "y": 0}, {"x": 10, "y": 0}, {"x": 10, "y": 10}, {"x": 0, "y": 10}]
+        px = np.array([5.0, 0.0, 10.0, 5.0, 5.0, -1.0, 11.0])
+        py = np.array([5.0, 5.0, 5.0, 0.0, 10.0, 5.0, 5.0])
+        got = Zone("sq", "dropzone", square, "high").contains(px, py)
+        self.assertEqual(got.tolist(), [ray_cast(x, y, square) for x, y in zip(px.tolist(), py.tolist())])
+
+class LocateTest(unittest.TestCase):
+    def check(self, zones):
+        r = random.Random(zones)
+        engine = GeofenceEngine(RULES)
+        polygons = {}
+        for i in range(zones):
+            poly = random_polygon(r, r.uniform(0, 300), r.uniform(0, 200), r.uniform(3, 40), r.randint(3, 9))
+            polygons[f"z{i}"] = poly
+            engine.update(geofence_event(f"z{i}", poly))
+        px = np.array([r.uniform(-10, 310) for _ in range(1000)])
+        py = np.array([r.uniform(-10, 210) for _ in range(1000)])
+        mask = np.array([r.random() < 0.8 for _ in range(len(px))])
+        idx, found = engine.locate(px, py, 0.0, mask=mask)
+        got = sorted(zip(idx.tolist(), (z.zone_id for z in found)))
+        want = sorted((i, zid) for i in np.flatnonzero(mask).tolist() for zid, poly in polygons.items()
+                      if ray_cast(px[i], py[i], poly))
+        self.assertEqual(got, want)
+        self.assertTrue(want, "fixture should produce some containments")
+
+    def test_scan_path(self):
+        self.check(SCAN_ZONES)
+
+    def test_bucketed_path(self):
+        self.check(300)
+
+    def test_zone_replaced_and_removed(self):
+        engine = GeofenceEngine(RULES)
+        for i in range(SCAN_ZONES + 2):  # bucketed
+            engine.update(geofence_event(f"z{i}", random_polygon(random.Random(i), 200, 200, 5, 5)))
+        engine.update(geofence_event("moving", [{"x": 0, "y": 0}, {"x": 10, "y": 0}, {"x": 10, "y": 10}]))
+        px, py = np.array([8.0, 58.0]), np.array([2.0, 52.0])
+        self.assertEqual([z.zone_id for z in engine.locate(px, py, 0.0)[1]], ["moving"])
+        engine.update(geofence_event("moving", [{"x": 50, "y": 50}, {"x": 60, "y": 50}, {"x": 60, "y": 60}]))
+        idx, found = engine.locate(px, py, 0.0)
+        self.assertEqual((idx.tolist(), [z.zone_id for z in found]), ([1], ["moving"]))
+        engine.remove_zone("moving")
+        self.assertEqual(len(engine.locate(px, py, 0.0)[0]), 0)
+
+class TaskZoneTest(unittest.TestCase):
+    def test_active_window_and_context_replacement(self):
+        engine = GeofenceEngine(RULES)
+        square = [{"x": 0, "y": 0}, {"x": 10, "y": 0}, {"x": 10, "y": 10}, {"x": 0, "y": 10}]
+        engine.update({"topic": "site/context", "payload": {"date": "2025-07-15", "task_zones": [
+            {"zone_id": "trench", "polygon": square, "start": "07:00", "end": "15:00"}]}})
+        lo, hi = window("2025-07-15", "07:00", "15:00")
+        p = (np.array([5.0]), np.array([5.0]))
+        self.assertEqual(len(engine.locate(*p, lo - 1)[0]), 0)
+        self.assertEqual(len(engine.locate(*p, lo)[0]), 1)
+        self.assertEqual(len(engine.locate(*p, hi)[0]), 0)
+        engine.update({"topic": "site/context", "payload": {"date": "2025-07-15", "task_zones": []}})
+        self.assertNotIn("trench", engine.zones)
+
+    def test_alert_once_per_entry(self):
+        engine = GeofenceEngine(RULES, site_id="site-a")
+        engine.update(geofence_event("dz", [{"x": 0, "y": 0}, {"x": 10, "y": 0}, {"x": 10, "y": 10},
+                                            {"x": 0, "y": 10}]))
+        inside, outside = (np.array([5.0]), np.array([5.0])), (np.array([50.0]), np.array([5.0]))
+        self.assertEqual(len(engine.score(["w1"], *inside, 1.0)), 1)
+        self.assertEqual(len(engine.score(["w1"], *inside, 2.0)), 0)
+        self.assertEqual(len(engine.score(["w1"], *outside, 3.0)), 0)
+        self.assertEqual(len(engine.score(["w1"], *inside, 4.0)), 1)
+
+if __name__ == "__main__":
+    unittest.main()
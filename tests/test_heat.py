@@ -0,0 +1,84 @@
+"""Batch heat scoring (score_day) against the streaming HeatScorer, and the HI ring buffer."""
+import random
+import unittest
+
+import numpy as np
+
+from tests import RULES
+
+from haws.heat import MAX_GAP_S, RING_CAPACITY, HeatScorer, SensorState, day_of, heat_index_f, score_day
+from haws.ingest import utc_iso
+
+DAY0 = 1752537600.0  # 2025-07-15T00:00:00Z
+
+def random_day(seed, readings=1500):
+    """One sensor's readings drifting across the advisory/critical bands, with gaps and a midnight."""
+    r = random.Random(seed)
+    ts, temp, rh = [], [], []
+    t, c = DAY0 + 20 * 3600 + r.uniform(0, 3600), r.uniform(28, 36)
+    for _ in range(readings):
+        t += r.choice((15, 30, 60, 60, 60, 60, 120, MAX_GAP_S, MAX_GAP_S + 1, 900))
+        c = min(42.0, max(24.0, c + r.uniform(-0.6, 0.6)))
+        ts.append(t)
+        temp.append(round(c, 1))
+        rh.append(r.choice((40, 55, 70)))
+    return ts, temp, rh
+
+class ScoreDayTest(unittest.TestCase):
+    def test_matches_streaming_scorer(self):
+        alerted = 0
+        for seed in range(40):
+            ts, temp, rh = random_day(seed)
+            scorer = HeatScorer(RULES, site_id="site-a")
+            streamed = []
+            for t, c, h in zip(ts, temp, rh):
+                streamed += [(a["ts_event"], a["rule"]) for a in scorer.observe("env-1", t, c, h, "site-a")]
+            alerts, minutes = score_day(np.array(ts), np.array(temp), np.array(rh), RULES)
+            self.assertEqual([(utc_iso(t), rule) for t, rule, _ in alerts], streamed, f"seed {seed}")
+            want = {day: m for (_, _, day), m in scorer.high_minutes.items()}
+            self.assertEqual(sorted(minutes), sorted(want), f"seed {seed}")
+            for day, m in want.items():
+                self.assertAlmostEqual(minutes[day], m, places=6, msg=f"seed {seed} {day}")
+            alerted += len(alerts)
+        self.assertGreater(alerted, 0, "fixture should cross the bands")
+
+    def test_unsorted_input(self):
+        ts, temp, rh = random_day(3, readings=400)
+        r = random.Random(0)
+        order = list(range(len(ts)))
+        r.shuffle(order)
+        shuffled = [np.array([col[i] for i in order]) for col in (ts, temp, rh)]
+        self.assertEqual(score_day(*shuffled, RULES), score_day(np.array(ts), np.array(temp), np.array(rh), RULES))
+
+    def test_empty(self):
+        self.assertEqual(score_day(np.array([]), np.array([]), np.array([]), RULES), ([], {}))
+
+    def test_critical_settles_advisory(self):
+        ts = [DAY0 + 60 * i for i in range(15)]
+        alerts, minutes = score_day(np.array(ts), np.full(15, 40.0), np.full(15, 70.0), RULES)
+        self.assertEqual([rule for _, rule, _ in alerts], ["heat_critical"])
+        self.assertAlmostEqual(minutes[day_of(DAY0)], 14.0)
+
+class RingTest(unittest.TestCase):
+    def test_window_mean_beyond_initial_capacity(self):
+        st = SensorState()
+        his = [80 + (i % 37) * 0.5 for i in range(RING_CAPACITY * 3)]
+        for i, hi in enumerate(his):
+            mean = st.push(float(i), hi, 600.0)
+            window = his[max(0, i - 600):i + 1]
+            self.assertAlmostEqual(mean, sum(window) / len(window), places=6)
+        self.assertEqual(st.size, 601)
+        self.assertGreaterEqual(len(st.ring_ts), 601)
+
+    def test_scorer_window_mean_at_1hz(self):
+        scorer = HeatScorer(RULES)
+        out = []
+        for i in range(900):
+            out += scorer.observe("env-1", DAY0 + i, 41.0 if i < 300 else 40.0, 70.0)
+        self.assertEqual([a["rule"] for a in out], ["heat_critical"])
+        # the alert fires at 600 s with 601 readings in the window, past the initial ring size
+        mean = (300 * heat_index_f(41.0, 70.0) + 301 * heat_index_f(40.0, 70.0)) / 601
+        self.assertEqual(out[0]["heat_index_window_mean_f"], round(mean, 1))
+
+if __name__ == "__main__":
+    unittest.main()
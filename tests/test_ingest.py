@@ -0,0 +1,65 @@
+"""Compiled ingest validators and the Ingestor (haws.ingest) on hand-written lines."""
+import copy
+import unittest
+
+from haws.ingest import Ingestor, compile_validator, load_schema
+
+SCHEMA = load_schema()
+
+class ValidatorTest(unittest.TestCase):
+    def setUp(self):
+        self.examples = {topic: spec["example"] for topic, spec in SCHEMA.items()}
+        self.validators = {topic: compile_validator(topic, ex) for topic, ex in self.examples.items()}
+
+    def check(self, topic, change):
+        payload = copy.deepcopy(self.examples[topic])
+        change(payload)
+        return self.validators[topic](payload)
+
+    def test_examples_pass(self):
+        for topic, example in self.examples.items():
+            self.assertIsNone(self.validators[topic](example), topic)
+
+    def test_errors_name_the_field(self):
+        self.assertEqual(self.check("site/env", lambda p: p.pop("temp_c")), "payload.temp_c: missing")
+        self.assertEqual(self.check("site/env", lambda p: p.update(temp_c="hot")), "payload.temp_c: expected number")
+        self.assertEqual(self.check("site/env", lambda p: p["gas"].pop("co")), "payload.gas.co: missing")
+        self.assertEqual(self.check("site/worker", lambda p: p.update(events={})), "payload.events: expected array")
+        self.assertEqual(self.check("site/geofence", lambda p: p["polygon"].append({"x": 1})),
+                         "payload.polygon[].y: missing")
+        self.assertEqual(self.check("site/context", lambda p: p["routes"][0]["polyline"].append([1, 2])),
+                         "payload.routes[].polyline[]: expected object")
+        self.assertEqual(self.validators["site/env"]([]), "payload: expected object")
+
+    def test_numbers_and_nulls(self):
+        self.assertIsNone(self.check("site/env", lambda p: p.update(temp_c=34, rh=58.5)))
+        self.assertEqual(self.check("site/env", lambda p: p.update(rh=True)), "payload.rh: expected number")
+        self.assertIsNone(compile_validator("t", {"note": None})({"note": [1]}))
+        self.assertIn("def validate_site_env(p):", self.validators["site/env"].source)
+
+class IngestorTest(unittest.TestCase):
+    def test_decode_stamps_and_rejects(self):
+        rejected = []
+        ing = Ingestor(SCHEMA, site_id="site-x", reject=lambda n, reason, raw: rejected.append((n, reason)),
+                       clock=lambda: 1752580800.25)
+        env = b'{"topic": "site/env", "payload": {"ts": "2025-07-15T12:00:00Z", "sensor_id": "env-01", ' \
+              b'"temp_c": 34.2, "rh": 58, "pm25": 24, "noise_db": 82, "gas": {"co": 1.2, "h2s": 0.0}, "lux": 300}}\n'
+        zone = b'{"topic": "site/geofence", "site_id": "site-y", "event_id": "e1", "payload": ' \
+               b'{"zone_id": "z", "type": "dropzone", "polygon": []}}\n'
+        lines = [env, b"not json\n", b"\n", b'{"topic": "site/nope", "payload": {}}\n', b"[1]\n",
+                 b'{"topic": "site/env", "payload": {"ts": "2025-07-15T12:00:00Z"}}\n', zone]
+        events = ing.decode(lines)
+        self.assertEqual([(e["topic"], e["site_id"], e["ts_event"]) for e in events],
+                         [("site/env", "site-x", "2025-07-15T12:00:00Z"),
+                          ("site/geofence", "site-y", "2025-07-15T12:00:00.250Z")])
+        self.assertEqual(events[1]["event_id"], "e1")
+        self.assertEqual(events[0]["event_id"], Ingestor(SCHEMA, site_id="site-x").decode([env])[0]["event_id"])
+        self.assertNotEqual(events[0]["event_id"], Ingestor(SCHEMA, site_id="site-z").decode([env])[0]["event_id"])
+        self.assertEqual([n for n, _ in rejected], [2, 4, 5, 6])
+        self.assertEqual(rejected[1][1], "unknown topic: 'site/nope'")
+        self.assertEqual(rejected[3][1], "site/env: payload.sensor_id: missing")
+        ing.route(events)
+        self.assertEqual((ing.counts["site/env"], ing.counts["site/geofence"], ing.rejected), (1, 1, 4))
+
+if __name__ == "__main__":
+    unittest.main()
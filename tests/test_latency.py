@@ -0,0 +1,78 @@
+"""LogHistogram buckets, merges and quantile error; LatencyRecorder export/merge (haws.latency)."""
+import math
+import unittest
+
+import numpy as np
+
+from haws.latency import GAMMA, LatencyRecorder, LogHistogram
+
+def sample(n=20000, seed=17):
+    return np.random.default_rng(seed).lognormal(mean=3.0, sigma=1.5, size=n)
+
+class LogHistogramTest(unittest.TestCase):
+    def test_record_many_matches_record(self):
+        values = np.concatenate([sample(5000), [0.0, 0.01, 0.0100001, -3.0, 1e9]])
+        one, many = LogHistogram(), LogHistogram()
+        for v in values:
+            one.record(float(v))
+        many.record_many(values)
+        np.testing.assert_array_equal(one.counts, many.counts)
+        self.assertEqual((one.total, one.min, one.max), (many.total, many.min, many.max))
+        self.assertAlmostEqual(one.sum, many.sum, places=3)
+
+    def test_quantile_relative_error(self):
+        values = sample()
+        h = LogHistogram()
+        h.record_many(values)
+        bound = GAMMA - 1.0  # a bucket spans a factor GAMMA; its middle is within ~1% of any value in it
+        for q in (0.01, 0.5, 0.9, 0.95, 0.99, 0.999):
+            exact = float(np.quantile(values, q, method="inverted_cdf"))
+            self.assertLessEqual(abs(h.quantile(q) - exact) / exact, bound, q)
+        self.assertTrue(h.min <= h.quantile(0.0) <= h.quantile(1.0) <= h.max)
+        self.assertIsNone(LogHistogram().quantile(0.5))
+
+    def test_merge(self):
+        values = sample()
+        whole, parts = LogHistogram(), [LogHistogram() for _ in range(4)]
+        whole.record_many(values)
+        for i, part in enumerate(parts):
+            part.record_many(values[i::4])
+        merged = LogHistogram()
+        for part in parts + [LogHistogram()]:  # an empty one changes nothing
+            merged.merge(LogHistogram.from_dict(part.to_dict()))
+        np.testing.assert_array_equal(merged.counts, whole.counts)
+        self.assertEqual((merged.total, merged.min, merged.max), (whole.total, whole.min, whole.max))
+        for q in (0.5, 0.95, 0.99):
+            self.assertEqual(merged.quantile(q), whole.quantile(q))
+
+class LatencyRecorderTest(unittest.TestCase):
+    def test_export_merge_and_window(self):
+        t0 = 1752580800.0
+        a, b, both = LatencyRecorder(), LatencyRecorder(), LatencyRecorder()
+        for i, ms in enumerate(sample(3000).tolist()):
+            at = t0 + i * 30.0  # 25 hours of observations
+            (a if i % 2 else b).observe("event_to_api", "site-a", ms, at)
+            both.observe("event_to_api", "site-a", ms, at)
+        merged = LatencyRecorder().merge(a).merge(b)
+        now = both.latest()
+        self.assertEqual(merged.kpi(now=now), both.kpi(now=now))
+        for m, w in zip(merged.summary(now=now), both.summary(now=now)):
+            self.assertAlmostEqual(m.pop("mean"), w.pop("mean"))  # float sums in another order
+            self.assertEqual(m, w)
+        # the window covers 24 of the 25 hourly slots
+        self.assertLess(both.window("event_to_api", now=now).total, 3000)
+        self.assertLessEqual(len(both.slots[("event_to_api", "site-a")]), 25)
+        with self.assertRaises(ValueError):
+            LatencyRecorder(slot_s=60).merge_export(a.export())
+
+    def test_observe_record_stages(self):
+        rec = LatencyRecorder()
+        rec.observe_record({"site_id": "site-a", "ts_event": "2025-07-15T12:00:00Z",
+                            "ts_ingest": "2025-07-15T12:00:00.500Z", "ts_scored": "2025-07-15T12:00:00.520Z",
+                            "ts_served": "2025-07-15T12:00:00.600Z"})
+        got = {row["stage"]: row["p50"] for row in rec.summary(now=rec.latest())}
+        for stage, ms in {"ingest": 500, "score": 20, "serve": 80, "event_to_api": 100}.items():
+            self.assertTrue(math.isclose(got[stage], ms, rel_tol=GAMMA - 1.0), stage)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""LiveTable slots (haws.livestate): buffered updates, eviction and slot reuse."""
+import math
+import unittest
+
+import numpy as np
+
+from tests import RULES
+
+from haws.ingest import utc_iso
+from haws.livestate import LiveTable
+from haws.proximity import ProximityEngine
+
+class LiveTableTest(unittest.TestCase):
+    def test_updates_and_velocity(self):
+        t = LiveTable()
+        self.assertEqual(t.upsert("w1", 1.0, 2.0, 2.0, 90.0, 10.0, kind="Crew A"), 0)
+        self.assertEqual(t.upsert("w2", 5.0, 5.0, 1.0, 0.0, 10.0), 1)
+        self.assertEqual(t.upsert("w1", 3.0, 4.0, 2.0, 180.0, 12.0, kind="Crew B"), 0)
+        self.assertIsNone(t.upsert("w1", 9.0, 9.0, 0.0, 0.0, 11.0))  # older than the slot's latest
+        w1 = t.view("w1")
+        self.assertEqual((w1.x, w1.y, w1.ts, w1.kind), (3.0, 4.0, 12.0, "Crew B"))
+        self.assertAlmostEqual(w1.vx, 0.0)
+        self.assertAlmostEqual(w1.vy, -2.0)
+        self.assertAlmostEqual(t.view("w2").vy, 1.0)
+        np.testing.assert_array_equal(t.live(11.0), [True, False])
+        self.assertEqual((len(t), t.high, "w2" in t, t.view("nope")), (2, 2, True, None))
+
+    def test_evict_and_reuse_lowest_slot(self):
+        t = LiveTable()
+        for i in range(5):
+            t.upsert(f"e{i}", float(i), 0.0, 1.0, 0.0, 100.0 + i, radius=3.0)
+        self.assertEqual(sorted(t.evict(102.0)), [("e0", 0), ("e1", 1)])
+        self.assertEqual((len(t), t.high, "e0" in t), (3, 5, False))
+        self.assertEqual(t.ts[:2].tolist(), [-math.inf, -math.inf])
+        self.assertEqual((t.radius[:2].tolist(), t.ids[:2], t.kinds[:2]), ([0.0, 0.0], [None, None], ["", ""]))
+        self.assertFalse(t.live(-1e18)[:2].any())  # freed slots are never live
+        self.assertEqual(t.evict(102.0), [])
+
+        # new ids take the freed slots, lowest first, then extend the table
+        self.assertEqual([t.upsert(f"n{i}", 0.0, 0.0, 0.0, 0.0, 50.0) for i in range(3)], [0, 1, 5])
+        self.assertEqual(t.view("n0").ts, 50.0)  # a reused slot takes any timestamp
+        self.assertEqual(t.index, {"e2": 2, "e3": 3, "e4": 4, "n0": 0, "n1": 1, "n2": 5})
+
+    def test_grow_keeps_state(self):
+        t = LiveTable(capacity=4)
+        for i in range(10):
+            t.upsert(f"w{i}", float(i), -float(i), 0.5, 45.0, float(i))
+        t.sync()
+        self.assertGreaterEqual(t.capacity, 10)
+        self.assertEqual(t.x[:10].tolist(), [float(i) for i in range(10)])
+        self.assertEqual(t.ts[10:].tolist(), [-math.inf] * (t.capacity - 10))
+
+class EngineEvictTest(unittest.TestCase):
+    def position(self, engine, topic, ident, x, at):
+        payload = ({"worker_id": ident} if topic == "site/worker" else
+                   {"asset_id": ident, "type": "forklift", "state": {"speed": 0.0}})
+        payload.update(x=x, y=0.0, heading=0.0, speed=0.0)
+        engine.update({"topic": topic, "ts_event": utc_iso(at), "payload": payload})
+
+    def test_reused_slot_starts_a_new_pair(self):
+        engine = ProximityEngine(RULES, site_id="site-a")
+        t0 = 1752580800.0
+        self.position(engine, "site/worker", "w1", 0.0, t0)
+        self.position(engine, "site/equipment", "f1", 1.0, t0)
+        self.assertEqual([a["worker_id"] for a in engine.score(t0)], ["w1"])
+        self.assertEqual(engine.score(t0 + 1), [])  # same pair, same level: no repeat
+
+        # w1 goes silent and is evicted; w2 takes its slot next to the same forklift
+        later = t0 + engine.evict_s + 10
+        self.position(engine, "site/equipment", "f1", 1.0, later)
+        self.assertEqual(engine.evict(later), 1)
+        self.assertEqual(engine.active, {})
+        self.position(engine, "site/worker", "w2", 0.5, later)
+        self.assertEqual(engine.workers.index["w2"], 0)
+        self.assertEqual([a["worker_id"] for a in engine.score(later)], ["w2"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+"""Privacy settings come from the compiled Ruleset (haws.rules), not a second reading of the YAML."""
+import copy
+import unittest
+
+from tests import RULES
+
+from haws.privacy import Settings, guardrail_status
+from haws.rules import DEFAULT_BAND_EDGES, compile_rules
+
+def with_suppression(**values):
+    rules = copy.deepcopy(RULES)
+    rules.setdefault("suppression", {}).update(values)
+    return rules
+
+class SettingsTest(unittest.TestCase):
+    def test_raw_rules_and_ruleset_agree(self):
+        raw, compiled = Settings(RULES), Settings(compile_rules(RULES))
+        for name in Settings.__slots__:
+            self.assertEqual(getattr(raw, name), getattr(compiled, name), name)
+        self.assertEqual(compiled.band_edges, DEFAULT_BAND_EDGES)
+        self.assertEqual(guardrail_status(compiled), "pass")
+
+    def test_reads_the_ruleset(self):
+        rs = compile_rules(with_suppression(minimum_cohort_size=8, min_time_aggregation_min=90,
+                                            band_edges=[1, 3]))
+        s = Settings(rs)
+        self.assertEqual((s.min_cohort, s.window_s, s.band_edges), (8, 5400.0, (1.0, 3.0)))
+        self.assertEqual(rs.tables()["suppression"]["band_edges"], [1.0, 3.0])
+
+    def test_policy_floors(self):
+        s = Settings(compile_rules(with_suppression(minimum_cohort_size=3, band_values=False, band_edges=[2, 1])))
+        self.assertEqual(len(s.violations()), 3)
+        self.assertEqual(guardrail_status(s), "fail")
+
+    def test_band_edges_type_checked(self):
+        with self.assertRaises(ValueError):
+            compile_rules(with_suppression(band_edges="0.5,2"))
+
+if __name__ == "__main__":
+    unittest.main()
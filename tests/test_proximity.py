@@ -0,0 +1,83 @@
+"""Vectorized time-to-collision and grid-pruned proximity scoring (haws.proximity)."""
+import math
+import random
+import unittest
+
+import numpy as np
+
+from tests import RULES
+
+from haws.ingest import utc_iso
+from haws.proximity import ProximityEngine, time_to_collision
+from haws.rules import as_ruleset
+
+def ttc_scalar(px, py, vx, vy, r):
+    """First t >= 0 with |p + v t| <= r, by the quadratic (the reference for the vectorized one)."""
+    if px * px + py * py <= r * r:
+        return 0.0
+    a, b, c = vx * vx + vy * vy, 2 * (px * vx + py * vy), px * px + py * py - r * r
+    disc = b * b - 4 * a * c
+    if a == 0 or disc < 0 or b >= 0:
+        return math.inf
+    return (-b - math.sqrt(disc)) / (2 * a)
+
+def ttc(*values):
+    return time_to_collision(*(np.array([v], dtype=float) for v in values))[0]
+
+class TimeToCollisionTest(unittest.TestCase):
+    def test_cases(self):
+        self.assertEqual(ttc(10, 0, -2, 0, 2), 4.0)        # head on: 8 m to close at 2 m/s
+        self.assertEqual(ttc(1, 1, 5, 5, 2), 0.0)          # already inside, even moving away
+        self.assertEqual(ttc(10, 0, 2, 0, 2), math.inf)    # moving apart
+        self.assertEqual(ttc(10, 5, -2, 0, 2), math.inf)   # passes 5 m away
+        self.assertEqual(ttc(10, 0, 0, 0, 2), math.inf)    # no relative motion
+        self.assertAlmostEqual(ttc(10, 1, -1, 0, 2), 10 - math.sqrt(3))
+
+    def test_matches_scalar(self):
+        rng = np.random.default_rng(13)
+        n = 2000
+        p = rng.uniform(-30, 30, size=(2, n))
+        v = rng.uniform(-4, 4, size=(2, n))
+        v[:, :100] = 0.0
+        r = rng.uniform(1, 8, size=n)
+        got = time_to_collision(p[0], p[1], v[0], v[1], r)
+        want = [ttc_scalar(p[0, i], p[1, i], v[0, i], v[1, i], r[i]) for i in range(n)]
+        np.testing.assert_allclose(got, want, rtol=1e-9)
+        self.assertTrue(np.isinf(got).any() and (got == 0).any() and ((got > 0) & np.isfinite(got)).any())
+
+class GridScoringTest(unittest.TestCase):
+    def test_grid_finds_every_pair(self):
+        """The grid prunes pairs without losing any that brute force over all pairs would alert on."""
+        rs = as_ruleset(RULES)
+        rng = random.Random(21)
+        engine = ProximityEngine(RULES, site_id="site-a")
+        now = 1752580800.0
+        workers = {f"w{i}": (rng.uniform(0, 300), rng.uniform(0, 300), rng.uniform(0, 3), rng.uniform(0, 360))
+                   for i in range(150)}
+        kinds = list(rs.asset_types) + ["unlisted"]
+        equipment = {f"e{i}": (rng.uniform(0, 300), rng.uniform(0, 300), rng.uniform(0, 5), rng.uniform(0, 360),
+                               rng.choice(kinds)) for i in range(60)}
+        ts = utc_iso(now)
+        for wid, (x, y, speed, heading) in workers.items():
+            engine.update({"topic": "site/worker", "ts_event": ts, "payload": {
+                "worker_id": wid, "x": x, "y": y, "speed": speed, "heading": heading}})
+        for eid, (x, y, speed, heading, kind) in equipment.items():
+            engine.update({"topic": "site/equipment", "ts_event": ts, "payload": {
+                "asset_id": eid, "type": kind, "x": x, "y": y, "heading": heading, "state": {"speed": speed}}})
+        got = {(a["worker_id"], a["asset_id"]): a["rule"] for a in engine.score(now)}
+
+        want = {}
+        for wid, (wx, wy, ws, wh) in workers.items():
+            for eid, (ex, ey, es, eh, kind) in equipment.items():
+                t = ttc_scalar(wx - ex, wy - ey,
+                               ws * math.sin(math.radians(wh)) - es * math.sin(math.radians(eh)),
+                               ws * math.cos(math.radians(wh)) - es * math.cos(math.radians(eh)),
+                               rs.radius_for(kind))
+                if t <= rs.ttc_threshold:
+                    want[(wid, eid)] = "proximity_high" if t == 0 else "proximity_med"
+        self.assertGreater(len(want), 5)
+        self.assertEqual(got, want)
+        self.assertLess(engine.last_candidates, len(workers) * len(equipment))
+
+if __name__ == "__main__":
+    unittest.main()
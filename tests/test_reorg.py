@@ -0,0 +1,359 @@
+"""reorg_haws_v2.py end to end on small temporary trees."""
+import csv
+import hashlib
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+from tests import REPO_ROOT
+
+SCRIPT = REPO_ROOT / "reorg_haws_v2.py"
+
+class ReorgCase(unittest.TestCase):
+    """A temporary src/dst pair; subclasses fill src in setUp."""
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp(prefix="haws-test-"))
+        self.src, self.dst = self.tmp / "src", self.tmp / "dst"
+        self.src.mkdir()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, rel, text):
+        path = self.src / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+        return path
+
+    def reorg(self, *extra, script=SCRIPT):
+        return subprocess.run([sys.executable, str(script), "--src", str(self.src), "--dst", str(self.dst), *extra],
+                              check=True, capture_output=True, text=True).stdout
+
+    def rows(self, pending=False):
+        """Manifest rows; the "pending" intent rows written before each --apply step only if asked."""
+        with open(self.dst / "manifest.csv", newline="", encoding="utf-8") as f:
+            return [r for r in csv.DictReader(f) if pending or r["action"] != "pending"]
+
+    def files(self, root):
+        return sorted(str(p.relative_to(root)) for p in root.rglob("*") if p.is_file() and p.suffix != ".sqlite")
+
+class ResumeTest(ReorgCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(6):
+            self.write(f"a/doc{i}.txt", f"file {i}\n")
+        self.write("b/x.pdf", "x\n")
+        self.write("b/y.pdf", "y\n")
+
+    def crash_after(self, prefix):
+        """Cut the manifest just after `prefix` of the b/y.pdf row and drop the file it placed."""
+        manifest = self.dst / "manifest.csv"
+        text = manifest.read_text(encoding="utf-8")
+        manifest.write_text(text[:text.index("b/y.pdf,skipped") + len(prefix)], encoding="utf-8")
+        (self.dst / "library" / "pdf" / "y.pdf").unlink()
+
+    def check_resumed(self, before):
+        self.reorg("--apply", "--by-type", "--resume")
+        after = self.rows()
+        self.assertEqual(after, before)
+        self.assertEqual((self.dst / "library" / "pdf" / "y.pdf").read_text(), "y\n")
+        self.assertEqual(sorted(p.name for p in (self.dst / "library" / "pdf").iterdir()), ["x.pdf", "y.pdf"])
+
+    def test_torn_mid_row(self):
+        self.reorg("--apply", "--by-type")
+        before = self.rows()
+        self.crash_after("b/y.pdf,skipped,,library/pdf/y")
+        self.check_resumed(before)
+
+    def test_row_without_hash_column(self):
+        self.reorg("--apply", "--by-type")
+        before = self.rows()
+        self.crash_after("b/y.pdf,skipped,,library/pdf/y.pdf")
+        self.check_resumed(before)
+
+    def test_killed_between_steps(self):
+        """Killed after the domain move, before the type copy, its undo line and its manifest row."""
+        self.write("c/z.txt", "z\n")
+        self.reorg("--apply", "--by-type", "--by-domain", "--undo-script")
+        before, undo = self.rows(), (self.dst / "undo.sh").read_text(encoding="utf-8")
+        manifest = self.dst / "manifest.csv"
+        lines = manifest.read_text(encoding="utf-8").splitlines(keepends=True)
+        done = next(i for i, line in enumerate(lines) if line.startswith("c/z.txt,moved"))
+        manifest.write_text("".join(lines[:done]), encoding="utf-8")
+        self.assertTrue(lines[done - 1].startswith("c/z.txt,pending"))
+        (self.dst / "library" / "txt" / "z.txt").unlink()
+        (self.dst / "undo.sh").write_text("".join(l for l in undo.splitlines(keepends=True) if "z.txt" not in l),
+                                          encoding="utf-8")
+
+        self.reorg("--apply", "--by-type", "--by-domain", "--resume", "--undo-script")
+        self.assertEqual(self.rows(), before)
+        self.assertEqual((self.dst / "library" / "txt" / "z.txt").read_text(), "z\n")
+        self.assertEqual((self.dst / "domains" / "docs" / "z.txt").read_text(), "z\n")
+        self.assertFalse((self.src / "c" / "z.txt").exists())
+        self.assertEqual(sorted(undo.splitlines()), sorted((self.dst / "undo.sh").read_text().splitlines()))
+
+class ParallelHashTest(ReorgCase):
+    """--jobs N on either pool plans the same manifest as one worker."""
+
+    def setUp(self):
+        super().setUp()
+        for i in range(40):
+            self.write(f"d{i % 5}/f{i:02d}.{('txt', 'pdf', 'csv')[i % 3]}", f"content {i % 13}\n")
+
+    def plan(self, *extra):
+        self.reorg("--by-type", "--by-domain", "--no-hash-cache", *extra)  # every run hashes on its workers
+        return self.rows()
+
+    def test_same_manifest_for_any_pool(self):
+        serial = self.plan()
+        self.assertEqual(sum(r["action"] == "duplicate-skip" for r in serial), 40 - 13)
+        self.assertEqual(self.plan("--jobs", "4"), serial)
+        self.assertEqual(self.plan("--jobs", "3", "--pool", "process"), serial)
+
+class StagedDedupeTest(ReorgCase):
+    """--dedupe staged reads only as much as needed and finds the same duplicates as full hashing."""
+
+    def setUp(self):
+        super().setUp()
+        edge = b"e" * (4 << 20)  # PARTIAL_EDGE_BYTES: larger files get a head/tail hash first
+        for name, middle in (("big1", b"m"), ("big2", b"m"), ("big3", b"M"), ("big4", None)):
+            path = self.src / f"{name}.bin"
+            path.write_bytes(edge + (middle or b"x") * 1024 + (edge if middle else b"y" * len(edge)))
+        self.write("unique.txt", "only this size\n")
+        self.write("one.txt", "same\n")
+        self.write("two.txt", "same\n")
+        self.write("three.txt", "diff\n")
+
+    def plan(self, mode):
+        report = self.reorg("--dedupe", mode, "--report", "--no-hash-cache")
+        rows = self.rows()
+        dups = {r["source"] for r in rows if r["action"] == "duplicate-skip"}
+        return report, dups, {r["source"]: r["hash"] for r in rows}
+
+    def test_tiers_and_duplicates(self):
+        _, full_dups, full_hashes = self.plan("full")
+        report, staged_dups, hashes = self.plan("staged")
+        self.assertEqual(staged_dups, full_dups)
+        self.assertEqual(len(staged_dups), 2)
+        self.assertIn("tiers:      size=1 partial=1 sha256=6", report)
+        self.assertEqual(hashes["unique.txt"], "size:15")
+        self.assertTrue(hashes["big4.bin"].startswith("partial:"))
+        for name in ("big1.bin", "big2.bin", "big3.bin", "one.txt", "two.txt", "three.txt"):
+            self.assertEqual(hashes[name], full_hashes[name], name)
+
+class HashCacheTest(ReorgCase):
+    """Repeated dry runs reuse cached hashes until a file changes; --rehash ignores them."""
+
+    def cache_line(self, *extra):
+        report = self.reorg("--report", *extra)
+        return next(line.strip() for line in report.splitlines() if line.strip().startswith("hash cache:"))
+
+    def test_hits_rehash_and_eviction(self):
+        for i in range(3):
+            self.write(f"f{i}.txt", f"file {i}\n")
+        self.assertEqual(self.cache_line(), "hash cache: 0 hits, 3 misses, 0 evicted")
+        self.assertEqual(self.cache_line(), "hash cache: 3 hits, 0 misses, 0 evicted")
+
+        edited = self.write("f0.txt", "FILE 0\n")  # same size; the new mtime alone invalidates the entry
+        stamp = edited.stat().st_mtime_ns + 1_000_000_000
+        os.utime(edited, ns=(stamp, stamp))
+        self.assertEqual(self.cache_line(), "hash cache: 2 hits, 1 misses, 0 evicted")
+        self.assertEqual({r["source"]: r["hash"] for r in self.rows()}["f0.txt"],
+                         hashlib.sha256(b"FILE 0\n").hexdigest())
+        self.assertEqual(self.cache_line("--rehash"), "hash cache: 0 hits, 3 misses, 0 evicted")
+
+        (self.src / "f1.txt").unlink()
+        self.assertEqual(self.cache_line(), "hash cache: 2 hits, 0 misses, 1 evicted")
+        db = sqlite3.connect(str(self.dst / ".reorg_hashes.sqlite"))
+        try:
+            self.assertEqual(sorted(Path(p).name for p, in db.execute("SELECT path FROM hashes")), ["f0.txt", "f2.txt"])
+        finally:
+            db.close()
+        self.assertNotIn("hash cache:", self.reorg("--report", "--no-hash-cache"))
+
+class LinkModeTest(ReorgCase):
+    """--link-mode places the type view without a second copy, and undo.sh reverses each mode."""
+
+    def place(self, mode):
+        self.write("a.txt", "one\n")
+        report = self.reorg("--apply", "--by-type", "--by-domain", "--link-mode", mode, "--undo-script", "--report")
+        placed = next(line.split(":", 1)[1].split() for line in report.splitlines() if "placed as:" in line)
+        return self.dst / "domains" / "docs" / "a.txt", self.dst / "library" / "txt" / "a.txt", placed
+
+    def undo(self):
+        subprocess.run(["bash", str(self.dst / "undo.sh")], check=True)
+        self.assertEqual(self.files(self.src), ["a.txt"])
+        self.assertEqual((self.src / "a.txt").read_text(), "one\n")
+        self.assertEqual([p for p in self.files(self.dst) if p.endswith("a.txt")], [])
+
+    def test_hardlink(self):
+        domain, library, placed = self.place("hardlink")
+        self.assertIn("hardlink=1", placed)
+        self.assertTrue(os.path.samefile(domain, library))
+        self.assertEqual(domain.stat().st_nlink, 2)
+        self.undo()
+
+    def test_symlink(self):
+        domain, library, placed = self.place("symlink")
+        self.assertIn("symlink=1", placed)
+        self.assertTrue(library.is_symlink())
+        self.assertEqual(library.resolve(), domain.resolve())
+        self.undo()
+
+    def test_reflink_falls_back_to_copy(self):
+        domain, library, placed = self.place("reflink")
+        self.assertTrue("reflink=1" in placed or "copy=1" in placed, placed)  # copy where reflinks are unsupported
+        self.assertFalse(library.is_symlink())
+        self.assertEqual(library.read_text(), domain.read_text())
+        self.undo()
+
+class ArchiveTest(ReorgCase):
+    """--inspect-archives hashes zip members in place and dedupes them against loose files."""
+
+    def setUp(self):
+        super().setUp()
+        self.write("loose/report.pdf", "report\n")
+        self.write("loose/notes.txt", "notes\n")
+        self.write("loose/odd size.txt", "a loose file of its own size\n")
+        with zipfile.ZipFile(self.src / "bundle.zip", "w") as z:
+            z.writestr("docs/report.pdf", "report\n")
+            z.writestr("docs/new.txt", "only in the bundle\n")
+            z.writestr("docs/again.txt", "only in the bundle\n")
+        with zipfile.ZipFile(self.src / "copies.zip", "w", compression=zipfile.ZIP_DEFLATED) as z:
+            z.writestr("report.pdf", "report\n")
+            z.writestr("b/notes.txt", "notes\n")
+            z.writestr("c/odd.txt", "a loose file of its own size\n")
+        self.write("broken.zip", "not a zip\n")
+
+    def archive_rows(self, *extra):
+        self.reorg("--inspect-archives", *extra)
+        return {r["source"]: r["action"] for r in self.rows() if r["action"].startswith(("archive", "error"))}
+
+    def test_members_dedupe_against_loose_files(self):
+        want = {
+            "bundle.zip!docs/report.pdf": "archive-duplicate",
+            "bundle.zip!docs/new.txt": "archive-member",
+            "bundle.zip!docs/again.txt": "archive-duplicate",
+            "copies.zip!report.pdf": "archive-duplicate",
+            "copies.zip!b/notes.txt": "archive-duplicate",
+            "copies.zip!c/odd.txt": "archive-duplicate",
+            "copies.zip": "archive-redundant",
+            "broken.zip": "error-archive",
+        }
+        self.assertEqual(self.archive_rows(), want)
+        # staged dedupe settles "odd size.txt" by size alone; a member of that size still finds it
+        self.assertEqual(self.archive_rows("--dedupe", "staged"), want)
+        hashes = {r["source"]: r["hash"] for r in self.rows()}
+        self.assertEqual(hashes["bundle.zip!docs/new.txt"], hashlib.sha256(b"only in the bundle\n").hexdigest())
+        self.assertEqual(self.files(self.src / "loose"), ["notes.txt", "odd size.txt", "report.pdf"])
+
+class DestIndexTest(ReorgCase):
+    """A placed file edited by hand is not matched by its stale manifest hash (and so never overwritten)."""
+
+    def rerun(self, edit, script=SCRIPT):
+        self.write("a.txt", "one\n")
+        self.reorg("--apply", script=script)
+        placed = self.dst / "domains" / "docs" / "a.txt"
+        if edit:
+            placed.write_text("edited\n")
+        self.write("a.txt", "one\n")
+        self.reorg("--apply", script=script)
+        docs = self.dst / "domains" / "docs"
+        return {name: (docs / name).read_text() for name in self.files(docs)}
+
+    def test_edited_slot_gets_a_new_suffix(self):
+        self.assertEqual(self.rerun(edit=True), {"a.txt": "edited\n", "a__1.txt": "one\n"})
+
+    def test_unedited_slot_is_reused(self):
+        self.assertEqual(self.rerun(edit=False), {"a.txt": "one\n"})
+
+    def test_collisions_with_files_already_in_dst(self):
+        foreign = self.dst / "domains" / "docs" / "a.txt"
+        foreign.parent.mkdir(parents=True)
+        foreign.write_text("foreign\n")
+        for folder, text in (("x", "one\n"), ("y", "two\n"), ("z", "foreign\n")):
+            self.write(f"{folder}/a.txt", text)
+        self.reorg("--apply")
+        self.assertEqual({r["source"]: r["domain_dst"] for r in self.rows()},
+                         {"x/a.txt": "domains/docs/a__1.txt", "y/a.txt": "domains/docs/a__2.txt",
+                          "z/a.txt": "domains/docs/a.txt"})  # same content takes the existing slot
+        docs = self.dst / "domains" / "docs"
+        self.assertEqual({name: (docs / name).read_text() for name in self.files(docs)},
+                         {"a.txt": "foreign\n", "a__1.txt": "one\n", "a__2.txt": "two\n"})
+        self.assertEqual(self.files(self.src), [])
+
+    def test_v1_shares_the_index(self):
+        self.assertEqual(self.rerun(edit=True, script=REPO_ROOT / "reorg_haws.py"),
+                         {"a.txt": "edited\n", "a__1.txt": "one\n"})
+
+class StagedBaselineTest(ReorgCase):
+    """--incremental --dedupe staged compares a new file with placed content of the same size."""
+
+    def second_run(self, *first):
+        self.write("a.txt", "one\n")
+        self.reorg("--apply", *first)
+        self.write("b.txt", "one\n")
+        self.write("c.txt", "a unique size\n")
+        self.reorg("--apply", "--incremental", "--dedupe", "staged")
+        return {r["source"]: r["action"] for r in self.rows()[1:] if r["action"] != "skipped"}
+
+    def test_full_sha_baseline(self):
+        self.assertEqual(self.second_run(), {"b.txt": "duplicate-skip", "c.txt": "moved"})
+        self.assertEqual(self.files(self.src), ["b.txt"])
+
+    def test_staged_baseline(self):
+        self.assertEqual(self.second_run("--dedupe", "staged"), {"b.txt": "duplicate-skip", "c.txt": "moved"})
+        self.assertTrue(self.rows()[-1]["hash"].startswith("size:"))
+
+class IncrementalTest(ReorgCase):
+    def setUp(self):
+        super().setUp()
+        self.write("a.txt", "one\n")
+        self.write("notes/b.md", "two\n")
+
+    def test_dry_run_then_incremental_apply(self):
+        self.reorg("--undo-script")
+        self.assertEqual({r["applied"] for r in self.rows()}, {"no"})
+        undo = (self.dst / "undo.sh").read_text()
+        self.assertNotIn("\nmkdir", undo)  # the dry run's undo lines are comments
+
+        self.reorg("--incremental", "--apply", "--undo-script")
+        self.assertEqual(self.files(self.src), [])
+        self.assertEqual(self.files(self.dst / "domains"), ["docs/a.txt", "templates/b.md"])
+        self.assertEqual([(r["source"], r["applied"]) for r in self.rows()[2:]],
+                         [("a.txt", "yes"), ("notes/b.md", "yes")])
+
+    def test_skips_unchanged_and_replans_changed(self):
+        self.reorg()
+        self.write("notes/b.md", "two, edited\n")
+        self.write("c.txt", "three\n")
+        report = self.reorg("--incremental", "--report")
+        self.assertIn("unchanged:  1", report)
+        replanned = {r["source"]: r["hash"] for r in self.rows()[2:]}
+        self.assertEqual(replanned, {"notes/b.md": hashlib.sha256(b"two, edited\n").hexdigest(),
+                                     "c.txt": hashlib.sha256(b"three\n").hexdigest()})
+
+    def test_incremental_dry_run_counts_its_own_plan(self):
+        self.reorg()
+        self.reorg("--incremental")
+        self.assertEqual(len(self.rows()), 2)
+
+    def test_legacy_manifest_is_upgraded(self):
+        self.reorg("--apply")
+        manifest = self.dst / "manifest.csv"
+        legacy = [line.rsplit(",", 1)[0] for line in manifest.read_text(encoding="utf-8").splitlines()]
+        manifest.write_text("\n".join(legacy) + "\n", encoding="utf-8")
+        self.write("c.txt", "three\n")
+        self.reorg("--incremental", "--apply")
+        self.assertEqual([(r["source"], r["applied"]) for r in self.rows()],
+                         [("a.txt", ""), ("notes/b.md", ""), ("c.txt", "yes")])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""RuleWatcher hot reload (haws.rules) and what-if replays of a rule change (haws.sim)."""
+import copy
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import yaml
+
+from tests import GOLDEN_DIR, RULES
+
+from haws.rules import DEFAULT_RULES_PATH, RuleWatcher, compile_rules
+from haws.sim import what_if
+
+PEAK = GOLDEN_DIR / "15min_midday_heat_peak.jsonl"
+
+def with_ttc(seconds):
+    rules = copy.deepcopy(RULES)
+    rules["proximity"]["ttc_threshold_s"] = seconds
+    return rules
+
+class RuleWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp(prefix="haws-test-"))
+        self.path = self.tmp / "risk_rules.yaml"
+        shutil.copy(DEFAULT_RULES_PATH, self.path)
+        self.changes = []
+        self.watcher = RuleWatcher(self.path, 60.0, on_change=lambda old, new: self.changes.append((old, new)))
+        self.stamp = os.stat(self.path).st_mtime_ns
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def rewrite(self, text):
+        self.path.write_text(text, encoding="utf-8")
+        self.stamp += 1_000_000_000  # a distinct mtime even on coarse-grained filesystems
+        os.utime(self.path, ns=(self.stamp, self.stamp))
+
+    def test_reload_cycle(self):
+        w = self.watcher
+        first = w.current
+        self.assertIsNone(w.check())
+
+        self.rewrite(self.path.read_text(encoding="utf-8") + "\n# comment only\n")
+        self.assertIsNone(w.check())  # same rules, same version: nothing swapped
+        self.assertEqual((w.reloads, self.changes), (0, []))
+
+        self.rewrite(yaml.safe_dump(with_ttc(9.0)))
+        old, new = w.check()
+        self.assertIs(old, first)
+        self.assertIs(w.current, new)
+        self.assertEqual((new.ttc_threshold, w.reloads, len(self.changes)), (9.0, 1, 1))
+
+        self.rewrite("proximity: [unclosed\n")
+        self.assertIsNone(w.check())
+        self.assertIs(w.current, new)  # a broken file keeps the last good rules
+        self.assertIsNotNone(w.status()["error"])
+
+        self.rewrite(yaml.safe_dump(with_ttc("soon")))
+        self.assertIsNone(w.check())
+        self.assertIn("ttc_threshold_s", w.error)
+
+        self.rewrite(yaml.safe_dump(RULES))
+        self.assertEqual(w.check()[1].version, first.version)
+        self.assertEqual((w.error, w.reloads), (None, 2))
+
+    def test_missing_file(self):
+        self.path.unlink()
+        self.assertIsNone(self.watcher.check())
+        self.assertIsNotNone(self.watcher.error)
+
+class WhatIfTest(unittest.TestCase):
+    lines = [line for line in PEAK.read_bytes().splitlines(keepends=True) if line.strip()]
+
+    def test_same_rules(self):
+        r = what_if(self.lines, RULES, compile_rules(RULES))
+        self.assertEqual(r["counts"], {"added": 0, "removed": 0, "changed": 0})
+        self.assertEqual(r["unchanged"], r["alerts_before"])
+        self.assertEqual(r["old_version"], r["new_version"])
+
+    def test_longer_ttc_threshold(self):
+        r = what_if(self.lines, RULES, with_ttc(RULES["proximity"]["ttc_threshold_s"] * 3), max_items=5)
+        counts = r["counts"]
+        self.assertGreater(counts["added"], 0)
+        self.assertEqual(r["alerts_after"] - r["alerts_before"], counts["added"] - counts["removed"])
+        self.assertEqual(r["alerts_before"], r["unchanged"] + counts["removed"] + counts["changed"])
+        totals = {kind: sum(c.get(kind, 0) for c in r["by_rule"].values()) for kind in counts}
+        self.assertEqual(totals, counts)
+        self.assertLessEqual(len(r["added"]), 5)
+        self.assertTrue(set(r["by_rule"]) <= {"proximity_med", "proximity_high"})
+        self.assertNotEqual(r["old_version"], r["new_version"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+"""ServeApp end to end on a local port: WebSocket fan-out and a clean close() with clients still connected."""
+import asyncio
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from tests import GOLDEN_DIR, RULES
+
+from haws import serve
+
+SAMPLE = GOLDEN_DIR / "sample_stream.jsonl"
+
+async def request(reader, writer, method, path, body=b""):
+    """One keep-alive HTTP/1.1 exchange; returns (status, decoded JSON body)."""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\n\r\n"
+                 .encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        h = await reader.readline()
+        if h == b"\r\n":
+            break
+        k, _, v = h.decode("latin-1").partition(":")
+        if k.lower() == "content-length":
+            length = int(v)
+    return status, json.loads(await reader.readexactly(length)) if length else None
+
+class CloseTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp(prefix="haws-test-"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    async def scenario(self):
+        errors = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        app = serve.ServeApp(RULES, "site-a", alerts_out=str(self.tmp / "alerts.jsonl"))
+        await app.start(port=0)
+        host, port = app.address
+        ws_reader, ws_writer = await serve.ws_connect(host, port)
+        http_reader, http_writer = await asyncio.open_connection(host, port)
+
+        status, body = await request(http_reader, http_writer, "POST", "/events", SAMPLE.read_bytes())
+        self.assertEqual(status, 200)
+        status, flushed = await request(http_reader, http_writer, "POST", "/flush")
+        self.assertEqual(status, 200)
+        expected = body["alerts"] + flushed["alerts"]
+        received = []
+        while len(received) < expected:
+            op, data = await asyncio.wait_for(serve.ws_read(ws_reader), 5)
+            self.assertEqual(op, serve.OP_TEXT)
+            received += json.loads(data)["alerts"]
+        self.assertEqual(len(app._conns), 2)
+
+        # both clients stay connected (the HTTP one idle on keep-alive) while the app closes
+        await asyncio.wait_for(app.close(), 5)
+        self.assertEqual(app._conns, set())
+        self.assertEqual(await asyncio.wait_for(http_reader.read(), 5), b"")
+        try:  # a close frame, or just the end of the stream
+            op, _ = await asyncio.wait_for(serve.ws_read(ws_reader), 5)
+            self.assertEqual(op, serve.OP_CLOSE)
+        except asyncio.IncompleteReadError:
+            pass
+        for writer in (ws_writer, http_writer):
+            writer.close()
+        await asyncio.sleep(0)
+        self.assertEqual(errors, [])
+        return expected, received
+
+    def test_close_with_open_connections(self):
+        expected, received = asyncio.run(self.scenario())
+        self.assertGreater(expected, 0)
+        logged = (self.tmp / "alerts.jsonl").read_text(encoding="utf-8").splitlines()
+        self.assertEqual(sorted(json.loads(line)["alert_id"] for line in logged),
+                         sorted(a["alert_id"] for a in received))
+
+class BoundedStateTest(unittest.TestCase):
+    """The ack/explain ids and the presence windows stay bounded; the rates stay exact."""
+
+    def setUp(self):
+        self.app = serve.ServeApp(RULES, "site-a")
+
+    def tearDown(self):
+        self.app.scorer.shutdown()
+
+    def alert(self, i, rule="geofence_violation"):
+        return {"alert_id": f"a{i}", "rule": rule, "kind": "geofence", "site_id": "site-a",
+                "ts_event": "2025-07-15T12:00:00Z"}
+
+    @mock.patch.object(serve, "TRACKED_ALERTS", 10)
+    def test_ack_and_explain_rates(self):
+        app = self.app
+        app.publish([self.alert(i) for i in range(40)] + [self.alert(i, "proximity") for i in range(40, 50)])
+        for i in range(0, 40, 2):  # 20 acks; only the 5 among the last 10 geofence ids still count
+            app.record_telemetry({"alert_id": f"a{i}", "action": "ack"})
+        app.record_telemetry({"alert_id": "a38", "action": "ack"})
+        for i in range(25):
+            app.record_telemetry({"alert_id": f"a{i}", "action": "explain"})
+            app.record_telemetry({"alert_id": "a24", "action": "explain"})
+        self.assertEqual((len(app.geofence_served), len(app.explained)), (10, 10))
+        snapshot = app.build_snapshot("site-a")
+        self.assertEqual(snapshot["geofence_violations_ack_rate"], round(5 / 40, 3))
+        self.assertEqual(snapshot["explain_alert_click_rate"], round(25 / 50, 3))
+
+    def test_presence_windows(self):
+        window_s = self.app.team_views.settings.window_s
+        events = [{"topic": "site/worker", "ts_event": serve.utc_iso(1.752e9 + k * window_s / 2),
+                   "payload": {"worker_id": f"w{k % 3}"}} for k in range(20)]
+        rows = self.app._team_rows(events, [])
+        self.assertEqual(len(self.app.presence_seen), serve.PRESENCE_WINDOWS)
+        # one presence row per worker and window, as before
+        self.assertEqual(len(rows[0]), len({(e["payload"]["worker_id"], int(serve.parse_ts(e["ts_event"]) // window_s))
+                                            for e in events}))
+
+if __name__ == "__main__":
+    unittest.main()
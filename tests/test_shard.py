@@ -0,0 +1,69 @@
+"""ShardScheduler (haws.shard): the same alerts for any worker count, and quiet sites don't hold the merge back."""
+import io
+import unittest
+
+from tests import GOLDEN_DIR, RULES
+
+from haws.ingest import iter_batches, loads, parse_ts
+from haws.shard import ShardScheduler, site_of, split_by_site
+
+PEAK = GOLDEN_DIR / "15min_midday_heat_peak.jsonl"
+BATCH = 1 << 16
+
+def stream():
+    """The peak scenario as sites a and b, plus site q for its first quarter only; and q's last ts."""
+    lines = [line for line in PEAK.read_bytes().splitlines(keepends=True) if line.startswith(b"{")]
+    lines = lines[:len(lines) // 2]
+    out = []
+    for i, line in enumerate(lines):
+        for site in ("site-a", "site-b") + (("site-q",) if i < len(lines) // 4 else ()):
+            out.append(b'{"site_id": "%s", ' % site.encode() + line[1:])
+    payloads = [loads(line)["payload"] for line in lines[:len(lines) // 4]]
+    quiet = max(parse_ts(p["ts"]) for p in payloads if "ts" in p)
+    return b"".join(out), quiet
+
+def score(data, workers):
+    """Alerts (without wall-clock stamps), the most ever held for the merge, and the last watermark."""
+    alerts, held = [], 0
+    with ShardScheduler(RULES, workers) as scheduler:
+        for batch in iter_batches(io.BytesIO(data), BATCH):
+            alerts += scheduler.submit(batch)
+            held = max(held, len(scheduler.heap))
+        watermark = scheduler.watermark
+        alerts += scheduler.flush()
+    for a in alerts:
+        del a["ts_ingest"], a["ts_scored"]
+    return alerts, held, watermark
+
+class ShardTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.data, cls.quiet = stream()
+        cls.one = score(cls.data, 1)
+
+    def test_any_worker_count(self):
+        alerts, _, _ = self.one
+        self.assertGreater(len(alerts), 0)
+        self.assertEqual({a["site_id"] for a in alerts}, {"site-a", "site-b", "site-q"})
+        self.assertEqual(score(self.data, 3)[0], alerts)
+
+    def test_quiet_site_does_not_stall(self):
+        alerts, held, watermark = self.one
+        self.assertGreater(watermark, self.quiet + 60)
+        self.assertLess(held, len(alerts) // 10)
+
+class SiteOfTest(unittest.TestCase):
+    def test_top_level_only(self):
+        self.assertEqual(site_of(b'{"site_id": "a", "payload": {"site_id": "b"}}'), "a")
+        self.assertEqual(site_of(b'{"payload": {"site_id": "b"}, "site_id": "a"}'), "a")
+        self.assertEqual(site_of(b'{"payload": {"site_id": "b"}}'), None)
+        self.assertEqual(site_of(b'{"note": "{", "site_id": "a"}'), "a")
+        self.assertEqual(site_of(b'{"site_id": "a\\"b"}'), 'a"b')
+        self.assertEqual(site_of(b'{"site_id": ""}'), None)
+
+    def test_split(self):
+        lines = [b'{"payload": {"site_id": "b"}}\n', b'{"site_id": "a"}\n', b'{"payload": {"site_id": "b"}}\n']
+        self.assertEqual(split_by_site(lines, "default"), {"default": [lines[0], lines[2]], "a": [lines[1]]})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+"""Golden-data replays (haws.sim) through the in-process and HTTP transports."""
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests import GOLDEN_DIR
+
+from haws.sim import expected_path, read_expected, run_scenario
+
+SAMPLE = GOLDEN_DIR / "sample_stream.jsonl"
+PEAK = GOLDEN_DIR / "15min_midday_heat_peak.jsonl"
+
+class RunScenarioTest(unittest.TestCase):
+    def check(self, scenario, **kw):
+        result = run_scenario(str(scenario), **kw)
+        self.assertEqual(result["status"], "pass", {k: result.get(k) for k in ("missing", "unexpected", "error")})
+        self.assertEqual(result["actual"], result["expected"])
+
+    def test_inproc(self):
+        self.check(SAMPLE)
+        self.check(PEAK)
+
+    def test_http(self):
+        self.check(PEAK, via="http")
+
+    def test_http_paced(self):
+        # paced batches that close no alert window: the watermark must stay -inf, not become "flushed"
+        self.check(SAMPLE, via="http", speed=1000.0)
+
+    def test_record_both_formats(self):
+        tmp = Path(tempfile.mkdtemp(prefix="haws-test-"))
+        try:
+            want = read_expected(expected_path(PEAK))
+            for name in ("peak.expected.jsonl", "peak.expected.json"):
+                result = run_scenario(str(PEAK), expected=str(tmp / name), record=True)
+                self.assertEqual((result["status"], result["actual"]), ("recorded", len(want)))
+                self.assertEqual(read_expected(tmp / name), want)
+                self.check(PEAK, expected=str(tmp / name))
+            self.assertEqual(len((tmp / "peak.expected.jsonl").read_bytes().splitlines()), len(want))
+        finally:
+            shutil.rmtree(tmp)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+"""The columnar event store: safe partition keys, read round-trip, and store vs JSONL evidence export."""
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from tests import GOLDEN_DIR
+
+from haws import ingest
+from haws.evidence import export_week
+from haws.sim import expected_path
+from haws.store import EventStore, StoreWriter, partition_error
+
+SCENARIO = GOLDEN_DIR / "15min_midday_heat_peak.jsonl"
+WEEK = "2025-W29"  # holds the scenario day, 2025-07-15
+
+def event(site_id, topic="site/env", ts="2025-07-15T12:00:00Z", **payload):
+    return {"event_id": f"e-{site_id}-{ts}", "site_id": site_id, "topic": topic, "ts_event": ts,
+            "ts_ingest": ts, "payload": payload or {"sensor_id": "env-1", "temp_c": 30.0, "rh": 55}}
+
+def ingest_scenario(path, site_id, out_dir, store):
+    """bin/haws-ingest --out out_dir --store ... in-process."""
+    schema = ingest.load_schema()
+    os.makedirs(out_dir, exist_ok=True)
+    files = {topic: open(os.path.join(out_dir, ingest.topic_filename(topic)), "wb") for topic in schema}
+    sinks = {}
+    for topic, f in files.items():
+        jsonl = ingest.jsonl_sink(f)
+        sinks[topic] = lambda events, jsonl=jsonl: (jsonl(events), store.sink(events))
+    try:
+        with open(path, "rb") as stream:
+            ingest.Ingestor(schema, site_id=site_id, sinks=sinks).run(stream, ingest.BATCH_BYTES)
+    finally:
+        for f in files.values():
+            f.close()
+
+class PartitionKeyTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="haws-test-")
+        self.root = os.path.join(self.tmp, "store")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_unsafe_site_ids_are_not_written(self):
+        bad = ["../escape", "..", "a/b", "", "/abs", ".hidden", "x" * 200, None]
+        with StoreWriter(self.root) as w:
+            w.append([event(site) for site in bad] + [event("site-a")])
+        self.assertEqual(sum(w.rejected.values()), len(bad))
+        self.assertEqual(sorted(os.listdir(self.tmp)), ["store"])
+        self.assertEqual(os.listdir(self.root), ["site=site-a"])
+        self.assertEqual(EventStore(self.root).count(), {("site-a", "site/env"): 1})
+
+    def test_partition_error(self):
+        self.assertIsNone(partition_error("site-a.b_1", "2025-07-15", "site/env"))
+        self.assertIsNotNone(partition_error("site-a", "2025-07-15/..", "site/env"))
+        self.assertIsNotNone(partition_error("site-a", "2025-07-15", "../env"))
+        self.assertIsNotNone(partition_error("site-a", "2025-07-15", 7))
+
+    def test_read_round_trip(self):
+        events = [event("site-a", ts=f"2025-07-15T12:{m:02d}:00Z", sensor_id="env-1", temp_c=30.0 + m, rh=50)
+                  for m in reversed(range(20))]
+        events.append(event("site-b", ts="2025-07-16T00:00:00Z", sensor_id="env-9", temp_c=20.0, rh=40))
+        with StoreWriter(self.root, segment_rows=8) as w:
+            w.append(events)
+        store = EventStore(self.root)
+        self.assertEqual(store.count("site/env"), {("site-a", "site/env"): 20, ("site-b", "site/env"): 1})
+        batches = list(store.scan("site/env", ["ts", "sensor_id", "temp_c"], sites=["site-a"]))
+        self.assertEqual(len(batches), 3)  # segment_rows=8
+        for b in batches:
+            self.assertEqual(set(b.strings("sensor_id").tolist()), {"env-1"})
+            self.assertTrue((np.diff(b["ts"]) > 0).all())  # rows sorted by ts within a segment
+        temps = np.concatenate([b["temp_c"] for b in batches])
+        self.assertEqual(sorted(temps.tolist()), [30.0 + m for m in range(20)])
+
+        noon = 1752580800.0  # 2025-07-15T12:00:00Z
+        cols = store.read("site/env", ["ts", "sensor_id", "temp_c"], start=noon + 300, end=noon + 600)
+        self.assertEqual(cols["temp_c"].tolist(), [35.0, 36.0, 37.0, 38.0, 39.0])
+        self.assertEqual(cols["site_id"].tolist(), ["site-a"] * 5)
+        self.assertEqual(store.count("site/env", start=noon + 300, end=noon + 600), {("site-a", "site/env"): 5})
+
+class ExportTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = Path(tempfile.mkdtemp(prefix="haws-test-"))
+        with StoreWriter(str(cls.tmp / "store")) as store:
+            ingest_scenario(SCENARIO, "site-a", cls.tmp / "events" / "site-a", store)
+            ingest_scenario(GOLDEN_DIR / "sample_stream.jsonl", "site-b", cls.tmp / "events" / "site-b", store)
+        cls.alerts = cls.tmp / "alerts.jsonl"
+        shutil.copy(expected_path(SCENARIO), cls.alerts)  # already one alert per line
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp)
+
+    def test_store_matches_jsonl(self):
+        jsonl, store = self.tmp / "out_jsonl", self.tmp / "out_store"
+        export_week(WEEK, str(jsonl), events=[str(self.tmp / "events")], alerts=[str(self.alerts)])
+        export_week(WEEK, str(store), store=str(self.tmp / "store"), alerts=[str(self.alerts)])
+        for name in ("evidence.csv", "team_views.csv", "privacy_audit.jsonl"):
+            self.assertEqual((store / name).read_bytes(), (jsonl / name).read_bytes(), name)
+        rows = (jsonl / "evidence.csv").read_text(encoding="utf-8").splitlines()
+        self.assertGreater(len(rows), 1)
+        self.assertTrue(any(",site-a,heat_high_minutes," in row for row in rows))
+
+if __name__ == "__main__":
+    unittest.main()